@@ -7,18 +7,33 @@ from .oss_upload_options import NODE_DISPLAY_NAME_MAPPINGS as OSS_ADVANCED_DISPL
 from .oss_video_upload import NODE_CLASS_MAPPINGS as OSS_VIDEO_NODE_MAPPINGS
 from .oss_video_upload import NODE_DISPLAY_NAME_MAPPINGS as OSS_VIDEO_DISPLAY_MAPPINGS
 
+from .oss_frame_upload import NODE_CLASS_MAPPINGS as OSS_FRAME_NODE_MAPPINGS
+from .oss_frame_upload import NODE_DISPLAY_NAME_MAPPINGS as OSS_FRAME_DISPLAY_MAPPINGS
+
+from .oss_tools import NODE_CLASS_MAPPINGS as OSS_TOOLS_NODE_MAPPINGS
+from .oss_tools import NODE_DISPLAY_NAME_MAPPINGS as OSS_TOOLS_DISPLAY_MAPPINGS
+
+from .oss_metrics import register_routes
+
+# 在 ComfyUI 服务器上注册 /oss_upload/metrics 指标接口
+register_routes()
+
 # 合并节点映射
 NODE_CLASS_MAPPINGS = {
     **OSS_NODE_MAPPINGS,
     **OSS_ADVANCED_NODE_MAPPINGS,
-    **OSS_VIDEO_NODE_MAPPINGS
+    **OSS_VIDEO_NODE_MAPPINGS,
+    **OSS_FRAME_NODE_MAPPINGS,
+    **OSS_TOOLS_NODE_MAPPINGS
 }
 
 # 合并显示名称映射
 NODE_DISPLAY_NAME_MAPPINGS = {
     **OSS_DISPLAY_MAPPINGS,
     **OSS_ADVANCED_DISPLAY_MAPPINGS,
-    **OSS_VIDEO_DISPLAY_MAPPINGS
+    **OSS_VIDEO_DISPLAY_MAPPINGS,
+    **OSS_FRAME_DISPLAY_MAPPINGS,
+    **OSS_TOOLS_DISPLAY_MAPPINGS
 }
 
 # 定义web前端文件的位置（如果有的话）
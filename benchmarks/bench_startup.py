@@ -0,0 +1,108 @@
+"""
+插件启动耗时测试
+
+在全新的子进程中加载插件（相当于 ComfyUI 启动时导入自定义节点），测量导入耗时和新增模块数，
+并检查应推迟到首次执行时才加载的依赖（oss2 等）是否在启动时被导入；另外测量首次创建
+Bucket（加载 oss2）的耗时，即推迟到第一次上传的开销。
+
+ComfyUI 启动时已经加载了 torch、numpy、PIL，子进程会先导入这些模块，不计入插件耗时。
+
+示例:
+    python benchmarks/bench_startup.py --comfyui-dir ~/ComfyUI --iterations 10
+    python benchmarks/bench_startup.py --check --max-ms 100
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ComfyUI 在加载自定义节点前已导入的模块
+PRELOADED_MODULES = ("torch", "numpy", "PIL.Image", "aiohttp")
+# 只应在首次执行节点时加载的依赖
+DEFERRED_MODULES = ("oss2", "requests", "sqlite3", "comfy_api", "av")
+
+CHILD_SCRIPT = """
+import importlib, json, sys, time
+sys.path.insert(0, {bench_dir!r})
+for name in {preloaded!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+import bench_upload
+before = set(sys.modules)
+start = time.perf_counter()
+package = bench_upload.load_package({comfyui_dir!r})
+load_seconds = time.perf_counter() - start
+loaded = [name for name in {deferred!r} if name in sys.modules and name not in before]
+new_modules = len(set(sys.modules) - before)
+oss_client = importlib.import_module(package.__name__ + ".oss_client")
+start = time.perf_counter()
+oss_client.get_bucket("access_key_id", "access_key_secret", "127.0.0.1:1", "bench")
+first_bucket_seconds = time.perf_counter() - start
+print(json.dumps({{"load_seconds": load_seconds, "first_bucket_seconds": first_bucket_seconds,
+                  "new_modules": new_modules, "deferred_loaded": loaded,
+                  "nodes": len(package.NODE_CLASS_MAPPINGS)}}))
+"""
+
+
+def run_once(comfyui_dir):
+    script = CHILD_SCRIPT.format(bench_dir=BENCH_DIR, preloaded=PRELOADED_MODULES, deferred=DEFERRED_MODULES,
+                                 comfyui_dir=os.path.abspath(os.path.expanduser(comfyui_dir)) if comfyui_dir else None)
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    load_ms = [run["load_seconds"] * 1000 for run in runs]
+    bucket_ms = [run["first_bucket_seconds"] * 1000 for run in runs]
+    return {
+        "iterations": len(runs),
+        "load_ms_median": statistics.median(load_ms),
+        "load_ms_min": min(load_ms),
+        "load_ms_max": max(load_ms),
+        "first_bucket_ms_median": statistics.median(bucket_ms),
+        "new_modules": runs[-1]["new_modules"],
+        "nodes": runs[-1]["nodes"],
+        "deferred_loaded": sorted({name for run in runs for name in run["deferred_loaded"]}),
+    }
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="插件启动耗时测试")
+    parser.add_argument("--comfyui-dir", default=None, help="ComfyUI 目录（提供 comfy 包）")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="启动时加载了 DEFERRED_MODULES 中的模块则返回非0")
+    parser.add_argument("--max-ms", type=float, default=None, help="导入耗时中位数超过该值则返回非0")
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    summary = summarize([run_once(args.comfyui_dir) for _ in range(max(1, args.iterations))])
+
+    print(f"节点数: {summary['nodes']}，新增模块: {summary['new_modules']}")
+    print(f"导入耗时(ms): 中位数 {summary['load_ms_median']:.1f}，最小 {summary['load_ms_min']:.1f}，最大 {summary['load_ms_max']:.1f}")
+    print(f"首次创建 Bucket(ms): {summary['first_bucket_ms_median']:.1f}")
+    print(f"启动时加载的延迟依赖: {', '.join(summary['deferred_loaded']) or '无'}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    if args.check and summary["deferred_loaded"]:
+        print(f"失败: 启动时加载了 {', '.join(summary['deferred_loaded'])}", file=sys.stderr)
+        failed = True
+    if args.max_ms is not None and summary["load_ms_median"] > args.max_ms:
+        print(f"失败: 导入耗时 {summary['load_ms_median']:.1f}ms 超过 {args.max_ms:.1f}ms", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+上传链路性能测试
+
+启动本地 OSS 替身服务（fake_oss_server.py），用合成的 IMAGE 张量和 VIDEO 对象
+调用各上传节点，输出每个节点、每组参数下的 图片/秒、MB/秒、p50/p99 延迟和峰值内存。
+
+默认每组参数在独立子进程中运行，峰值内存互不影响。视频节点需要 comfy_api，
+请在 ComfyUI 的 Python 环境中运行，并通过 --comfyui-dir 指定 ComfyUI 目录。
+
+示例:
+    python benchmarks/bench_upload.py --comfyui-dir ~/ComfyUI --nodes auto,advanced --batch 16 --workers 1,4,8
+    python benchmarks/bench_upload.py --comfyui-dir ~/ComfyUI --nodes video_advanced --video-mb 256 --part-concurrency 1,4 --streaming 否,是
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCH_DIR)
+PACKAGE_NAME = "comfyui_oss_upload"
+
+NODE_CHOICES = ["auto", "advanced", "video", "video_advanced"]
+
+
+# ---- 合成输入 ----
+
+def make_images(batch, height, width, seed=0):
+    """
+    生成合成的 IMAGE 批次（[N, H, W, 3]，取值0-1），有 torch 时返回张量
+    """
+    try:
+        import torch
+        generator = torch.Generator().manual_seed(seed)
+        # 平滑渐变 + 噪声，压缩率接近真实图片而不是纯噪声
+        base = torch.linspace(0, 1, width).repeat(height, 1)
+        images = base[None, :, :, None].repeat(batch, 1, 1, 3)
+        return (images * 0.8 + torch.rand(batch, height, width, 3, generator=generator) * 0.2).clamp_(0, 1)
+    except ImportError:
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        base = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+        return np.clip(base * 0.8 + rng.random((batch, height, width, 3), dtype=np.float32) * 0.2, 0, 1)
+
+
+class SyntheticVideo:
+    """
+    合成 VIDEO 对象：save_to 按 64KB 块写出指定大小的数据，结束时像 MP4 封装器一样
+    回到文件头部改写 mdat 大小。数据由 1MB 随机块重复生成，不在内存中保留完整视频。
+    """
+
+    def __init__(self, size_mb, seed=0):
+        self.size = int(size_mb * 1024 * 1024)
+        self._block = os.urandom(1024 * 1024)
+
+    def save_to(self, path, format=None, codec=None, metadata=None):
+        chunk = 64 * 1024
+        written = 0
+        while written < self.size:
+            n = min(chunk, self.size - written)
+            offset = written % len(self._block)
+            data = self._block[offset:offset + n]
+            if len(data) < n:
+                data += self._block[:n - len(data)]
+            path.write(data)
+            written += n
+        end = path.tell()
+        path.seek(32)
+        path.write(self.size.to_bytes(8, 'big'))
+        path.seek(end)
+
+    def get_dimensions(self):
+        return (1920, 1080)
+
+
+# ---- 运行环境 ----
+
+def add_comfyui_path(comfyui_dir):
+    if comfyui_dir:
+        path = os.path.abspath(os.path.expanduser(comfyui_dir))
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def load_package(comfyui_dir=None):
+    """
+    以包的形式加载插件（目录名含连字符，无法直接 import）
+    """
+    add_comfyui_path(comfyui_dir)
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(PACKAGE_DIR, "__init__.py"), submodule_search_locations=[PACKAGE_DIR])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(latency_ms, error_rate=0.0):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "fake_oss_server.py"),
+                                "--port", str(port), "--latency-ms", str(latency_ms), "--error-rate", str(error_rate)],
+                               stdout=subprocess.DEVNULL)
+    endpoint = f"127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            server_stats(endpoint)
+            return process, endpoint
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("OSS 替身服务启动失败")
+
+
+def server_stats(endpoint):
+    with urllib.request.urlopen(f"http://{endpoint}/_stats", timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def reset_server(endpoint):
+    request = urllib.request.Request(f"http://{endpoint}/_reset", method="POST")
+    urllib.request.urlopen(request, timeout=5).close()
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+# ---- 测试用例 ----
+
+def build_cases(args):
+    cases = []
+    for node in args.nodes:
+        if node == "auto":
+            for workers, mode in itertools.product(args.workers, args.output_modes):
+                cases.append({"node": node, "settings": {"max_workers": workers, "output_mode": mode}})
+        elif node == "advanced":
+            for workers, fmt, preset, mode in itertools.product(args.workers, args.formats, args.presets, args.output_modes):
+                cases.append({"node": node, "settings": {"max_workers": workers, "format": fmt, "encode_preset": preset,
+                                                          "output_mode": mode}})
+        elif node == "video":
+            cases.append({"node": node, "settings": {}})
+        elif node == "video_advanced":
+            for concurrency, streaming, strategy in itertools.product(args.part_concurrency, args.streaming, args.strategy):
+                cases.append({"node": node, "settings": {"part_concurrency": concurrency, "streaming_upload": streaming,
+                                                          "part_size_mb": args.part_size_mb,
+                                                          "multipart_threshold": args.multipart_threshold,
+                                                          "upload_strategy": strategy}})
+    if args.derivatives:
+        for case in cases:
+            if case["node"] in ("auto", "advanced"):
+                case["settings"]["derivatives"] = args.derivatives
+    return cases
+
+
+def make_call(package, node, settings, endpoint, args):
+    """
+    返回一次节点调用的函数及每次调用处理的图片数
+    """
+    common = {
+        "access_key_id": "bench",
+        "access_key_secret": "bench",
+        "bucket_name": "bench",
+        "endpoint": endpoint,
+        "folder": "bench",
+    }
+    mappings = package.NODE_CLASS_MAPPINGS
+
+    if node in ("auto", "advanced"):
+        images = make_images(args.batch, args.height, args.width)
+        if node == "auto":
+            instance = mappings["OSSAutoUploadNode"]()
+            kwargs = dict(common, image=images, prefix="bench", **settings)
+            return lambda: instance.upload_to_oss(**kwargs), args.batch
+        instance = mappings["OSSAdvancedUploadNode"]()
+        # unique_id / prompt 与 ComfyUI 传入的隐藏输入一致，AUTO 格式按工作流和节点缓存选择结果
+        kwargs = dict(common, image=images, prefix="bench", include_date="否", quality=90, unique_id="bench",
+                      prompt={"bench": {"class_type": "OSSAdvancedUploadNode"}}, **settings)
+        return lambda: instance.upload_to_oss(**kwargs), args.batch
+
+    video = SyntheticVideo(args.video_mb)
+    if node == "video":
+        instance = mappings["OSSVideoUploadNode"]()
+        kwargs = dict(common, video=video, prefix="bench", include_date="否", **settings)
+        return lambda: instance.upload_video_to_oss(**kwargs), 1
+    instance = mappings["OSSVideoAdvancedUploadNode"]()
+    kwargs = dict(common, video=video, prefix="bench", include_date="否", **settings)
+    return lambda: instance.upload_video_to_oss_advanced(**kwargs), 1
+
+
+def run_case(case, endpoint, args):
+    """
+    在当前进程中运行一个用例
+
+    Returns:
+        dict: 测试结果
+    """
+    package = load_package(args.comfyui_dir)
+    call, items_per_call = make_call(package, case["node"], case["settings"], endpoint, args)
+
+    # 静默节点自身的日志输出
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    sys.stdout = devnull
+    try:
+        for _ in range(args.warmup):
+            call()
+        baseline_rss = peak_rss_mb()
+        reset_server(endpoint)
+
+        latencies = []
+        failures = 0
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            t0 = time.perf_counter()
+            result = call()
+            latencies.append(time.perf_counter() - t0)
+            # 最后一个输出为结构化结果详情
+            failures += sum(item["status"] == "failed" for item in json.loads(result[-1]))
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    stats = server_stats(endpoint)
+    total_items = items_per_call * args.iterations
+    return {
+        "node": case["node"],
+        "settings": case["settings"],
+        "iterations": args.iterations,
+        "items_per_sec": total_items / elapsed if elapsed else 0.0,
+        "mb_per_sec": stats["bytes_received"] / (1024 * 1024) / elapsed if elapsed else 0.0,
+        "requests": stats["requests"],
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        "baseline_rss_mb": baseline_rss,
+        "failures": failures,
+    }
+
+
+def run_isolated(case, endpoint, argv):
+    command = [sys.executable, os.path.abspath(__file__), *argv, "--case", json.dumps(case, ensure_ascii=False), "--endpoint", endpoint]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def format_table(results):
+    header = f"{'节点':<16}{'参数':<58}{'项/秒':>9}{'MB/秒':>9}{'p50(ms)':>10}{'p99(ms)':>10}{'峰值内存(MB)':>14}{'失败':>6}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        settings = ",".join(f"{k}={v}" for k, v in r["settings"].items())
+        lines.append(f"{r['node']:<16}{settings:<58}{r['items_per_sec']:>9.2f}{r['mb_per_sec']:>9.2f}"
+                     f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['peak_rss_mb']:>14.1f}{r['failures']:>6}")
+    return "\n".join(lines)
+
+
+def parse_args(argv):
+    def csv(cast=str):
+        return lambda value: [cast(v) for v in value.split(",") if v]
+
+    parser = argparse.ArgumentParser(description="OSS 上传节点性能测试")
+    parser.add_argument("--comfyui-dir", default=None, help="ComfyUI 目录（视频节点需要 comfy_api）")
+    parser.add_argument("--nodes", type=csv(), default=["auto", "advanced"], help=f"要测试的节点: {','.join(NODE_CHOICES)}")
+    parser.add_argument("--batch", type=int, default=16, help="每次调用的图片数")
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--workers", type=csv(int), default=[1, 4], help="图片节点的 max_workers")
+    parser.add_argument("--formats", type=csv(), default=["JPEG", "PNG"], help="高级图片节点的格式")
+    parser.add_argument("--presets", type=csv(), default=["快速"], help="高级图片节点的编码预设")
+    parser.add_argument("--output-modes", type=csv(), default=["单独对象"], help="图片节点的 output_mode（单独对象、归档）")
+    parser.add_argument("--derivatives", default="", help="图片节点的衍生图规格，如 \"256:WEBP 1024:JPEG:85\"")
+    parser.add_argument("--video-mb", type=float, default=64, help="合成视频大小（MB）")
+    parser.add_argument("--part-size-mb", type=int, default=10)
+    parser.add_argument("--part-concurrency", type=csv(int), default=[1, 4])
+    parser.add_argument("--streaming", type=csv(), default=["否"], help="高级视频节点的 streaming_upload")
+    parser.add_argument("--strategy", type=csv(), default=["手动"], help="高级视频节点的 upload_strategy（手动、自适应）")
+    parser.add_argument("--multipart-threshold", type=int, default=16, help="高级视频节点的分片阈值（MB）")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0, help="替身服务每个请求的额外延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="替身服务随机返回 503 的比例（0-1），用于测试重试")
+    parser.add_argument("--no-isolate", action="store_true", help="所有用例在同一进程中运行")
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    parser.add_argument("--case", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--endpoint", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    unknown = [node for node in args.nodes if node not in NODE_CHOICES]
+    if unknown:
+        parser.error(f"未知节点: {','.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+
+    if args.case:
+        # 子进程：运行单个用例，最后一行输出 JSON 结果
+        print(json.dumps(run_case(json.loads(args.case), args.endpoint, args), ensure_ascii=False))
+        return
+
+    add_comfyui_path(args.comfyui_dir)
+    if importlib.util.find_spec("comfy_api") is None:
+        skipped = [node for node in args.nodes if node.startswith("video")]
+        if skipped:
+            print(f"未找到 comfy_api，跳过视频节点: {','.join(skipped)}", file=sys.stderr)
+            args.nodes = [node for node in args.nodes if node not in skipped]
+
+    server, endpoint = start_server(args.latency_ms, args.error_rate)
+    try:
+        results = []
+        for case in build_cases(args):
+            if args.no_isolate:
+                result = run_case(case, endpoint, args)
+            else:
+                result = run_isolated(case, endpoint, argv)
+            results.append(result)
+            print(f"完成: {case['node']} {case['settings']}", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(format_table(results))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
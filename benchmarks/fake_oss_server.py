@@ -0,0 +1,331 @@
+"""
+本地 OSS 替身服务，用于性能测试
+
+支持 oss2 在 IP/localhost 端点下使用的路径风格请求（/bucket/key）：
+PutObject、HeadObject、GetObject，以及分片上传的初始化、上传分片、列举分片、
+完成、取消和列举分片上传。对象只保存在内存中（可选择丢弃内容只记录大小）。
+sign_url 由 oss2 在本地计算，无需服务端支持。
+
+可通过 error_rate 让一部分对象请求随机返回 503，用于测试重试与熔断。
+
+另外提供两个管理接口供性能测试读取统计：
+    GET  /_stats   返回 {"requests": ..., "bytes_received": ...}
+    POST /_reset   清零统计
+
+单独运行:
+    python benchmarks/fake_oss_server.py --port 9000 --latency-ms 20
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+
+def _iso_now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class FakeOSSState:
+    """
+    替身服务的内存状态与统计
+    """
+
+    def __init__(self, keep_data=False):
+        self.keep_data = keep_data
+        self.objects = {}
+        self.uploads = {}
+        self.requests = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_received = 0
+
+
+class FakeOSSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOSS/1.0"
+
+    # ---- 工具 ----
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _parse(self):
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+        path = parts.path.lstrip('/')
+        bucket, _, key = path.partition('/')
+        return unquote(bucket), unquote(key), query
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            body = b"".join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.state.lock:
+            self.state.bytes_received += len(body)
+        return body
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        self.send_header('x-oss-request-id', uuid.uuid4().hex)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_xml(self, status, xml):
+        self._send(status, xml.encode('utf-8'), {'Content-Type': 'application/xml'})
+
+    def _send_error(self, status, code, message=""):
+        xml = (f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><Error><Code>{code}</Code>"
+               f"<Message>{escape(message)}</Message><RequestId>{uuid.uuid4().hex}</RequestId></Error>")
+        self._send_xml(status, xml)
+
+    def _before(self):
+        with self.state.lock:
+            self.state.requests += 1
+        latency = self.server.latency
+        if latency:
+            time.sleep(latency)
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            # 丢弃请求体并模拟服务端故障
+            self._read_body()
+            self._send_error(503, 'ServiceUnavailable', 'injected failure')
+            return False
+        return True
+
+    def _store(self, data):
+        return data if self.state.keep_data else len(data)
+
+    # ---- 请求处理 ----
+
+    def do_PUT(self):
+        if not self._before():
+            return
+        bucket, key, query = self._parse()
+        body = self._read_body()
+        etag = hashlib.md5(body).hexdigest().upper()
+
+        if 'uploadId' in query:
+            upload = self.state.uploads.get(query['uploadId'])
+            if upload is None:
+                return self._send_error(404, 'NoSuchUpload')
+            upload['parts'][int(query['partNumber'])] = (etag, self._store(body), _iso_now())
+        else:
+            self.state.objects[(bucket, key)] = (etag, self._store(body))
+        self._send(200, headers={'ETag': f'"{etag}"'})
+
+    def _admin(self):
+        if self.path == '/_stats':
+            with self.state.lock:
+                stats = {"requests": self.state.requests, "bytes_received": self.state.bytes_received}
+            self._send(200, json.dumps(stats).encode('utf-8'), {'Content-Type': 'application/json'})
+            return True
+        if self.path == '/_reset':
+            self.state.reset_stats()
+            self._send(204)
+            return True
+        return False
+
+    def do_POST(self):
+        if self._admin():
+            return
+        if not self._before():
+            return
+        bucket, key, query = self._parse()
+        body = self._read_body()
+
+        if 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            self.state.uploads[upload_id] = {'bucket': bucket, 'key': key, 'parts': {}, 'initiated': _iso_now()}
+            return self._send_xml(200, (
+                "<?xml version=\"1.0\" encoding=\"UTF-8\"?><InitiateMultipartUploadResult>"
+                f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                "</InitiateMultipartUploadResult>"))
+
+        if 'uploadId' in query:
+            upload = self.state.uploads.pop(query['uploadId'], None)
+            if upload is None:
+                return self._send_error(404, 'NoSuchUpload')
+            numbers = [int(node.findtext('PartNumber')) for node in ElementTree.fromstring(body).findall('Part')]
+            parts = [upload['parts'][n] for n in numbers]
+            if self.state.keep_data:
+                data = b"".join(part[1] for part in parts)
+            else:
+                data = sum(part[1] for part in parts)
+            etag = hashlib.md5("".join(part[0] for part in parts).encode()).hexdigest().upper() + f"-{len(parts)}"
+            self.state.objects[(bucket, key)] = (etag, data)
+            return self._send_xml(200, (
+                "<?xml version=\"1.0\" encoding=\"UTF-8\"?><CompleteMultipartUploadResult>"
+                f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><ETag>\"{etag}\"</ETag>"
+                "</CompleteMultipartUploadResult>"))
+
+        self._send_error(400, 'InvalidRequest')
+
+    def do_DELETE(self):
+        if not self._before():
+            return
+        bucket, key, query = self._parse()
+        if 'uploadId' in query:
+            if self.state.uploads.pop(query['uploadId'], None) is None:
+                return self._send_error(404, 'NoSuchUpload')
+        else:
+            self.state.objects.pop((bucket, key), None)
+        self._send(204)
+
+    def do_HEAD(self):
+        if not self._before():
+            return
+        bucket, key, _ = self._parse()
+        obj = self.state.objects.get((bucket, key))
+        if obj is None:
+            return self._send(404)
+        size = len(obj[1]) if isinstance(obj[1], bytes) else obj[1]
+        self.send_response(200)
+        self.send_header('x-oss-request-id', uuid.uuid4().hex)
+        self.send_header('ETag', f'"{obj[0]}"')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+
+    def do_GET(self):
+        if self._admin():
+            return
+        if not self._before():
+            return
+        bucket, key, query = self._parse()
+
+        if not key and 'uploads' in query:
+            uploads = "".join(
+                f"<Upload><Key>{escape(u['key'])}</Key><UploadId>{upload_id}</UploadId><Initiated>{u['initiated']}</Initiated></Upload>"
+                for upload_id, u in self.state.uploads.items()
+                if u['bucket'] == bucket and u['key'].startswith(query.get('prefix', ''))
+            )
+            return self._send_xml(200, (
+                "<?xml version=\"1.0\" encoding=\"UTF-8\"?><ListMultipartUploadsResult>"
+                "<IsTruncated>false</IsTruncated><NextKeyMarker></NextKeyMarker><NextUploadIdMarker></NextUploadIdMarker>"
+                f"{uploads}</ListMultipartUploadsResult>"))
+
+        if 'uploadId' in query:
+            upload = self.state.uploads.get(query['uploadId'])
+            if upload is None:
+                return self._send_error(404, 'NoSuchUpload')
+            parts = "".join(
+                f"<Part><PartNumber>{n}</PartNumber><LastModified>{modified}</LastModified><ETag>\"{etag}\"</ETag>"
+                f"<Size>{len(data) if isinstance(data, bytes) else data}</Size></Part>"
+                for n, (etag, data, modified) in sorted(upload['parts'].items())
+            )
+            return self._send_xml(200, (
+                "<?xml version=\"1.0\" encoding=\"UTF-8\"?><ListPartsResult>"
+                f"<IsTruncated>false</IsTruncated><NextPartNumberMarker>0</NextPartNumberMarker>{parts}</ListPartsResult>"))
+
+        obj = self.state.objects.get((bucket, key))
+        if obj is None:
+            return self._send_error(404, 'NoSuchKey')
+        data = obj[1] if isinstance(obj[1], bytes) else bytes(obj[1])
+        byte_range = self.headers.get('Range', '')
+        if byte_range.startswith('bytes='):
+            # 只支持单个 "bytes=a-b" 范围，归档索引读取用到
+            start, _, end = byte_range[6:].partition('-')
+            start, end = int(start), min(int(end or len(data) - 1), len(data) - 1)
+            return self._send(206, data[start:end + 1], {
+                'ETag': f'"{obj[0]}"', 'Content-Range': f'bytes {start}-{end}/{len(data)}'})
+        self._send(200, data, {'ETag': f'"{obj[0]}"'})
+
+
+class FakeOSSHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端关闭空闲的 keep-alive 连接时出现的连接重置不是服务端错误
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeOSSServer:
+    """
+    在后台线程中运行的替身服务
+
+    用法:
+        with FakeOSSServer(latency_ms=10) as server:
+            endpoint = server.endpoint  # 例如 "127.0.0.1:54321"
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0, keep_data=False, error_rate=0.0):
+        self.httpd = FakeOSSHTTPServer((host, port), FakeOSSHandler)
+        self.httpd.state = FakeOSSState(keep_data)
+        self.httpd.latency = latency_ms / 1000.0
+        self.httpd.error_rate = error_rate
+        self._thread = None
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    @property
+    def endpoint(self):
+        host, port = self.httpd.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OSS 替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个请求额外的延迟（毫秒）")
+    parser.add_argument("--keep-data", action="store_true", help="保存对象内容（默认只记录大小）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="对象请求随机返回 503 的比例（0-1）")
+    args = parser.parse_args()
+
+    server = FakeOSSServer(args.host, args.port, args.latency_ms, args.keep_data, args.error_rate)
+    print(f"OSS 替身服务已启动: {server.endpoint}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from .oss_buffer import buffer_size
+
+# EWMA 平滑系数，越大越偏向最近的观测
+ADAPTIVE_EWMA_ALPHA = 0.3
+# 没有观测数据时假设的请求延迟（秒）和单连接带宽（字节/秒）
+DEFAULT_LATENCY = 0.05
+DEFAULT_STREAM_BANDWIDTH = 10 * 1024 * 1024
+# 没有观测数据的并发档位，假设并发每加倍总带宽提高的倍数（并发减半时第一次不折减）
+UNMEASURED_DOUBLING_GAIN = 1.25
+# 小于该大小的对象总是普通上传
+ADAPTIVE_MIN_MULTIPART_SIZE = 8 * 1024 * 1024
+# 小于该大小的请求只用于估计延迟，不用于估计带宽
+LATENCY_SAMPLE_MAX_BYTES = 64 * 1024
+# 候选分片大小与并发档位
+ADAPTIVE_PART_SIZES = tuple(size * 1024 * 1024 for size in (1, 2, 4, 8, 16, 32))
+ADAPTIVE_CONCURRENCY = (1, 2, 4, 8, 16)
+# 同一 endpoint 上同时进行的数据请求上限（与 Bucket 连接池大小一致）
+ADAPTIVE_MAX_STREAMS = 16
+# 在途分片总大小上限，限制分片上传的内存占用
+ADAPTIVE_MAX_IN_FLIGHT = 64 * 1024 * 1024
+# 预计耗时与最优值相差在该比例以内时，选择并发更低的策略
+ADAPTIVE_TOLERANCE = 0.05
+
+
+class UploadPlan:
+    """
+    一次上传的策略：普通上传或分片上传，以及分片大小和并发数
+    """
+
+    def __init__(self, multipart, part_size, concurrency, estimated_seconds):
+        self.multipart = multipart
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.estimated_seconds = estimated_seconds
+
+    def queue_options(self):
+        """
+        转换为后台队列 / 本地暂存目录的上传参数
+
+        Returns:
+            dict: multipart_threshold、part_size、concurrency
+        """
+        return {
+            "multipart_threshold": 0 if self.multipart else None,
+            "part_size": self.part_size,
+            "concurrency": self.concurrency,
+        }
+
+    def describe(self):
+        if not self.multipart:
+            return f"普通上传（预计 {self.estimated_seconds:.2f} 秒）"
+        return (f"分片上传，分片 {self.part_size / (1024*1024):.0f}MB，并发 {self.concurrency}"
+                f"（预计 {self.estimated_seconds:.2f} 秒）")
+
+
+class EndpointStats:
+    """
+    单个 endpoint 最近的请求延迟、各并发档位下的总带宽（EWMA）和正在进行的数据请求数
+    """
+
+    def __init__(self):
+        self.latency = DEFAULT_LATENCY
+        self.latency_samples = 0
+        # 并发档位 -> [总带宽, 样本数]
+        self.bandwidth = {}
+        self.in_flight = 0
+
+    def estimate(self, concurrency):
+        """
+        估计 concurrency 个请求同时发送时的总带宽
+
+        有观测的档位直接使用观测值；没有观测的档位从最近的有观测档位推算：并发每加倍
+        提高 UNMEASURED_DOUBLING_GAIN 倍，以便尝试更高的并发；并发减半一次时假设总带宽不变
+        （带宽已饱和时更低的并发同样快），继续减半才按同样的倍数折减，因此每次只向下尝试一档。
+        完全没有观测时从默认单连接带宽推算。
+        """
+        measured = self.bandwidth.get(concurrency)
+        if measured is not None:
+            return measured[0]
+        if self.bandwidth:
+            base = min(self.bandwidth, key=lambda level: abs(math.log2(level / concurrency)))
+            rate = self.bandwidth[base][0]
+        else:
+            base, rate = 1, DEFAULT_STREAM_BANDWIDTH
+        doublings = math.log2(concurrency / base)
+        if doublings < 0:
+            return rate / UNMEASURED_DOUBLING_GAIN ** (-doublings - 1)
+        return rate * UNMEASURED_DOUBLING_GAIN ** doublings
+
+    def to_dict(self):
+        return {
+            "latency_ms": round(self.latency * 1000, 2),
+            "mb_per_second": {str(level): round(rate / (1024*1024), 2) for level, (rate, _) in sorted(self.bandwidth.items())},
+            "in_flight": self.in_flight,
+        }
+
+
+def _ewma(current, value, samples):
+    # 第一个观测直接替换默认值
+    if samples == 0:
+        return value
+    return current + ADAPTIVE_EWMA_ALPHA * (value - current)
+
+
+def _nearest_level(concurrency):
+    return min(ADAPTIVE_CONCURRENCY, key=lambda level: abs(level - concurrency))
+
+
+class ThroughputTracker:
+    """
+    按 endpoint 记录上传请求的延迟和带宽，据此选择预计耗时最短的上传策略
+
+    小请求（如初始化分片上传）的耗时作为请求延迟。普通上传扣除延迟后得到单个请求的速率，
+    乘以当时同一 endpoint 上同时进行的数据请求数，计入对应并发档位的总带宽；分片上传按整个
+    对象的耗时扣除各轮请求的延迟，计入所用并发数的档位。并发继续加倍仍能提速时会逐步尝试
+    更高的档位，不再提速时停留在较低的档位。
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, endpoint):
+        # 调用方需持有锁
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats[endpoint] = EndpointStats()
+        return stats
+
+    @contextmanager
+    def measure(self, endpoint, nbytes, record_bandwidth=True):
+        """
+        记录代码块中一次请求的耗时，请求出错时不记录
+
+        Args:
+            endpoint: bucket.endpoint
+            nbytes: 请求体字节数
+            record_bandwidth: 是否计入带宽（分片请求只计入正在进行的请求数，带宽按整个对象记录）
+        """
+        with self._lock:
+            stats = self._get(endpoint)
+            stats.in_flight += 1
+            concurrency = stats.in_flight
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            with self._lock:
+                stats.in_flight -= 1
+            raise
+        seconds = time.perf_counter() - start
+        with self._lock:
+            concurrency = max(concurrency, stats.in_flight)
+            stats.in_flight -= 1
+            if seconds <= 0:
+                return
+            if nbytes < LATENCY_SAMPLE_MAX_BYTES:
+                stats.latency = _ewma(stats.latency, seconds, stats.latency_samples)
+                stats.latency_samples += 1
+            elif record_bandwidth:
+                transfer = max(seconds - stats.latency, seconds * 0.1)
+                self._record(stats, concurrency, concurrency * nbytes / transfer)
+
+    def record_multipart(self, endpoint, nbytes, seconds, concurrency, rounds):
+        """
+        记录一次分片上传（从初始化到完成）的总字节数、耗时、并发数和分片轮数
+        """
+        if seconds <= 0 or nbytes < LATENCY_SAMPLE_MAX_BYTES:
+            return
+        with self._lock:
+            stats = self._get(endpoint)
+            transfer = max(seconds - (2 + rounds) * stats.latency, seconds * 0.1)
+            self._record(stats, concurrency, nbytes / transfer)
+
+    def _record(self, stats, concurrency, rate):
+        # 调用方需持有锁
+        sample = stats.bandwidth.setdefault(_nearest_level(concurrency), [0.0, 0])
+        sample[0] = _ewma(sample[0], rate, sample[1])
+        sample[1] += 1
+
+    def plan(self, endpoint, size):
+        """
+        为 size 字节的对象选择预计耗时最短的上传策略
+
+        预计耗时 = 请求延迟 × 请求轮数 + 大小 / 该并发档位的总带宽，分片上传另有初始化和完成
+        两次请求；同一 endpoint 上已在进行的请求占用并发额度。
+
+        Returns:
+            UploadPlan: 上传策略
+        """
+        with self._lock:
+            stats = self._stats.get(endpoint) or EndpointStats()
+            latency = stats.latency
+            rates = {level: stats.estimate(level) for level in ADAPTIVE_CONCURRENCY}
+            available = max(1, ADAPTIVE_MAX_STREAMS - stats.in_flight)
+
+        candidates = [UploadPlan(False, ADAPTIVE_PART_SIZES[-1], 1, latency + size / rates[1])]
+        if size >= ADAPTIVE_MIN_MULTIPART_SIZE:
+            for concurrency in ADAPTIVE_CONCURRENCY:
+                if concurrency > available:
+                    break
+                for part_size in ADAPTIVE_PART_SIZES:
+                    parts = math.ceil(size / part_size)
+                    if parts < concurrency or concurrency * part_size > ADAPTIVE_MAX_IN_FLIGHT:
+                        continue
+                    rounds = math.ceil(parts / concurrency)
+                    estimated = (2 + rounds) * latency + size / rates[concurrency]
+                    candidates.append(UploadPlan(True, part_size, concurrency, estimated))
+
+        # 在最优值附近选择并发更低、分片更大（请求更少）的策略
+        best = min(plan.estimated_seconds for plan in candidates)
+        acceptable = [plan for plan in candidates if plan.estimated_seconds <= best * (1 + ADAPTIVE_TOLERANCE)]
+        return min(acceptable, key=lambda plan: (plan.concurrency, plan.multipart, -plan.part_size))
+
+    def status(self):
+        """
+        获取各 endpoint 的估计值
+
+        Returns:
+            dict: {endpoint: {latency_ms, mb_per_second: {并发档位: 总带宽}, in_flight}}
+        """
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# 所有节点共享的吞吐量统计
+_THROUGHPUT_TRACKER = ThroughputTracker()
+
+
+def get_throughput_tracker():
+    """
+    获取进程级吞吐量统计
+
+    Returns:
+        ThroughputTracker: 共享的吞吐量统计
+    """
+    return _THROUGHPUT_TRACKER
+
+
+def plan_upload(bucket, data):
+    """
+    为待上传的数据选择上传策略
+
+    Args:
+        bucket: oss2.Bucket
+        data: bytes、BytesIO 或 UploadBuffer
+
+    Returns:
+        UploadPlan: 上传策略
+    """
+    return _THROUGHPUT_TRACKER.plan(bucket.endpoint, buffer_size(data))
@@ -0,0 +1,231 @@
+import io
+import json
+import tarfile
+import time
+from collections import deque
+
+from .oss_adaptive import plan_upload
+from .oss_buffer import UploadBuffer, buffer_size
+from .oss_encoder import get_buffer_pool, submit_encode
+from .oss_metrics import get_metrics
+from .oss_multipart import MultipartStreamWriter
+from .oss_queue import get_upload_queue
+from .oss_result import UploadResult, owns_buffer, STATUS_QUEUED, STATUS_SPOOLED, STATUS_UPLOADED
+from .oss_spool import get_spool
+from .oss_utils import uint8_to_pil
+
+# 节点输出方式：每张图片一个对象，或整批打包为一个归档对象
+OUTPUT_MODES = ["单独对象", "归档"]
+ARCHIVE_CONTENT_TYPE = "application/x-tar"
+# 归档第一个成员，内容为 "<索引偏移> <索引大小>"（ASCII，空格补齐到固定长度）
+ARCHIVE_POINTER_NAME = "index.offset"
+ARCHIVE_POINTER_SIZE = 32
+# 第一个成员的数据紧跟在512字节的 tar 头之后
+ARCHIVE_POINTER_OFFSET = tarfile.BLOCKSIZE
+# 归档最后一个成员：{"version": 1, "files": [[名称, 偏移, 大小], ...]}
+ARCHIVE_INDEX_NAME = "index.json"
+# 每个编码线程最多领先写入的图片数
+ARCHIVE_ENCODE_AHEAD = 2
+
+
+class ArchiveWriter:
+    """
+    tar 归档写入器，记录每个成员数据在归档中的字节偏移
+
+    归档是标准 tar，可直接用 tar 命令解开；同时第一个成员 index.offset 指向最后一个成员
+    index.json，读取方用两次范围请求即可拿到索引，再按偏移范围读取任意一张图片。
+    index.offset 先写占位内容，写完索引后回写，因此 fileobj 必须支持 seek：
+    MultipartStreamWriter 会把第1个分片保留到 close()，可以回写。
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.entries = []
+        self._tar = tarfile.open(fileobj=fileobj, mode="w", format=tarfile.PAX_FORMAT)
+        self._pointer_offset, _ = self._add(ARCHIVE_POINTER_NAME, io.BytesIO(b" " * ARCHIVE_POINTER_SIZE), ARCHIVE_POINTER_SIZE)
+
+    def _add(self, name, fileobj, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._tar.addfile(info, fileobj)
+        # 数据之后补齐到512字节，由结束位置倒推数据偏移（长文件名会多出 PAX 扩展头）
+        padded = (size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+        return self._tar.offset - padded, size
+
+    def add(self, name, data):
+        """
+        写入一个成员
+
+        Args:
+            name: 成员名
+            data: UploadBuffer、BytesIO 或 bytes
+
+        Returns:
+            tuple: (数据偏移, 大小)
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = io.BytesIO(data)
+        data.seek(0)
+        offset, size = self._add(name, data, buffer_size(data))
+        self.entries.append([name, offset, size])
+        return offset, size
+
+    def close(self):
+        """
+        写入索引和 tar 结束标记，回写索引位置
+
+        Returns:
+            tuple: 索引的 (偏移, 大小)
+        """
+        index = json.dumps({"version": 1, "files": self.entries}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        index_offset, index_size = self._add(ARCHIVE_INDEX_NAME, io.BytesIO(index), len(index))
+        self._tar.close()
+        end = self.fileobj.tell()
+        self.fileobj.seek(self._pointer_offset)
+        self.fileobj.write(f"{index_offset} {index_size}".ljust(ARCHIVE_POINTER_SIZE).encode("ascii"))
+        self.fileobj.seek(end)
+        return index_offset, index_size
+
+
+def byte_range(offset, size):
+    """
+    HTTP Range 请求头的值（结束位置包含在内）
+    """
+    return f"bytes={offset}-{offset + size - 1}"
+
+
+def write_image_archive(fileobj, frames, save_options, names, max_workers=4, results=None):
+    """
+    在共享编码线程池中编码图片，并按输入顺序写入归档
+
+    最多 max_workers × ARCHIVE_ENCODE_AHEAD 张图片领先于写入，编码缓冲区写入后立即归还，
+    内存占用与批次大小无关。
+
+    Args:
+        fileobj: 归档写入目标（MultipartStreamWriter 或 UploadBuffer）
+        frames: uint8 图像数组批次
+        save_options: build_save_options 生成的参数
+        names: 各图片的成员名
+        max_workers: 编码并发数
+        results: 与 names 等长的 UploadResult 列表，记录成员名、大小和字节范围
+
+    Returns:
+        tuple: 索引的 (偏移, 大小)
+    """
+    writer = ArchiveWriter(fileobj)
+    pool = get_buffer_pool()
+    window = max(1, max_workers) * ARCHIVE_ENCODE_AHEAD
+    pending = deque()
+    submitted = 0
+
+    def fill():
+        nonlocal submitted
+        while submitted < len(names) and len(pending) < window:
+            pending.append(submit_encode(uint8_to_pil(frames[submitted]), save_options))
+            submitted += 1
+
+    try:
+        fill()
+        for i, name in enumerate(names):
+            image_bytes = pending.popleft().result()
+            fill()
+            try:
+                offset, size = writer.add(name, image_bytes)
+            finally:
+                pool.release(image_bytes)
+            if results is not None:
+                results[i].member = name
+                results[i].bytes = size
+                results[i].range = byte_range(offset, size)
+        return writer.close()
+    finally:
+        # 出错时等待已提交的编码结束并归还缓冲区
+        for future in pending:
+            try:
+                pool.release(future.result())
+            except Exception:
+                pass
+
+
+def upload_image_archive(bucket, key, frames, save_options, names, max_workers=4, async_upload="否", spool_upload="否", node="OSSAutoUploadNode"):
+    """
+    将一批图片打包为一个 tar 对象上传
+
+    同步上传时边编码边通过分片上传发送；后台上传或本地暂存时先写入上传缓冲区（较大时转存临时文件），
+    再交给后台队列或暂存目录。
+
+    Args:
+        bucket: oss2.Bucket
+        key: 归档对象名
+        frames: uint8 图像数组批次
+        save_options: build_save_options 生成的参数
+        names: 各图片在归档中的成员名
+        max_workers: 编码并发数
+        async_upload: 后台上传（是/否）
+        spool_upload: 本地暂存（是/否），优先于后台上传
+        node: 指标中的节点名
+
+    Returns:
+        list: 每张图片一个 UploadResult，key 均为归档对象名，range 为该图片在归档中的字节范围
+    """
+    results = [UploadResult(key) for _ in names]
+    headers = {"Content-Type": ARCHIVE_CONTENT_TYPE}
+    metrics = get_metrics()
+    background = spool_upload == "是" or async_upload == "是"
+    target = UploadBuffer() if background else MultipartStreamWriter(bucket, key, headers=headers)
+    status = None
+    start = time.perf_counter()
+    try:
+        index_offset, index_size = write_image_archive(target, frames, save_options, names, max_workers, results)
+        write_seconds = time.perf_counter() - start
+        if spool_upload == "是":
+            get_spool().add(bucket, key, target, headers=headers, **plan_upload(bucket, target).queue_options())
+            status = STATUS_SPOOLED
+        elif async_upload == "是":
+            get_upload_queue().submit(bucket, key, target, headers=headers, **plan_upload(bucket, target).queue_options())
+            status = STATUS_QUEUED
+        else:
+            upload_start = time.perf_counter()
+            archive_size = target.close()
+            response = target.response
+            upload_seconds = time.perf_counter() - upload_start
+            status = STATUS_UPLOADED
+    except Exception:
+        if not background:
+            target.abort()
+        raise
+    finally:
+        if background and owns_buffer(status):
+            target.close()
+
+    print(f"归档 {key}: {len(names)} 张图片，索引位于 {byte_range(index_offset, index_size)}")
+    metrics.inc("objects_total", node=node, result=status)
+    for result in results:
+        result.status = status
+        # 编码、写入与分片上传同时进行，记为 archive_write
+        result.timings["archive_write"] = write_seconds
+        if status == STATUS_UPLOADED:
+            result.timings["upload"] = upload_seconds
+            result.record_response(response)
+    if status == STATUS_UPLOADED:
+        print(f"归档成功上传到 OSS，文件名为: {key}，大小 {archive_size / (1024*1024):.2f} MB")
+    return results
+
+
+def read_archive_index(bucket, key):
+    """
+    用两次范围请求读取归档索引
+
+    Args:
+        bucket: oss2.Bucket
+        key: 归档对象名
+
+    Returns:
+        dict: {成员名: (偏移, 大小)}，可用 bucket.get_object(key, byte_range=(偏移, 偏移 + 大小 - 1)) 读取单张图片
+    """
+    pointer = bucket.get_object(key, byte_range=(ARCHIVE_POINTER_OFFSET, ARCHIVE_POINTER_OFFSET + ARCHIVE_POINTER_SIZE - 1)).read()
+    index_offset, index_size = (int(value) for value in pointer.decode("ascii").split())
+    index = json.loads(bucket.get_object(key, byte_range=(index_offset, index_offset + index_size - 1)).read())
+    return {name: (offset, size) for name, offset, size in index["files"]}
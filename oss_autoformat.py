@@ -0,0 +1,258 @@
+import hashlib
+import io
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .oss_metrics import get_metrics
+from .oss_utils import IMAGE_FORMATS, uint8_to_pil
+
+# 高级节点 format 输入中的自动选择项
+AUTO_FORMAT = "AUTO"
+FORMAT_OPTIONS = IMAGE_FORMATS + [AUTO_FORMAT]
+
+# 试编码图块的边长和每边的图块数：从原图均匀取 2x2 个原分辨率图块拼成 256x256 的试编码图
+AUTO_TRIAL_TILE = 128
+AUTO_TRIAL_GRID = 2
+# 判断图片类型时的采样边长（隔行隔列取点，不做插值）
+AUTO_SAMPLE_SIZE = 128
+# 采样中颜色数不超过该值视为平面图（图标、文字、截图等），使用无损格式
+AUTO_FLAT_COLORS = 256
+# 设置了体积上限时，有损格式逐步降低质量的步长和最低质量
+AUTO_QUALITY_STEP = 10
+AUTO_MIN_QUALITY = 40
+# 试编码结果的缓存时间（秒）和条数
+AUTO_FORMAT_CACHE_SECONDS = 3600
+AUTO_FORMAT_CACHE_ENTRIES = 1024
+
+# 图片类型 -> 候选编码 (格式, 附加参数)
+IMAGE_CLASS_CANDIDATES = {
+    # 平面图：有损压缩会在色块边缘产生明显噪点，只比较无损格式
+    "flat": (("PNG", {}), ("WEBP", {"lossless": True})),
+    # 带透明通道的照片类图片：JPEG 不支持透明通道
+    "alpha": (("PNG", {}), ("WEBP", {})),
+    "photo": (("JPEG", {}), ("WEBP", {})),
+}
+
+
+def classify_image(frame):
+    """
+    按颜色数和透明通道将图片分为 flat、alpha、photo 三类
+
+    只在隔行隔列的采样点上判断，不做插值，大图也只需几毫秒。
+
+    Args:
+        frame: 形状为[H, W, C]的uint8数组
+
+    Returns:
+        str: 图片类型
+    """
+    height, width = frame.shape[:2]
+    step = max(1, max(height, width) // AUTO_SAMPLE_SIZE)
+    # 步长切片是视图，copy 后只有采样点大小
+    sample = frame[::step, ::step].copy()
+    if uint8_to_pil(sample).getcolors(AUTO_FLAT_COLORS) is not None:
+        return "flat"
+    return "alpha" if frame.ndim == 3 and frame.shape[-1] == 4 else "photo"
+
+
+def trial_mosaic(frame):
+    """
+    从原图均匀取若干原分辨率图块拼成试编码图
+
+    编码后的字节数主要取决于细节和噪点，缩小图会把这些平滑掉（照片类图片缩小后 WEBP 更小，
+    原图却是 JPEG 更小），因此不缩放，只取图块。图块边长是 16 的倍数，拼接处与 JPEG/WEBP
+    的编码块对齐。小于试编码图的图片直接使用原图。
+
+    Args:
+        frame: 形状为[H, W, C]的uint8数组
+
+    Returns:
+        numpy.ndarray: 拼接后的uint8数组
+    """
+    height, width = frame.shape[:2]
+    size = AUTO_TRIAL_TILE * AUTO_TRIAL_GRID
+    if height <= size and width <= size:
+        return frame
+    tile_h = min(AUTO_TRIAL_TILE, height // AUTO_TRIAL_GRID)
+    tile_w = min(AUTO_TRIAL_TILE, width // AUTO_TRIAL_GRID)
+    # 各图块取所在网格单元的中心
+    rows = [(height * (2 * r + 1)) // (2 * AUTO_TRIAL_GRID) - tile_h // 2 for r in range(AUTO_TRIAL_GRID)]
+    cols = [(width * (2 * c + 1)) // (2 * AUTO_TRIAL_GRID) - tile_w // 2 for c in range(AUTO_TRIAL_GRID)]
+    return np.concatenate([np.concatenate([frame[y:y + tile_h, x:x + tile_w] for x in cols], axis=1) for y in rows], axis=0)
+
+
+def workflow_identity(prompt=None, extra_pnginfo=None):
+    """
+    工作流标识，用于区分不同工作流中 unique_id 相同的节点
+
+    优先使用前端保存在 extra_pnginfo 中的工作流 id；没有时用提示词中各节点的 (id, class_type)
+    计算摘要，只修改种子、提示词等输入值时摘要不变。
+
+    Args:
+        prompt: 节点的隐藏输入 PROMPT
+        extra_pnginfo: 节点的隐藏输入 EXTRA_PNGINFO
+
+    Returns:
+        str: 工作流标识，两者都没有时返回 None
+    """
+    workflow = extra_pnginfo.get("workflow") if isinstance(extra_pnginfo, dict) else None
+    if isinstance(workflow, dict) and workflow.get("id"):
+        return f"id:{workflow['id']}"
+    if isinstance(prompt, dict) and prompt:
+        structure = sorted((str(node_id), str(node.get("class_type"))) for node_id, node in prompt.items() if isinstance(node, dict))
+        return "graph:" + hashlib.sha1(json.dumps(structure).encode("utf-8")).hexdigest()
+    return None
+
+
+def _encoded_size(image, save_options):
+    buffer = io.BytesIO()
+    image.save(buffer, **save_options)
+    return buffer.tell()
+
+
+class FormatChoice:
+    """
+    自动选择的编码：格式与附加的 save 参数（如 WEBP 无损）
+    """
+
+    def __init__(self, format, extra=None, image_class=None):
+        self.format = format
+        self.extra = extra or {}
+        self.image_class = image_class
+
+    def save_options(self, options_for):
+        """
+        生成所选编码的 save 参数
+
+        Args:
+            options_for: options_for(format) 返回该格式按节点设置（质量、预设、覆盖项）生成的 save 参数
+        """
+        return {**options_for(self.format), **self.extra}
+
+    def describe(self):
+        if self.extra.get("lossless"):
+            return f"{self.format}（无损）"
+        if "quality" in self.extra:
+            return f"{self.format}（质量{self.extra['quality']}）"
+        return self.format
+
+
+class FormatSelector:
+    """
+    AUTO 格式：按图片类型选择字节数最少的编码
+
+    每张图片先做廉价的类型判断（采样点上的颜色数和透明通道），再在原图的几个图块上用节点的质量
+    和预设试编码各候选格式，选择字节数最少者。设置了体积上限（max_bytes）且按试编码估算的整图
+    字节数超出时，有损候选逐步降低质量（最低 AUTO_MIN_QUALITY），选择满足上限的最高质量；
+    只有无损候选的平面图不降质。试编码结果按 (工作流, 节点, 图片类型, 编码设置, 体积上限) 缓存，
+    同一工作流后续批次的同类图片直接使用缓存结果；不同类型的图片（如照片与截图混合输出）
+    各自选择。
+    """
+
+    def __init__(self, ttl=AUTO_FORMAT_CACHE_SECONDS, max_entries=AUTO_FORMAT_CACHE_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._decisions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def choose(self, frame, options_for, workflow_key=None, max_bytes=None):
+        """
+        为一张图片选择编码
+
+        Args:
+            frame: 形状为[H, W, C]的uint8数组
+            options_for: options_for(format) 返回该格式按节点设置生成的 save 参数
+            workflow_key: 缓存键中工作流的部分（工作流标识、节点 unique_id 与编码设置），为 None 时不缓存
+            max_bytes: 单张图片编码后的目标字节数上限，None 表示不限制
+
+        Returns:
+            FormatChoice: 所选编码
+        """
+        metrics = get_metrics()
+        image_class = classify_image(frame)
+        # 体积上限按整图估算，缓存结果只对同尺寸的图片有效
+        budget_key = (max_bytes, frame.shape[:2]) if max_bytes else None
+        cache_key = (workflow_key, image_class, budget_key) if workflow_key is not None else None
+        now = time.monotonic()
+        if cache_key is not None:
+            with self._lock:
+                cached = self._decisions.get(cache_key)
+                if cached is not None and cached[1] > now:
+                    self._decisions.move_to_end(cache_key)
+                    metrics.inc("format_selection_total", format=cached[0].format, source="cached")
+                    return cached[0]
+
+        with metrics.timed("format_trial"):
+            mosaic = trial_mosaic(frame)
+            trial = uint8_to_pil(mosaic)
+            trials = []
+            for format, extra in IMAGE_CLASS_CANDIDATES[image_class]:
+                candidate = FormatChoice(format, extra, image_class)
+                trials.append((_encoded_size(trial, candidate.save_options(options_for)), candidate))
+            size, choice = min(trials, key=lambda item: item[0])
+            if max_bytes:
+                # 试编码图的字节数按像素数比例估算整图
+                scale = (frame.shape[0] * frame.shape[1]) / (mosaic.shape[0] * mosaic.shape[1])
+                if size * scale > max_bytes:
+                    reduced = self._fit_budget(trial, image_class, options_for, max_bytes / scale)
+                    if reduced is not None:
+                        trials.append(reduced)
+                        size, choice = reduced
+                    if size * scale > max_bytes:
+                        print(f"自动格式: 预计 {size * scale / 1024:.0f}KB，无法满足体积上限 {max_bytes / 1024:.0f}KB")
+        print(f"自动格式: {image_class} 类图片选择 {choice.describe()}（试编码字节数: "
+              f"{', '.join(f'{candidate.describe()}={size}' for size, candidate in trials)}）")
+        metrics.inc("format_selection_total", format=choice.format, source="trial")
+
+        if cache_key is not None:
+            with self._lock:
+                self._decisions[cache_key] = (choice, now + self.ttl)
+                self._decisions.move_to_end(cache_key)
+                while len(self._decisions) > self.max_entries:
+                    self._decisions.popitem(last=False)
+        return choice
+
+    def _fit_budget(self, trial, image_class, options_for, trial_budget):
+        """
+        逐步降低有损候选的质量，返回满足试编码字节数上限的最高质量编码；
+        降到最低质量仍不满足时返回最低质量中字节数最少者，没有有损候选时返回 None
+
+        Returns:
+            tuple: (试编码字节数, FormatChoice)
+        """
+        lossy = [(format, extra) for format, extra in IMAGE_CLASS_CANDIDATES[image_class]
+                 if format != "PNG" and not extra.get("lossless")]
+        if not lossy:
+            return None
+        quality = options_for(lossy[0][0]).get("quality", AUTO_MIN_QUALITY)
+        best = None
+        while quality > AUTO_MIN_QUALITY:
+            quality = max(AUTO_MIN_QUALITY, quality - AUTO_QUALITY_STEP)
+            candidates = [FormatChoice(format, {**extra, "quality": quality}, image_class) for format, extra in lossy]
+            best = min(((_encoded_size(trial, candidate.save_options(options_for)), candidate) for candidate in candidates),
+                       key=lambda item: item[0])
+            if best[0] <= trial_budget:
+                break
+        return best
+
+    def clear(self):
+        with self._lock:
+            self._decisions.clear()
+
+
+# 所有节点共享的格式选择缓存
+_FORMAT_SELECTOR = FormatSelector()
+
+
+def get_format_selector():
+    """
+    获取进程级格式选择器
+
+    Returns:
+        FormatSelector: 共享的格式选择器
+    """
+    return _FORMAT_SELECTOR
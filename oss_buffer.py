@@ -0,0 +1,237 @@
+import mmap
+import tempfile
+import threading
+
+# 新缓冲区的初始容量
+BUFFER_INITIAL_SIZE = 1024 * 1024
+# 内容超过该大小时改为写入临时文件，大对象不会在内存中保留两份
+BUFFER_SPILL_THRESHOLD = 64 * 1024 * 1024
+
+
+def buffer_size(data):
+    """
+    获取待上传数据的字节数，不复制内容
+
+    Args:
+        data: UploadBuffer、BytesIO、bytes、bytearray 或 memoryview
+
+    Returns:
+        int: 字节数
+    """
+    if isinstance(data, UploadBuffer):
+        return data.size
+    if hasattr(data, "getbuffer"):
+        with data.getbuffer() as view:
+            return view.nbytes
+    if isinstance(data, memoryview):
+        return data.nbytes
+    return len(data)
+
+
+class UploadBuffer:
+    """
+    上传缓冲区（可读写、可 seek 的类文件对象）
+
+    内容较小时保存在可复用的 bytearray 中，写入时复用已分配的容量；超过 spill_threshold 后
+    转存到临时文件，之后的写入直接写文件。size 属性不复制即可得到大小；内存中的内容由 read()
+    和 getbuffer() 以 memoryview 返回，临时文件由 read() 按块读取、getbuffer() 通过 mmap 映射，
+    交给 HTTP 层发送时不再额外复制整个对象。
+    """
+
+    def __init__(self, initial_size=BUFFER_INITIAL_SIZE, spill_threshold=BUFFER_SPILL_THRESHOLD, spill_dir=None):
+        self.initial_size = initial_size
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        self._data = bytearray(initial_size)
+        self._file = None
+        self._file_lock = threading.Lock()
+        self._mmap = None
+        self._view = None
+        self._size = 0
+        self._pos = 0
+        self._closed = False
+
+    @classmethod
+    def wrap(cls, data):
+        """
+        不复制地包装已有的 bytearray，作为可 seek 的请求体交给 oss2（oss2 不接受 bytearray）
+
+        Args:
+            data: bytearray，之后不应再修改
+
+        Returns:
+            UploadBuffer: 内容为 data 的缓冲区
+        """
+        buffer = cls(initial_size=0)
+        buffer._data = data
+        buffer._size = len(data)
+        return buffer
+
+    @property
+    def size(self):
+        """
+        当前内容的字节数
+        """
+        return self._size
+
+    @property
+    def capacity(self):
+        """
+        内存中已分配的容量（转存到临时文件后为 0）
+        """
+        return len(self._data) if self._data is not None else 0
+
+    @property
+    def spilled(self):
+        """
+        内容是否已转存到临时文件
+        """
+        return self._file is not None
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def reset(self):
+        """
+        清空内容以便复用；已转存到临时文件时关闭文件并恢复为内存缓冲区
+        """
+        if self._file is not None:
+            self._close_file()
+            self._data = bytearray(self.initial_size)
+        self._size = 0
+        self._pos = 0
+        self._closed = False
+
+    def write(self, data):
+        view = memoryview(data).cast('B')
+        end = self._pos + len(view)
+        if self._file is None and end > self.spill_threshold:
+            self._spill()
+        if self._file is not None:
+            self._release_map()
+            with self._file_lock:
+                self._file.seek(self._pos)
+                self._file.write(view)
+        else:
+            if end > len(self._data):
+                # 容量不足时按倍数扩容；分配新的 bytearray 再复制，read()/getbuffer() 返回的
+                # memoryview 仍存活时原地 extend 会抛出 BufferError
+                data = bytearray(min(max(end, len(self._data) * 2), self.spill_threshold))
+                data[:self._size] = memoryview(self._data)[:self._size]
+                self._data = data
+            self._data[self._pos:end] = view
+        self._pos = end
+        self._size = max(self._size, end)
+        return len(view)
+
+    def _spill(self):
+        self._file = tempfile.TemporaryFile(dir=self.spill_dir)
+        self._file.write(memoryview(self._data)[:self._size])
+        self._data = None
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            end = self._size
+        else:
+            end = min(self._size, self._pos + size)
+        start = min(self._pos, end)
+        self._pos = max(self._pos, end)
+        if self._file is not None:
+            # 顺序读取临时文件，只占用一个读取块的内存
+            with self._file_lock:
+                self._file.seek(start)
+                return self._file.read(end - start)
+        return memoryview(self._data)[start:end]
+
+    def read_at(self, offset, size):
+        """
+        读取指定范围的内容（不移动读写位置，可在多个线程中并发调用）
+
+        Returns:
+            bytes: 内容副本
+        """
+        end = min(self._size, offset + size)
+        if offset >= end:
+            return b""
+        if self._file is not None:
+            # Windows 没有 os.pread，用锁保护文件位置
+            with self._file_lock:
+                self._file.seek(offset)
+                return self._file.read(end - offset)
+        return bytes(memoryview(self._data)[offset:end])
+
+    def seek(self, offset, whence=0):
+        if whence == 0:
+            self._pos = offset
+        elif whence == 1:
+            self._pos += offset
+        elif whence == 2:
+            self._pos = self._size + offset
+        else:
+            raise ValueError(f"不支持的 whence: {whence}")
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def getbuffer(self):
+        """
+        返回内容的 memoryview（不复制）；临时文件在首次调用时映射到内存，写入后重新映射
+        """
+        if self._file is None:
+            return memoryview(self._data)[:self._size]
+        if self._view is None:
+            if self._size == 0:
+                return memoryview(b"")
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        return self._view[:self._size]
+
+    def _release_map(self):
+        if self._view is None:
+            return
+        self._view.release()
+        self._view = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 调用方仍持有切片时无法立即解除映射，由垃圾回收释放
+            pass
+        self._mmap = None
+
+    def _close_file(self):
+        self._release_map()
+        self._file.close()
+        self._file = None
+
+    def close(self):
+        """
+        释放内存和临时文件
+        """
+        if self._file is not None:
+            self._close_file()
+        self._data = bytearray()
+        self._size = 0
+        self._pos = 0
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .oss_retry import init_multipart_with_retry
+from .oss_utils import check_directory
+
+# 默认断点目录（插件目录下）
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".oss_checkpoints")
+# 超过该时长未更新的分片上传视为遗留任务
+STALE_UPLOAD_HOURS = 24
+# 同一个存储桶的遗留任务清理间隔（秒）
+JANITOR_INTERVAL_SECONDS = 3600
+
+_janitor_last_run = {}
+_janitor_lock = threading.Lock()
+
+
+def _normalize_etag(etag):
+    return (etag or "").strip('"').upper()
+
+
+class CheckpointStore:
+    """
+    分片上传断点存储，每个对象对应断点目录中的一个 JSON 文件
+    """
+
+    def __init__(self, checkpoint_dir=None):
+        self.checkpoint_dir = check_directory(checkpoint_dir or DEFAULT_CHECKPOINT_DIR)
+        self._lock = threading.Lock()
+
+    def _path(self, bucket_name, endpoint, key):
+        digest = hashlib.sha1(f"{endpoint}|{bucket_name}|{key}".encode('utf-8')).hexdigest()
+        return os.path.join(self.checkpoint_dir, f"{digest}.json")
+
+    def load(self, bucket_name, endpoint, key):
+        """
+        读取断点记录
+
+        Returns:
+            dict: 断点记录，不存在或损坏时返回 None
+        """
+        path = self._path(bucket_name, endpoint, key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, record):
+        """
+        原子写入断点记录
+        """
+        record["updated"] = time.time()
+        path = self._path(record["bucket"], record["endpoint"], record["key"])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+    def delete(self, bucket_name, endpoint, key):
+        """
+        删除断点记录
+        """
+        try:
+            os.remove(self._path(bucket_name, endpoint, key))
+        except FileNotFoundError:
+            pass
+
+    def records(self):
+        """
+        遍历所有断点记录
+
+        Yields:
+            dict: 断点记录
+        """
+        for name in os.listdir(self.checkpoint_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.checkpoint_dir, name), 'r', encoding='utf-8') as f:
+                    yield json.load(f)
+            except (OSError, ValueError):
+                continue
+
+
+class UploadCheckpoint:
+    """
+    单个对象的可续传分片上传
+
+    begin() 会优先复用断点中的 upload_id，并列出服务端已有的分片；
+    对于已存在且 ETag 与本次数据 MD5 一致的分片，uploaded_etag() 直接返回其 ETag，
+    调用方无需重新发送。
+    """
+
+    def __init__(self, store, bucket, key, part_size):
+        self.store = store
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.record = None
+        self.existing = {}
+        self._lock = threading.Lock()
+
+    @property
+    def upload_id(self):
+        return self.record["upload_id"] if self.record else None
+
+    def begin(self, headers=None):
+        """
+        恢复或新建分片上传
+
+        Args:
+            headers: 新建分片上传时的请求头
+
+        Returns:
+            str: upload_id
+        """
+        import oss2
+
+        bucket_name, endpoint = self.bucket.bucket_name, self.bucket.endpoint
+        record = self.store.load(bucket_name, endpoint, self.key)
+        if record and record.get("part_size") == self.part_size:
+            try:
+                self.existing = {
+                    part.part_number: _normalize_etag(part.etag)
+                    for part in oss2.PartIterator(self.bucket, self.key, record["upload_id"])
+                }
+                self.record = record
+                print(f"恢复分片上传: {self.key}，服务端已有 {len(self.existing)} 个分片")
+                return record["upload_id"]
+            except oss2.exceptions.NoSuchUpload:
+                print(f"断点中的分片上传已失效，重新开始: {self.key}")
+        elif record:
+            # 分片大小已改变（如修改了 part_size_mb），旧的分片无法复用；先取消旧的分片上传，
+            # 否则覆盖断点后它不再被记录，遗留任务清理也找不到它
+            try:
+                self.bucket.abort_multipart_upload(record["key"], record["upload_id"])
+                print(f"分片大小已改变，取消旧的分片上传并重新开始: {self.key}")
+            except oss2.exceptions.NoSuchUpload:
+                pass
+
+        upload_id = init_multipart_with_retry(self.bucket, self.key, headers=headers)
+        self.record = {
+            "bucket": bucket_name,
+            "endpoint": endpoint,
+            "key": self.key,
+            "upload_id": upload_id,
+            "part_size": self.part_size,
+            "parts": {},
+            "created": time.time(),
+        }
+        self.existing = {}
+        self.store.save(self.record)
+        return upload_id
+
+    def uploaded_etag(self, part_number, data):
+        """
+        若服务端已有内容相同的分片，返回其 ETag
+
+        Returns:
+            str: 已上传分片的 ETag，需要重新上传时返回 None
+        """
+        etag = self.existing.get(part_number)
+        if etag and etag == hashlib.md5(data).hexdigest().upper():
+            print(f"分片 {part_number} 已存在，跳过")
+            return etag
+        return None
+
+    def record_part(self, part_number, etag):
+        """
+        记录分片上传成功
+        """
+        with self._lock:
+            self.record["parts"][str(part_number)] = etag
+            self.store.save(self.record)
+
+    def finish(self):
+        """
+        分片上传完成后删除断点
+        """
+        self.store.delete(self.bucket.bucket_name, self.bucket.endpoint, self.key)
+
+
+def abort_stale_uploads(bucket, store, max_age_hours=STALE_UPLOAD_HOURS, force=False, sweep_prefix=None):
+    """
+    清理遗留的分片上传：只取消本插件记录在断点中、长时间未更新的任务
+
+    存储桶中其他工具或其他用户发起的分片上传不受影响，应通过 OSS 生命周期规则过期清理。
+    sweep_prefix 不为 None 时（需显式指定，默认关闭）额外取消存储桶中该前缀下所有超过
+    max_age_hours 的未完成分片上传；空字符串表示整个存储桶，使用前请确认该前缀只由本插件写入。
+
+    同一个存储桶每 JANITOR_INTERVAL_SECONDS 秒最多执行一次，force 为真时忽略该间隔。
+
+    Args:
+        bucket: oss2.Bucket
+        store: CheckpointStore
+        max_age_hours: 超过该时长视为遗留
+        force: 是否忽略执行间隔
+        sweep_prefix: 额外清理该前缀下未记录在断点中的分片上传，None 表示不清理
+
+    Returns:
+        int: 取消的分片上传数
+    """
+    import oss2
+
+    janitor_key = (bucket.endpoint, bucket.bucket_name, sweep_prefix)
+    now = time.time()
+    with _janitor_lock:
+        if not force and now - _janitor_last_run.get(janitor_key, 0) < JANITOR_INTERVAL_SECONDS:
+            return 0
+        _janitor_last_run[janitor_key] = now
+
+    cutoff = now - max_age_hours * 3600
+    aborted = set()
+    active = set()
+
+    for record in list(store.records()):
+        if record.get("bucket") != bucket.bucket_name or record.get("endpoint") != bucket.endpoint:
+            continue
+        if record.get("updated", 0) >= cutoff:
+            active.add(record.get("upload_id"))
+            continue
+        try:
+            bucket.abort_multipart_upload(record["key"], record["upload_id"])
+        except oss2.exceptions.NoSuchUpload:
+            pass
+        except oss2.exceptions.OssError as e:
+            print(f"清理遗留分片上传失败 {record['key']}: {e}")
+            continue
+        aborted.add(record["upload_id"])
+        store.delete(record["bucket"], record["endpoint"], record["key"])
+
+    if sweep_prefix is not None:
+        try:
+            for upload in oss2.MultipartUploadIterator(bucket, prefix=sweep_prefix):
+                if upload.upload_id in aborted or upload.upload_id in active or upload.initiation_date >= cutoff:
+                    continue
+                bucket.abort_multipart_upload(upload.key, upload.upload_id)
+                aborted.add(upload.upload_id)
+        except oss2.exceptions.OssError as e:
+            print(f"列举遗留分片上传失败: {e}")
+
+    if aborted:
+        print(f"已清理 {len(aborted)} 个遗留分片上传")
+    return len(aborted)
@@ -0,0 +1,122 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from .oss_endpoint import resolve_endpoint
+from .oss_spool import get_spool
+
+# 进程内最多缓存的 Bucket 数量
+BUCKET_POOL_MAX_SIZE = 32
+# Bucket 空闲多久（秒）后被回收
+BUCKET_POOL_IDLE_SECONDS = 600
+# 每个 Bucket 的 HTTP 连接池大小
+SESSION_POOL_SIZE = 16
+
+
+def _make_pool_key(access_key_id, access_key_secret, endpoint, bucket_name):
+    """
+    生成缓存键，secret 只以摘要形式参与，避免明文常驻在键中
+
+    Args:
+        access_key_id: 阿里云访问密钥ID
+        access_key_secret: 阿里云访问密钥Secret
+        endpoint: OSS终端节点
+        bucket_name: 存储桶名称
+
+    Returns:
+        tuple: 缓存键
+    """
+    secret_digest = hashlib.sha256(access_key_secret.encode('utf-8')).hexdigest()
+    return (access_key_id, secret_digest, endpoint, bucket_name)
+
+
+class BucketPool:
+    """
+    进程级 oss2.Bucket 缓存池
+
+    同一组 (access_key_id, endpoint, bucket_name) 复用同一个 Bucket 及其 keep-alive
+    连接池，避免每张图片都重新建立 TCP+TLS 连接。容量有上限，按 LRU 淘汰，
+    空闲超过 idle_seconds 的条目会被回收。
+    """
+
+    def __init__(self, max_size=BUCKET_POOL_MAX_SIZE, idle_seconds=BUCKET_POOL_IDLE_SECONDS, pool_size=SESSION_POOL_SIZE):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.pool_size = pool_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, access_key_id, access_key_secret, endpoint, bucket_name):
+        """
+        获取（或创建）一个共享的 Bucket
+
+        Args:
+            access_key_id: 阿里云访问密钥ID
+            access_key_secret: 阿里云访问密钥Secret
+            endpoint: OSS终端节点
+            bucket_name: 存储桶名称
+
+        Returns:
+            oss2.Bucket: 可在多线程间共享的 Bucket 对象
+        """
+        key = _make_pool_key(access_key_id, access_key_secret, endpoint, bucket_name)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._entries.move_to_end(key)
+                return entry[0]
+
+            # oss2（及其依赖）导入较慢，第一次创建 Bucket 时才加载，不拖慢 ComfyUI 启动
+            import oss2
+
+            auth = oss2.Auth(access_key_id, access_key_secret)
+            session = oss2.Session(pool_size=self.pool_size)
+            bucket = oss2.Bucket(auth, endpoint, bucket_name, session=session)
+            self._entries[key] = [bucket, now]
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return bucket
+
+    def _expire(self, now):
+        # 调用方需持有锁
+        stale = [key for key, (_, last_used) in self._entries.items() if now - last_used > self.idle_seconds]
+        for key in stale:
+            del self._entries[key]
+
+    def clear(self):
+        """
+        清空缓存池
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# 所有节点共享的缓存池
+_BUCKET_POOL = BucketPool()
+
+
+def get_bucket(access_key_id, access_key_secret, endpoint, bucket_name):
+    """
+    从进程级缓存池获取 Bucket
+
+    Args:
+        access_key_id: 阿里云访问密钥ID
+        access_key_secret: 阿里云访问密钥Secret
+        endpoint: OSS终端节点，"auto:<地域>" 时自动选择内网或公网端点
+        bucket_name: 存储桶名称
+
+    Returns:
+        oss2.Bucket: 共享的 Bucket 对象
+    """
+    bucket = _BUCKET_POOL.get(access_key_id, access_key_secret, resolve_endpoint(endpoint), bucket_name)
+    # 暂存目录中上次运行遗留的同名存储桶对象需要凭证才能继续上传
+    get_spool().register_bucket(bucket)
+    return bucket
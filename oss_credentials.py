@@ -0,0 +1,177 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from .oss_endpoint import resolve_endpoint
+from .oss_metrics import get_metrics
+from .oss_ratelimit import get_rate_limiter
+
+# 设为 0 时校验阶段不访问 OSS，只检查参数是否为空
+ENV_VALIDATE_CREDENTIALS = "OSS_UPLOAD_VALIDATE_CREDENTIALS"
+# 校验结果的缓存时间（秒）：通过的结果缓存较久，失败的结果较短，方便修正配置（如新建存储桶）后重试
+CREDENTIAL_VALID_SECONDS = 600
+CREDENTIAL_INVALID_SECONDS = 60
+# 网络错误、超时等未能确认时的缓存时间（秒），OSS 故障期间每次提交都不再重复探测
+CREDENTIAL_SKIPPED_SECONDS = 30
+# 校验请求的连接超时（秒），请求在后台线程中进行
+CREDENTIAL_CHECK_TIMEOUT = 3
+# 提交时最多等待后台校验结果的时间（秒），超时则放行，结果留给下次提交使用
+CREDENTIAL_WAIT_SECONDS = 1.0
+# 校验时 HEAD 的对象名，对象不存在即说明凭证和存储桶都有效
+CREDENTIAL_PROBE_KEY = ".oss-upload-credential-check"
+# 说明配置错误的错误码及提示
+INVALID_CREDENTIAL_CODES = {
+    "InvalidAccessKeyId": "AccessKey ID 不存在或已禁用",
+    "SignatureDoesNotMatch": "AccessKey Secret 不正确",
+    "NoSuchBucket": "存储桶不存在",
+    "InvalidBucketName": "存储桶名称不合法",
+}
+
+
+def mask_key(access_key_id):
+    """
+    打印用的 AccessKey ID，只保留首尾各4位
+    """
+    if not access_key_id or len(access_key_id) <= 8:
+        return "****"
+    return f"{access_key_id[:4]}****{access_key_id[-4:]}"
+
+
+def _make_cache_key(access_key_id, access_key_secret, endpoint, bucket_name):
+    # 缓存中只保存摘要，不保存明文凭证
+    return hashlib.sha256("\0".join((access_key_id, access_key_secret, endpoint, bucket_name)).encode("utf-8")).hexdigest()
+
+
+class CredentialValidator:
+    """
+    节点校验阶段的凭证与存储桶检查
+
+    对每组 (AccessKey, endpoint, 存储桶) 发一个 HEAD 请求，结果按 TTL 缓存，之后的提交直接使用
+    缓存结果，不再访问 OSS。只有确定是配置错误（AccessKey 不存在、签名不匹配、存储桶不存在）
+    时才拒绝提交；网络错误、超时、5xx 时放行，由上传阶段的重试处理，并短时间缓存。
+    AccessDenied 说明凭证有效但没有读权限（如只授权了 PutObject 的 RAM 用户），同样放行。
+
+    HEAD 请求（及 auto 端点的探测）在后台线程中进行，提交最多等待 CREDENTIAL_WAIT_SECONDS 秒；
+    OSS 响应慢时先放行，结果写入缓存供之后的提交使用。同一组参数同时只有一个请求在进行。
+    """
+
+    def __init__(self, enabled=True, wait_seconds=CREDENTIAL_WAIT_SECONDS):
+        self.enabled = enabled
+        self.wait_seconds = wait_seconds
+        self._cache = {}
+        self._pending = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def validate(self, access_key_id, access_key_secret, endpoint, bucket_name):
+        """
+        校验凭证和存储桶
+
+        Returns:
+            True 或错误信息字符串（ComfyUI VALIDATE_INPUTS 的返回约定）
+        """
+        if not self.enabled:
+            return True
+        cache_key = _make_cache_key(access_key_id, access_key_secret, endpoint, bucket_name)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None and cached[1] > now:
+                get_metrics().inc("credential_checks_total", result="cached")
+                return cached[0]
+            future = self._pending.get(cache_key)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="oss-credential")
+                future = self._executor.submit(self._run, cache_key, access_key_id, access_key_secret, endpoint, bucket_name)
+                self._pending[cache_key] = future
+
+        try:
+            return future.result(timeout=self.wait_seconds)
+        except FutureTimeoutError:
+            print(f"OSS 凭证校验未在 {self.wait_seconds} 秒内完成，先放行，结果在后台缓存")
+            get_metrics().inc("credential_checks_total", result="pending")
+            return True
+
+    def _run(self, cache_key, access_key_id, access_key_secret, endpoint, bucket_name):
+        """
+        在后台线程中校验并写入缓存
+        """
+        try:
+            with get_metrics().timed("credential_check"):
+                verdict, ttl, outcome = self._check(access_key_id, access_key_secret, endpoint, bucket_name)
+        except Exception as e:
+            print(f"OSS 凭证校验出错，跳过校验: {e}")
+            verdict, ttl, outcome = True, CREDENTIAL_SKIPPED_SECONDS, "skipped"
+        get_metrics().inc("credential_checks_total", result=outcome)
+        with self._lock:
+            self._cache[cache_key] = (verdict, time.monotonic() + ttl)
+            self._pending.pop(cache_key, None)
+        return verdict
+
+    def _check(self, access_key_id, access_key_secret, endpoint, bucket_name):
+        """
+        Returns:
+            tuple: (True 或错误信息, 缓存秒数, 结果类别 valid/invalid/skipped)
+        """
+        import oss2
+
+        try:
+            # 单独创建短超时的 Bucket，不放入缓存池，也不向本地暂存目录登记未经确认的凭证
+            bucket = oss2.Bucket(oss2.Auth(access_key_id, access_key_secret), resolve_endpoint(endpoint), bucket_name,
+                                 connect_timeout=CREDENTIAL_CHECK_TIMEOUT)
+        except oss2.exceptions.ClientError as e:
+            return f"OSS 参数不正确: {e}", CREDENTIAL_INVALID_SECONDS, "invalid"
+
+        try:
+            get_rate_limiter().acquire_request(bucket)
+            bucket.object_exists(CREDENTIAL_PROBE_KEY)
+        except oss2.exceptions.ServerError as e:
+            message = INVALID_CREDENTIAL_CODES.get(e.code)
+            if message is not None:
+                print(f"OSS 凭证校验失败: {mask_key(access_key_id)} @ {bucket_name}.{endpoint}: {message}")
+                return f"{message}（{e.code}）: 存储桶 {bucket_name}，endpoint {endpoint}", CREDENTIAL_INVALID_SECONDS, "invalid"
+            if e.code == "AccessDenied":
+                # 凭证有效，只是没有读权限
+                return True, CREDENTIAL_VALID_SECONDS, "valid"
+            print(f"OSS 凭证校验请求失败，跳过校验: {e.status} {e.code}")
+            return True, CREDENTIAL_SKIPPED_SECONDS, "skipped"
+        except oss2.exceptions.RequestError as e:
+            print(f"OSS 凭证校验无法连接，跳过校验: {e}")
+            return True, CREDENTIAL_SKIPPED_SECONDS, "skipped"
+        return True, CREDENTIAL_VALID_SECONDS, "valid"
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._pending.clear()
+
+
+# 所有节点共享的校验结果缓存
+_CREDENTIAL_VALIDATOR = CredentialValidator(enabled=os.environ.get(ENV_VALIDATE_CREDENTIALS, "1") != "0")
+
+
+def get_credential_validator():
+    """
+    获取进程级凭证校验器
+
+    Returns:
+        CredentialValidator: 共享的校验器
+    """
+    return _CREDENTIAL_VALIDATOR
+
+
+def validate_credentials(access_key_id, access_key_secret, endpoint, bucket_name):
+    """
+    VALIDATE_INPUTS 使用：检查凭证和存储桶，结果按 TTL 缓存
+
+    参数来自连线（校验时尚无值）时跳过检查。
+
+    Returns:
+        True 或错误信息字符串
+    """
+    if not all(isinstance(value, str) and value for value in (access_key_id, access_key_secret, endpoint, bucket_name)):
+        return True
+    return _CREDENTIAL_VALIDATOR.validate(access_key_id, access_key_secret, endpoint, bucket_name)
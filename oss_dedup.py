@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from .oss_endpoint import endpoint_region
+from .oss_ratelimit import get_rate_limiter
+from .oss_utils import check_directory
+
+# 默认去重索引目录（插件目录下）
+DEFAULT_DEDUP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".oss_dedup")
+# 内存中 LRU 缓存的对象数
+DEDUP_MEMORY_ENTRIES = 100000
+# 对象名中使用的哈希长度（十六进制字符数）
+CONTENT_HASH_LENGTH = 32
+
+
+def content_hash(data):
+    """
+    计算对象内容的哈希
+
+    Args:
+        data: bytes、bytearray 或 memoryview
+
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_key(folder, prefix, digest, ext):
+    """
+    根据内容哈希生成对象名，相同内容总是得到相同的对象名
+
+    Args:
+        folder: 已格式化的文件夹路径
+        prefix: 文件名前缀
+        digest: 内容哈希
+        ext: 文件扩展名
+
+    Returns:
+        str: 对象名
+    """
+    return f"{folder}{prefix}_{digest[:CONTENT_HASH_LENGTH]}.{ext}"
+
+
+def _bucket_id(bucket):
+    # 按地域而不是实际端点区分：auto 模式在内网与公网端点间切换时索引仍然命中
+    return f"{endpoint_region(bucket.endpoint)}|{bucket.bucket_name}"
+
+
+class DedupIndex:
+    """
+    已上传对象索引：内存 LRU + 本地 SQLite，未命中时用 HEAD 请求确认
+    """
+
+    def __init__(self, index_dir=DEFAULT_DEDUP_DIR, memory_entries=DEDUP_MEMORY_ENTRIES):
+        self.index_dir = index_dir
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # 调用方需持有锁
+        if self._db is None:
+            import sqlite3
+
+            path = os.path.join(check_directory(self.index_dir), "index.sqlite3")
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS uploaded (bucket TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (bucket, key))")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, entry):
+        # 调用方需持有锁
+        self._memory[entry] = True
+        self._memory.move_to_end(entry)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def contains(self, bucket, key):
+        """
+        判断对象是否已在存储桶中
+
+        Args:
+            bucket: oss2.Bucket
+            key: 对象名
+
+        Returns:
+            bool: 是否已存在
+        """
+        entry = (_bucket_id(bucket), key)
+        with self._lock:
+            if entry in self._memory:
+                self._memory.move_to_end(entry)
+                return True
+            row = self._connection().execute("SELECT 1 FROM uploaded WHERE bucket = ? AND key = ?", entry).fetchone()
+            if row is not None:
+                self._remember(entry)
+                return True
+
+        # 本地索引未命中，向服务端确认
+        get_rate_limiter().acquire_request(bucket)
+        if bucket.object_exists(key):
+            self.add(bucket, key)
+            return True
+        return False
+
+    def add(self, bucket, key):
+        """
+        记录对象已上传
+
+        Args:
+            bucket: oss2.Bucket
+            key: 对象名
+        """
+        entry = (_bucket_id(bucket), key)
+        with self._lock:
+            self._remember(entry)
+            db = self._connection()
+            db.execute("INSERT OR IGNORE INTO uploaded (bucket, key) VALUES (?, ?)", entry)
+            db.commit()
+
+
+# 所有节点共享的去重索引
+_DEDUP_INDEX = DedupIndex()
+
+
+def get_dedup_index():
+    """
+    获取进程级去重索引
+
+    Returns:
+        DedupIndex: 共享的去重索引
+    """
+    return _DEDUP_INDEX
@@ -0,0 +1,197 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .oss_encoder import build_save_options, get_buffer_pool, submit_encode
+from .oss_metrics import get_metrics
+from .oss_result import UploadResult, owns_buffer
+from .oss_utils import IMAGE_FORMATS, uint8_to_pil
+
+# 衍生图规格中省略格式/质量时的默认值
+DEFAULT_DERIVATIVE_FORMAT = "WEBP"
+DEFAULT_DERIVATIVE_QUALITY = 80
+# 衍生图最长边的取值范围（像素）
+MIN_DERIVATIVE_SIZE = 16
+MAX_DERIVATIVE_SIZE = 8192
+# 衍生图上传线程数（与原图上传并发进行）
+DERIVATIVE_UPLOAD_WORKERS = 8
+# 格式 -> 文件扩展名，未列出的格式使用格式名的小写；JPEG 与基本节点原图一致使用 .jpg
+DERIVATIVE_EXTENSIONS = {"JPEG": "jpg"}
+
+
+class Derivative:
+    """
+    一种衍生图规格：最长边、格式和质量
+    """
+
+    def __init__(self, size, format=DEFAULT_DERIVATIVE_FORMAT, quality=DEFAULT_DERIVATIVE_QUALITY):
+        self.size = size
+        self.format = format
+        self.quality = quality
+
+    @property
+    def name(self):
+        return f"{self.size}:{self.format}"
+
+    def key_for(self, original_key):
+        """
+        由原图对象名生成衍生图对象名：[原对象名去掉扩展名]_[最长边].[扩展名]
+        """
+        stem, _ = os.path.splitext(original_key)
+        return f"{stem}_{self.size}.{DERIVATIVE_EXTENSIONS.get(self.format, self.format.lower())}"
+
+    def save_options(self, preset="快速"):
+        return build_save_options(self.format, self.quality, preset)
+
+
+def parse_derivatives(spec):
+    """
+    解析衍生图规格，如 "256:WEBP:80, 1024:JPEG:85"
+
+    每项为 最长边[:格式[:质量]]，以逗号分隔；格式默认 WEBP，质量默认80。
+
+    Args:
+        spec: 规格字符串，为空时不生成衍生图
+
+    Returns:
+        list: Derivative 列表
+
+    Raises:
+        ValueError: 规格格式错误
+    """
+    derivatives = []
+    seen = set()
+    for item in re.split(r"[,，;；\s]+", (spec or "").strip()):
+        if not item:
+            continue
+        parts = item.split(":")
+        if len(parts) > 3:
+            raise ValueError(f"衍生图规格格式错误: {item}，应为 最长边[:格式[:质量]]")
+        try:
+            size = int(parts[0])
+            quality = int(parts[2]) if len(parts) > 2 else DEFAULT_DERIVATIVE_QUALITY
+        except ValueError:
+            raise ValueError(f"衍生图规格格式错误: {item}，最长边和质量应为整数")
+        format = parts[1].upper() if len(parts) > 1 else DEFAULT_DERIVATIVE_FORMAT
+        if format == "JPG":
+            format = "JPEG"
+        if format not in IMAGE_FORMATS:
+            raise ValueError(f"衍生图格式不支持: {item}，可选 {', '.join(IMAGE_FORMATS)}")
+        if not MIN_DERIVATIVE_SIZE <= size <= MAX_DERIVATIVE_SIZE:
+            raise ValueError(f"衍生图最长边应为 {MIN_DERIVATIVE_SIZE}-{MAX_DERIVATIVE_SIZE}: {item}")
+        if not 1 <= quality <= 100:
+            raise ValueError(f"衍生图质量应为1-100: {item}")
+        if (size, format) in seen:
+            raise ValueError(f"衍生图规格重复: {item}")
+        seen.add((size, format))
+        derivatives.append(Derivative(size, format, quality))
+    return derivatives
+
+
+_UPLOAD_EXECUTOR = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _UPLOAD_EXECUTOR
+    with _executor_lock:
+        if _UPLOAD_EXECUTOR is None:
+            _UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=DERIVATIVE_UPLOAD_WORKERS, thread_name_prefix="oss-derivative")
+        return _UPLOAD_EXECUTOR
+
+
+class DerivativeUploads:
+    """
+    一张图片的全部衍生图
+
+    创建时即在编码线程池中提交缩放和编码（与原图编码并行，直接使用原图的 uint8 视图，
+    不再做张量转换）；原图对象名确定后调用 upload()，衍生图在单独的线程池中上传，与原图上传
+    同时进行；results() 等待全部结束。每个衍生图独立成功或失败，不影响原图。
+    """
+
+    def __init__(self, frame, derivatives, preset="快速", node="OSSAutoUploadNode"):
+        self.derivatives = derivatives
+        self.node = node
+        # 每个衍生图使用各自的零拷贝 PIL 视图，编码线程之间不共享 PIL 对象
+        self._encodes = [submit_encode(uint8_to_pil(frame), derivative.save_options(preset), max_size=derivative.size)
+                         for derivative in derivatives]
+        self._uploads = None
+
+    def upload(self, original_key, put):
+        """
+        开始上传衍生图
+
+        Args:
+            original_key: 原图对象名，衍生图对象名由它生成
+            put: put(image_bytes, key, result)，按节点的上传方式（同步/后台/暂存/去重）上传单个对象
+        """
+        executor = _get_executor()
+        self._uploads = [executor.submit(self._upload_one, encode, derivative, derivative.key_for(original_key), put)
+                         for encode, derivative in zip(self._encodes, self.derivatives)]
+
+    def _upload_one(self, encode, derivative, key, put):
+        result = UploadResult(key)
+        result.variant = derivative.name
+        image_bytes = None
+        try:
+            image_bytes = encode.result()
+            result.bytes = image_bytes.size
+            print(f"正在上传衍生图: {key}")
+            put(image_bytes, key, result)
+        except Exception as e:
+            error_msg = f"衍生图上传失败 {key}: {str(e)}"
+            print(error_msg)
+            get_metrics().inc("objects_total", node=self.node, result="failed")
+            result.fail(error_msg)
+        finally:
+            if image_bytes is not None and owns_buffer(result.status):
+                get_buffer_pool().release(image_bytes)
+        return result
+
+    def results(self, error=None):
+        """
+        等待衍生图上传结束
+
+        Args:
+            error: 未调用 upload()（原图编码或命名失败）时记录的错误信息
+
+        Returns:
+            list: 与规格顺序一致的 UploadResult 列表
+        """
+        if self._uploads is not None:
+            return [future.result() for future in self._uploads]
+
+        results = []
+        for encode, derivative in zip(self._encodes, self.derivatives):
+            try:
+                get_buffer_pool().release(encode.result())
+            except Exception:
+                pass
+            result = UploadResult()
+            result.variant = derivative.name
+            result.fail(f"原图失败，未上传衍生图: {error}")
+            results.append(result)
+        return results
+
+
+def collect_keys(results):
+    """
+    成功的原图和衍生图对象名，用于批量生成URL
+    """
+    keys = []
+    for result in results:
+        if result.error is None:
+            keys.append(result.key)
+        keys.extend(derivative.key for derivative in result.derivatives if derivative.error is None)
+    return keys
+
+
+def assign_urls(results, urls):
+    """
+    将批量生成的URL写回原图和衍生图的结果
+    """
+    for result in results:
+        for item in [result, *result.derivatives]:
+            if item.error is None:
+                item.url = urls[item.key]
@@ -0,0 +1,215 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .oss_buffer import UploadBuffer
+from .oss_metrics import get_metrics
+
+# 编码预设：默认使用"快速"，PNG 默认压缩级别(6)在大图上非常慢
+ENCODE_PRESETS = {
+    "快速": {
+        "png_compress_level": 1,
+        "webp_method": 1,
+        "jpeg_optimize": False,
+        "jpeg_progressive": False,
+        "jpeg_subsampling": "4:2:0",
+    },
+    "均衡": {
+        "png_compress_level": 6,
+        "webp_method": 4,
+        "jpeg_optimize": True,
+        "jpeg_progressive": False,
+        "jpeg_subsampling": "4:2:0",
+    },
+    "最小体积": {
+        "png_compress_level": 9,
+        "webp_method": 6,
+        "jpeg_optimize": True,
+        "jpeg_progressive": True,
+        "jpeg_subsampling": "4:2:0",
+    },
+}
+
+ENCODE_PRESET_NAMES = list(ENCODE_PRESETS.keys())
+
+# 可覆盖预设的选项值，"预设"表示跟随预设
+BOOL_OVERRIDE_OPTIONS = ["预设", "是", "否"]
+JPEG_SUBSAMPLING_OPTIONS = ["预设", "4:4:4", "4:2:2", "4:2:0"]
+
+# 编码线程数（Pillow 编码时会释放 GIL）
+ENCODE_WORKERS = os.cpu_count() or 4
+# 缓冲池最多保留的缓冲区数量
+BUFFER_POOL_SIZE = 32
+# 扩容超过该容量的缓冲区（如大尺寸 PNG）不放回缓冲池，用完即释放
+BUFFER_POOL_MAX_BUFFER_BYTES = 4 * 1024 * 1024
+# 缓冲池中保留的缓冲区总容量上限
+BUFFER_POOL_MAX_BYTES = 32 * 1024 * 1024
+
+
+def build_save_options(format, quality=90, preset="快速", png_compress_level=-1, webp_method=-1,
+                       jpeg_optimize="预设", jpeg_progressive="预设", jpeg_subsampling="预设"):
+    """
+    根据格式、预设和覆盖项生成 PIL.Image.save 的参数
+
+    Args:
+        format: 图片格式（JPEG、PNG、WEBP）
+        quality: 图片质量（PNG 忽略）
+        preset: 编码预设名称
+        png_compress_level: PNG 压缩级别 0-9，-1 表示跟随预设
+        webp_method: WEBP 编码方法 0-6，-1 表示跟随预设
+        jpeg_optimize: JPEG 是否优化哈夫曼表（预设/是/否）
+        jpeg_progressive: JPEG 是否渐进式（预设/是/否）
+        jpeg_subsampling: JPEG 色度抽样（预设/4:4:4/4:2:2/4:2:0）
+
+    Returns:
+        dict: save 参数
+    """
+    settings = ENCODE_PRESETS.get(preset, ENCODE_PRESETS["快速"])
+
+    if format == "PNG":
+        level = png_compress_level if png_compress_level >= 0 else settings["png_compress_level"]
+        return {"format": format, "compress_level": level}
+
+    if format == "WEBP":
+        method = webp_method if webp_method >= 0 else settings["webp_method"]
+        return {"format": format, "quality": quality, "method": method}
+
+    if format == "JPEG":
+        return {
+            "format": format,
+            "quality": quality,
+            "optimize": settings["jpeg_optimize"] if jpeg_optimize == "预设" else jpeg_optimize == "是",
+            "progressive": settings["jpeg_progressive"] if jpeg_progressive == "预设" else jpeg_progressive == "是",
+            "subsampling": settings["jpeg_subsampling"] if jpeg_subsampling == "预设" else jpeg_subsampling,
+        }
+
+    return {"format": format, "quality": quality}
+
+
+class BufferPool:
+    """
+    编码缓冲区池，复用已扩容到合适大小的缓冲区
+
+    只保留容量不超过 max_buffer_bytes 的缓冲区，且总容量不超过 max_bytes；
+    一批大图用过的大缓冲区直接释放，不会在进程生命周期内一直占用内存。
+    """
+
+    def __init__(self, max_buffers=BUFFER_POOL_SIZE, max_buffer_bytes=BUFFER_POOL_MAX_BUFFER_BYTES, max_bytes=BUFFER_POOL_MAX_BYTES):
+        self.max_buffers = max_buffers
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_bytes = max_bytes
+        self._buffers = []
+        self._pooled_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pooled_bytes(self):
+        """
+        缓冲池中保留的缓冲区总容量
+        """
+        return self._pooled_bytes
+
+    def acquire(self):
+        with self._lock:
+            if self._buffers:
+                buffer = self._buffers.pop()
+                self._pooled_bytes -= buffer.capacity
+                buffer.reset()
+                return buffer
+        return UploadBuffer()
+
+    def release(self, buffer):
+        capacity = buffer.capacity
+        # 已转存到临时文件（容量为 0）或扩容过大的缓冲区不复用
+        if not buffer.spilled and capacity <= self.max_buffer_bytes:
+            with self._lock:
+                if len(self._buffers) < self.max_buffers and self._pooled_bytes + capacity <= self.max_bytes:
+                    self._buffers.append(buffer)
+                    self._pooled_bytes += capacity
+                    return
+        buffer.close()
+
+
+_BUFFER_POOL = BufferPool()
+_ENCODE_EXECUTOR = None
+_executor_lock = threading.Lock()
+
+
+def get_buffer_pool():
+    """
+    获取进程级编码缓冲区池
+
+    Returns:
+        BufferPool: 共享的缓冲区池
+    """
+    return _BUFFER_POOL
+
+
+def _get_executor():
+    global _ENCODE_EXECUTOR
+    with _executor_lock:
+        if _ENCODE_EXECUTOR is None:
+            _ENCODE_EXECUTOR = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="oss-encode")
+        return _ENCODE_EXECUTOR
+
+
+def fit_image(pil_img, max_size):
+    """
+    等比缩小到最长边不超过 max_size，不放大
+
+    先按整数倍快速缩小（reducing_gap），再用 LANCZOS 插值，大图生成缩略图时比直接 LANCZOS 快数倍。
+
+    Args:
+        pil_img: PIL图像对象
+        max_size: 最长边像素数
+
+    Returns:
+        PIL.Image: 缩小后的新图像，无需缩小时返回原图像
+    """
+    from PIL import Image
+
+    width, height = pil_img.size
+    scale = max_size / max(width, height)
+    if scale >= 1:
+        return pil_img
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return pil_img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def encode_image(pil_img, save_options, buffer=None, max_size=None):
+    """
+    将 PIL 图像编码到缓冲区
+
+    Args:
+        pil_img: PIL图像对象
+        save_options: build_save_options 生成的参数
+        buffer: 目标缓冲区，为 None 时从缓冲区池获取
+        max_size: 编码前先等比缩小到最长边不超过该值（衍生图），为 None 时不缩放
+
+    Returns:
+        UploadBuffer: 已定位到开头的缓冲区，用完后应交还 get_buffer_pool().release()
+    """
+    if max_size is not None:
+        with get_metrics().timed("resize"):
+            pil_img = fit_image(pil_img, max_size)
+    if buffer is None:
+        buffer = _BUFFER_POOL.acquire()
+    with get_metrics().timed("encode"):
+        pil_img.save(buffer, **save_options)
+    buffer.seek(0)
+    return buffer
+
+
+def submit_encode(pil_img, save_options, max_size=None):
+    """
+    在共享编码线程池中编码图像
+
+    Args:
+        pil_img: PIL图像对象
+        save_options: build_save_options 生成的参数
+        max_size: 编码前等比缩小到最长边不超过该值，为 None 时不缩放
+
+    Returns:
+        concurrent.futures.Future: 结果为 UploadBuffer
+    """
+    return _get_executor().submit(encode_image, pil_img, save_options, None, max_size)
@@ -0,0 +1,237 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+
+from .oss_metrics import get_metrics
+from .oss_retry import get_breaker
+from .oss_utils import AUTO_ENDPOINT_PREFIX
+
+# 选中的端点缓存时长（秒）
+ENDPOINT_CACHE_TTL = 600
+# 所有候选都不可达时，回退到公网端点后多久重新探测（秒）
+ENDPOINT_FALLBACK_TTL = 60
+# 单个候选的 TCP 连接超时（秒）
+PROBE_TIMEOUT = 1.0
+# 靠前的候选（内网）只要不比最快的慢这么多（秒）就优先使用，内网流量不收费
+PREFERENCE_MARGIN = 0.05
+# 阿里云 OSS 端点的域名后缀与内网端点的地域后缀
+ALIYUN_DOMAIN = ".aliyuncs.com"
+INTERNAL_SUFFIX = "-internal"
+
+
+def is_auto_endpoint(endpoint):
+    return endpoint.startswith(AUTO_ENDPOINT_PREFIX)
+
+
+def _split_endpoint(endpoint):
+    """
+    解析端点的主机与端口，端口按 oss2 的默认协议推断（无协议前缀时为 http）
+    """
+    parts = urlsplit(endpoint if "://" in endpoint else f"http://{endpoint}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return parts.hostname, port
+
+
+def endpoint_region(endpoint):
+    """
+    端点所在的地域：同一地域的内网与公网端点（及 http/https）得到相同结果
+
+    Args:
+        endpoint: 端点（可带协议和端口），如 "http://oss-cn-hangzhou-internal.aliyuncs.com"
+
+    Returns:
+        str: 阿里云端点为地域名（如 "oss-cn-hangzhou"），其他端点为 "主机:端口"
+    """
+    host, port = _split_endpoint(endpoint)
+    if host.endswith(ALIYUN_DOMAIN):
+        region = host[:-len(ALIYUN_DOMAIN)]
+        return region[:-len(INTERNAL_SUFFIX)] if region.endswith(INTERNAL_SUFFIX) else region
+    return f"{host}:{port}"
+
+
+def _breaker_key(endpoint):
+    # 与 oss2.Bucket.endpoint 的格式一致
+    return endpoint if "://" in endpoint else f"http://{endpoint}"
+
+
+def probe_endpoint(endpoint, timeout=PROBE_TIMEOUT):
+    """
+    测量到端点的 TCP 连接耗时
+
+    Args:
+        endpoint: 端点（可带协议和端口）
+        timeout: 连接超时秒数
+
+    Returns:
+        float: 连接耗时（秒），不可达时为 None
+    """
+    host, port = _split_endpoint(endpoint)
+    start = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return time.perf_counter() - start
+    except OSError:
+        return None
+
+
+class EndpointSelector:
+    """
+    为 "auto:<地域>" 选择实际使用的端点
+
+    候选默认为该地域的内网端点和公网端点，探测连接耗时后在可达的候选中优先选择内网
+    （除非明显更慢）并缓存；都不可达时回退到公网端点。
+    已选端点熔断后，下次解析会重新探测并跳过熔断中的端点。
+    """
+
+    def __init__(self, ttl=ENDPOINT_CACHE_TTL, fallback_ttl=ENDPOINT_FALLBACK_TTL, probe_timeout=PROBE_TIMEOUT):
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self.probe_timeout = probe_timeout
+        self._candidates = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+
+    def set_candidates(self, endpoint, candidates):
+        """
+        自定义候选端点（最后一个视为公网端点），可用于私有部署或本地测试
+
+        Args:
+            endpoint: "auto:<名称>"
+            candidates: 候选端点列表
+        """
+        with self._lock:
+            self._candidates[endpoint] = list(candidates)
+            self._cache.pop(endpoint, None)
+
+    def candidates(self, endpoint):
+        """
+        获取候选端点，内网在前、公网在后
+
+        Returns:
+            list: 候选端点
+        """
+        with self._lock:
+            if endpoint in self._candidates:
+                return list(self._candidates[endpoint])
+        region = endpoint[len(AUTO_ENDPOINT_PREFIX):]
+        return [f"{region}-internal.aliyuncs.com", f"{region}.aliyuncs.com"]
+
+    def public_endpoint(self, endpoint):
+        """
+        返回给用户的URL应使用的端点：auto 模式下为公网端点，否则原样返回
+        """
+        if not is_auto_endpoint(endpoint):
+            return endpoint
+        return self.candidates(endpoint)[-1]
+
+    def resolve(self, endpoint):
+        """
+        解析实际使用的端点
+
+        Args:
+            endpoint: 节点中选择的端点
+
+        Returns:
+            str: 实际端点，非 auto 模式时原样返回
+        """
+        if not is_auto_endpoint(endpoint):
+            return endpoint
+
+        cached = self._cached(endpoint)
+        if cached is not None:
+            return cached
+
+        with self._probe_lock:
+            # 等待锁期间可能已被其他线程探测
+            cached = self._cached(endpoint)
+            if cached is not None:
+                return cached
+            return self._probe(endpoint)
+
+    def invalidate(self, endpoint=None):
+        with self._lock:
+            if endpoint is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(endpoint, None)
+
+    def _cached(self, endpoint):
+        with self._lock:
+            entry = self._cache.get(endpoint)
+        if entry is None:
+            return None
+        chosen, expires_at = entry
+        if time.monotonic() >= expires_at or get_breaker(_breaker_key(chosen)).is_open():
+            return None
+        return chosen
+
+    def _probe(self, endpoint):
+        candidates = self.candidates(endpoint)
+        with get_metrics().timed("endpoint_probe"):
+            with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+                latencies = list(executor.map(lambda c: probe_endpoint(c, self.probe_timeout), candidates))
+
+        reachable = [
+            (candidate, latency) for candidate, latency in zip(candidates, latencies)
+            if latency is not None and not get_breaker(_breaker_key(candidate)).is_open()
+        ]
+        if reachable:
+            fastest = min(latency for _, latency in reachable)
+            chosen, latency = next((c, l) for c, l in reachable if l <= fastest + PREFERENCE_MARGIN)
+            ttl = self.ttl
+            print(f"自动选择端点 {endpoint} -> {chosen}（连接耗时 {latency * 1000:.1f}ms）")
+        else:
+            chosen = candidates[-1]
+            ttl = self.fallback_ttl
+            print(f"自动选择端点 {endpoint}: 候选均不可达，使用公网端点 {chosen}")
+
+        with self._lock:
+            self._cache[endpoint] = (chosen, time.monotonic() + ttl)
+        return chosen
+
+
+# 所有节点共享的端点选择器
+_ENDPOINT_SELECTOR = EndpointSelector()
+
+
+def get_endpoint_selector():
+    """
+    获取进程级端点选择器
+
+    Returns:
+        EndpointSelector: 共享的端点选择器
+    """
+    return _ENDPOINT_SELECTOR
+
+
+def resolve_endpoint(endpoint):
+    return _ENDPOINT_SELECTOR.resolve(endpoint)
+
+
+def public_endpoint(endpoint):
+    return _ENDPOINT_SELECTOR.public_endpoint(endpoint)
+
+
+def to_public_url(url, bucket, endpoint):
+    """
+    auto 模式下把 sign_url 生成的URL中的实际端点替换为公网端点
+
+    V1 签名不包含 Host，替换后签名仍然有效；内网端点的URL在阿里云外部无法访问。
+
+    Args:
+        url: bucket.sign_url 返回的URL
+        bucket: 生成URL的 oss2.Bucket
+        endpoint: 节点中选择的端点
+
+    Returns:
+        str: 使用公网端点的URL
+    """
+    if not is_auto_endpoint(endpoint):
+        return url
+    actual = urlsplit(bucket.endpoint).netloc
+    public = urlsplit(_breaker_key(public_endpoint(endpoint))).netloc
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(netloc=parts.netloc.replace(actual, public, 1)))
@@ -0,0 +1,227 @@
+import queue
+import threading
+import time
+import uuid
+from fractions import Fraction
+
+from .oss_client import get_bucket
+from .oss_credentials import mask_key, validate_credentials
+from .oss_metrics import get_metrics
+from .oss_multipart import MultipartStreamWriter
+from .oss_result import UploadResult, results_to_json, STATUS_UPLOADED
+from .oss_url import build_url
+from .oss_utils import (
+    tensor_batch_to_uint8,
+    format_folder_path,
+    generate_timestamp,
+    OSS_ENDPOINT_LIST
+)
+
+# ComfyUI帧序列上传节点 - 将IMAGE批次编码为MP4并边编码边分片上传
+
+# 支持的编码器（MP4容器）
+FRAME_CODECS = ["h264", "hevc", "mpeg4"]
+# 每次从张量转换到内存的帧数，限制主机内存占用
+FRAME_CHUNK_SIZE = 16
+# 转换线程与编码线程之间最多排队的帧块数
+FRAME_QUEUE_CHUNKS = 2
+
+
+class OSSFrameSequenceUploadNode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("IMAGE",),  # 帧序列
+                "prefix": ("STRING", {"default": "comfyui_video"}),
+                "access_key_id": ("STRING", {"default": "access_key_id"}),
+                "access_key_secret": ("STRING", {"default": "access_key_secret"}),
+                "bucket_name": ("STRING", {"default": "bucket_name"}),
+                "endpoint": (OSS_ENDPOINT_LIST, {"default": "oss-cn-hangzhou.aliyuncs.com"}),
+                "folder": ("STRING", {"default": "video"}),
+                "include_date": (["是", "否"], {"default": "是"}),
+                "fps": ("FLOAT", {"default": 24.0, "min": 1.0, "max": 120.0, "step": 1.0}),
+                "codec": (FRAME_CODECS, {"default": "h264"}),
+                "crf": ("INT", {"default": 23, "min": 0, "max": 51, "step": 1}),
+            },
+            "optional": {
+                "use_temporary_url": (["是", "否"], {"default": "否"}),
+                "expiration_hours": ("INT", {"default": 24, "min": 1, "max": 720, "step": 1}),
+                "custom_filename": ("STRING", {"default": ""}),
+                "part_size_mb": ("INT", {"default": 10, "min": 1, "max": 5120, "step": 1}),
+                "part_concurrency": ("INT", {"default": 4, "min": 1, "max": 32, "step": 1}),
+                "cdn_domain": ("STRING", {"default": ""}),
+            }
+        }
+
+    # 校验参数是否正确
+    @classmethod
+    def VALIDATE_INPUTS(cls, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, codec):
+        print("帧序列上传参数校验:\t%s, %s, %s, %s, %s, %s, %s" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder, include_date, codec))
+
+        if access_key_id == "" or access_key_secret == "" or bucket_name == "" or endpoint == "":
+            return "关键参数不能为空"
+
+        # 检查endpoint
+        if endpoint not in OSS_ENDPOINT_LIST:
+            return "endpoint 不正确\t %s" % endpoint
+
+        # 检查编码器
+        if codec not in FRAME_CODECS:
+            return "编码器不支持\t %s" % codec
+
+        return validate_credentials(access_key_id, access_key_secret, endpoint, bucket_name)
+
+    RETURN_TYPES = ("STRING", "STRING", "INT", "STRING")
+    RETURN_NAMES = ("上传结果", "文件大小", "帧数", "结果详情")
+    FUNCTION = "upload_frames_to_oss"
+    CATEGORY = "API/oss"
+    OUTPUT_NODE = True
+
+    @get_metrics().track_node("OSSFrameSequenceUploadNode")
+    def upload_frames_to_oss(self, images, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, fps, codec, crf,
+                             use_temporary_url="否", expiration_hours=24, custom_filename="", part_size_mb=10, part_concurrency=4, cdn_domain=""):
+        print("帧序列上传参数信息: \t%s, %s, %s, %s, %s, %s, %s, %s\n" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder, include_date, fps, codec))
+
+        folder = format_folder_path(folder)
+        result = UploadResult()
+
+        try:
+            # 生成文件名
+            if custom_filename and custom_filename.strip():
+                # 使用自定义文件名
+                base_filename = custom_filename.strip()
+                # 确保文件名有正确的扩展名
+                if not base_filename.endswith('.mp4'):
+                    base_filename = f"{base_filename}.mp4"
+                filename = f"{folder}{base_filename}"
+            else:
+                # 自动生成文件名
+                timestamp = ""
+                if include_date == "是":
+                    timestamp = generate_timestamp() + "_"
+
+                unique_id = str(uuid.uuid4())[:8]  # 使用UUID的前8位
+                filename = f"{folder}{prefix}_{timestamp}{unique_id}.mp4"
+
+            print(f"正在上传帧序列: {filename}，共 {len(images)} 帧")
+            result.key = filename
+
+            bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
+            file_size = self.stream_frames(images, filename, bucket, fps, codec, crf, part_size_mb, part_concurrency, result)
+            file_size_mb = file_size / (1024*1024)
+            print(f"视频文件大小: {file_size_mb:.2f} MB")
+            print(f'视频成功上传到 OSS，文件名为: {filename}')
+            get_metrics().inc("objects_total", node="OSSFrameSequenceUploadNode", result="uploaded")
+            result.status = STATUS_UPLOADED
+
+            result.url = build_url(bucket, filename, bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)
+
+            return (result.url, f"{file_size_mb:.2f} MB", len(images), results_to_json([result]))
+
+        except Exception as e:
+            error_msg = f"帧序列上传失败: {str(e)}"
+            print(error_msg)
+            get_metrics().inc("objects_total", node="OSSFrameSequenceUploadNode", result="failed")
+            result.fail(error_msg)
+            return (error_msg, "0 MB", 0, results_to_json([result]))
+
+    def stream_frames(self, images, filename, bucket, fps=24.0, codec="h264", crf=23, part_size_mb=10, part_concurrency=4, result=None):
+        """
+        边转换、边编码、边上传：
+        当前线程按块把张量转换为uint8，编码线程把帧编码封装进分片写入器，
+        写满一个分片即在后台上传，内存中只保留少量帧和在途分片。
+        result 不为 None 时记录大小、ETag 与耗时。
+
+        Returns:
+            int: 上传的总字节数
+        """
+        try:
+            import av
+        except ImportError:
+            raise ValueError("帧序列上传需要 PyAV（pip install av）")
+
+        if len(images) == 0:
+            raise ValueError("没有可上传的帧")
+        if result is None:
+            result = UploadResult(filename)
+
+        metrics = get_metrics()
+        # yuv420p 要求宽高为偶数，多出的一行/列直接裁掉
+        height = images.shape[1] - images.shape[1] % 2
+        width = images.shape[2] - images.shape[2] % 2
+
+        writer = MultipartStreamWriter(bucket, filename, headers={'Content-Type': 'video/mp4'},
+                                       part_size=part_size_mb * 1024 * 1024, concurrency=part_concurrency)
+        chunks = queue.Queue(maxsize=FRAME_QUEUE_CHUNKS)
+        errors = []
+
+        def encode():
+            finished = False
+            try:
+                with metrics.timed("video_encode"):
+                    container = av.open(writer, mode='w', format='mp4')
+                    try:
+                        stream = container.add_stream(codec, rate=Fraction(round(fps * 1000), 1000))
+                        stream.width = width
+                        stream.height = height
+                        stream.pix_fmt = 'yuv420p'
+                        if codec in ("h264", "hevc"):
+                            stream.options = {'crf': str(crf)}
+                        while True:
+                            frames = chunks.get()
+                            if frames is None:
+                                finished = True
+                                break
+                            for frame in frames:
+                                video_frame = av.VideoFrame.from_ndarray(frame[:height, :width, :3], format='rgb24')
+                                container.mux(stream.encode(video_frame))
+                        container.mux(stream.encode(None))
+                    finally:
+                        container.close()
+            except Exception as e:
+                errors.append(e)
+                # 丢弃剩余帧块，避免转换线程阻塞
+                while not finished and chunks.get() is not None:
+                    pass
+
+        encoder = threading.Thread(target=encode, name="oss-frame-encode", daemon=True)
+        encoder.start()
+        start_time = time.perf_counter()
+        try:
+            for start in range(0, len(images), FRAME_CHUNK_SIZE):
+                if errors:
+                    break
+                with metrics.timed("tensor_to_host"):
+                    frames = tensor_batch_to_uint8(images[start:start + FRAME_CHUNK_SIZE])
+                chunks.put(frames)
+        except Exception:
+            chunks.put(None)
+            encoder.join()
+            writer.abort()
+            raise
+
+        chunks.put(None)
+        encoder.join()
+        if errors:
+            writer.abort()
+            raise errors[0]
+        result.timings["video_encode"] = time.perf_counter() - start_time
+
+        with result.timed("upload"):
+            file_size = writer.close()
+        result.bytes = file_size
+        result.record_response(writer.response)
+        print(f"帧序列编码上传完成，耗时 {time.perf_counter() - start_time:.2f} 秒")
+        return file_size
+
+
+# 节点映射字典
+NODE_CLASS_MAPPINGS = {
+    "OSSFrameSequenceUploadNode": OSSFrameSequenceUploadNode
+}
+
+# 节点显示名称映射字典
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "OSSFrameSequenceUploadNode": "帧序列上传为视频到OSS"
+}
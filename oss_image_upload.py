@@ -0,0 +1,202 @@
+from functools import partial
+
+from .oss_adaptive import plan_upload
+from .oss_archive import upload_image_archive
+from .oss_dedup import content_hash, content_key, get_dedup_index
+from .oss_derivative import DerivativeUploads, assign_urls, collect_keys
+from .oss_encoder import get_buffer_pool, submit_encode
+from .oss_metrics import get_metrics
+from .oss_multipart import upload_adaptive
+from .oss_queue import get_upload_queue
+from .oss_result import UploadResult, owns_buffer, results_to_json, STATUS_DEDUPED, STATUS_QUEUED, STATUS_SPOOLED, STATUS_UPLOADED
+from .oss_spool import get_spool
+from .oss_url import get_url_service
+from .oss_utils import uint8_to_pil, map_ordered
+
+# 图片上传节点共用的上传流程，node 为指标和日志中的节点名
+
+
+def put_image(bucket, image_bytes, key, result, node, async_upload="否", dedup_upload="否", spool_upload="否"):
+    """
+    上传单个已编码的图片对象，在 result 中记录上传状态、ETag 与耗时
+
+    按 去重跳过 > 本地暂存 > 后台上传 > 同步上传 的顺序选择上传方式。
+
+    Args:
+        bucket: oss2.Bucket
+        image_bytes: 编码后的缓冲区
+        key: 对象名
+        result: UploadResult
+        node: 指标中的节点名
+        async_upload: 后台上传（是/否）
+        dedup_upload: 内容去重（是/否）
+        spool_upload: 本地暂存（是/否）
+
+    Raises:
+        ValueError: 上传失败
+    """
+    import oss2
+
+    metrics = get_metrics()
+    try:
+        dedup_index = get_dedup_index() if dedup_upload == "是" else None
+
+        if dedup_index is not None and dedup_index.contains(bucket, key):
+            print(f'相同内容已存在于 OSS，跳过上传: {key}')
+            metrics.inc("objects_total", node=node, result="deduped")
+            result.status = STATUS_DEDUPED
+        elif spool_upload == "是":
+            # 先写入本地暂存目录（落盘后返回），OSS 暂时不可达也不会丢失；上传成功后再写入去重索引
+            on_success = partial(dedup_index.add, bucket, key) if dedup_index is not None else None
+            get_spool().add(bucket, key, image_bytes, on_success=on_success, **plan_upload(bucket, image_bytes).queue_options())
+            print(f'图片已写入本地暂存目录，文件名为: {key}')
+            metrics.inc("objects_total", node=node, result="spooled")
+            result.status = STATUS_SPOOLED
+        elif async_upload == "是":
+            # 交给后台队列上传，URL立即返回；上传成功后再写入去重索引
+            on_success = partial(dedup_index.add, bucket, key) if dedup_index is not None else None
+            get_upload_queue().submit(bucket, key, image_bytes, on_success=on_success, **plan_upload(bucket, image_bytes).queue_options())
+            print(f'图片已加入后台上传队列，文件名为: {key}')
+            metrics.inc("objects_total", node=node, result="queued")
+            result.status = STATUS_QUEUED
+        else:
+            # 较大的图片（如高分辨率PNG）按测得的带宽自动选择分片上传
+            with result.timed("upload"):
+                result.record_response(upload_adaptive(bucket, key, image_bytes)[0])
+            if dedup_index is not None:
+                dedup_index.add(bucket, key)
+            print(f'图片成功上传到 OSS，文件名为: {key}')
+            metrics.inc("objects_total", node=node, result="uploaded")
+            result.status = STATUS_UPLOADED
+    except oss2.exceptions.OssError as e:
+        raise ValueError(f'上传失败，错误信息: {e}')
+
+
+def upload_images(frames, bucket, folder, prefix, resolve_format, make_key, node, max_workers=4, async_upload="否",
+                  dedup_upload="否", spool_upload="否", derivative_specs=(), encode_preset="快速", extension=None):
+    """
+    并发编码并上传一批图片，每张图片独立失败，结果保持输入顺序
+
+    Args:
+        frames: 形状为[N, H, W, C]的uint8数组
+        bucket: oss2.Bucket
+        folder: 规范化后的目录（以 / 结尾或为空）
+        prefix: 文件名前缀
+        resolve_format: resolve_format(frame) 返回 (格式, save 参数)
+        make_key: make_key(i, ext) 返回第 i 张图片的对象名；开启内容去重时不使用，按内容哈希命名
+        node: 指标和日志中的节点名
+        max_workers: 并发数
+        async_upload / dedup_upload / spool_upload: 上传方式（是/否），见 put_image
+        derivative_specs: 衍生图规格（parse_derivatives 的结果）
+        encode_preset: 衍生图的编码预设
+        extension: 固定的文件扩展名（如 "jpg"），None 时为格式名的小写
+
+    Returns:
+        list: UploadResult 列表，URL 由 build_result_urls 统一生成
+    """
+    metrics = get_metrics()
+
+    def put(data, key, item):
+        put_image(bucket, data, key, item, node, async_upload, dedup_upload, spool_upload)
+
+    def upload_one(i):
+        result = UploadResult()
+        try:
+            image_format, save_options = resolve_format(frames[i])
+        except Exception as e:
+            error_msg = f"格式选择失败 第{i}张图片: {str(e)}"
+            print(error_msg)
+            metrics.inc("objects_total", node=node, result="failed")
+            result.fail(error_msg)
+            return result
+        # 文件扩展名根据格式（AUTO 时为这张图片选出的格式）确定
+        ext = extension or image_format.lower()
+        result.key = key = None if dedup_upload == "是" else make_key(i, ext)
+
+        image_bytes = None
+        pending = None
+        try:
+            if derivative_specs:
+                # 衍生图直接从同一个 uint8 视图缩放，与原图在编码线程池中并行编码
+                pending = DerivativeUploads(frames[i], derivative_specs, encode_preset, node=node)
+            with result.timed("encode"):
+                image_bytes = submit_encode(uint8_to_pil(frames[i]), save_options).result()
+            result.bytes = image_bytes.size
+            if key is None:
+                # 按内容哈希命名，相同内容得到相同的对象名
+                with metrics.timed("hash"), result.timed("hash"):
+                    digest = content_hash(image_bytes.getbuffer())
+                result.content_hash = digest
+                result.key = key = content_key(folder, prefix, digest, ext)
+            print(f"正在上传图片: {key} \t格式: {image_format}")
+            if pending is not None:
+                pending.upload(key, put)
+            put(image_bytes, key, result)
+        except Exception as e:
+            error_msg = f"上传失败 {key or f'第{i}张图片'}: {str(e)}"
+            print(error_msg)
+            metrics.inc("objects_total", node=node, result="failed")
+            result.fail(error_msg)
+        finally:
+            if image_bytes is not None and owns_buffer(result.status):
+                get_buffer_pool().release(image_bytes)
+            if pending is not None:
+                result.derivatives = pending.results(result.error)
+        return result
+
+    return map_ordered(upload_one, range(len(frames)), max_workers)
+
+
+def build_result_urls(results, bucket, bucket_name, endpoint, use_temporary_url="否", expiration_hours=24, cdn_domain=""):
+    """
+    上传完成后为成功的原图和衍生图批量生成URL（签名URL在有效期窗口内复用缓存）
+    """
+    keys = collect_keys(results)
+    urls = get_url_service().build_urls(bucket, keys, bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)
+    assign_urls(results, urls)
+
+
+def archive_warnings(dedup_upload="否", derivatives=""):
+    """
+    归档模式下不生效的选项提示
+    """
+    warnings = []
+    if dedup_upload == "是":
+        warnings.append("归档输出不支持内容去重，dedup_upload 已忽略")
+    if derivatives and derivatives.strip():
+        warnings.append("归档输出不生成衍生图，derivatives 已忽略")
+    return warnings
+
+
+def upload_archive(frames, bucket, key, names, save_options, node, bucket_name, endpoint, max_workers=4, async_upload="否",
+                   spool_upload="否", use_temporary_url="否", expiration_hours=24, cdn_domain="", dedup_upload="否", derivatives=""):
+    """
+    归档模式：整批图片打包为一个 tar 对象上传，结果详情中记录每张图片在归档中的字节范围
+
+    dedup_upload 和 derivatives 在归档模式下不生效，开启时在每张图片的结果详情中记录提示。
+
+    Returns:
+        tuple: (归档URL或错误信息, 结果详情JSON)
+    """
+    warnings = archive_warnings(dedup_upload, derivatives)
+    for message in warnings:
+        print(f"注意: {message}")
+    print(f"正在打包上传 {len(names)} 张图片: {key} \t格式: {save_options['format']}")
+    try:
+        results = upload_image_archive(bucket, key, frames, save_options, names, max_workers,
+                                       async_upload, spool_upload, node=node)
+    except Exception as e:
+        error_msg = f"归档上传失败 {key}: {str(e)}"
+        print(error_msg)
+        get_metrics().inc("objects_total", node=node, result="failed")
+        results = [UploadResult(key) for _ in names]
+        for result in results:
+            result.fail(error_msg)
+            result.warnings.extend(warnings)
+        return (error_msg, results_to_json(results))
+
+    url = get_url_service().build_urls(bucket, [key], bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)[key]
+    for result in results:
+        result.url = url
+        result.warnings.extend(warnings)
+    return (url, results_to_json(results))
@@ -0,0 +1,242 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Prometheus 指标名前缀
+METRIC_PREFIX = "oss_upload"
+
+# 指标说明（用于 Prometheus 的 HELP 行）
+METRIC_HELP = {
+    "stage_seconds": "各阶段耗时（tensor_to_host、encode、resize、hash、video_save、video_encode、put、upload_part、complete_multipart、sign_url、rate_limit_wait、credential_check、format_trial）",
+    "node_seconds": "节点单次执行总耗时",
+    "node_calls_total": "节点执行次数",
+    "bytes_sent_total": "发送到 OSS 的字节数",
+    "objects_total": "节点处理的对象数（按结果区分）",
+    "queue_tasks_total": "后台上传队列完成的任务数（按上传成功/失败后转交暂存目录/失败区分）",
+    "spool_objects_total": "本地暂存目录中的对象数（按写入/上传/重试/失败/淘汰区分）",
+    "retries_total": "重试次数",
+    "url_cache_total": "签名URL缓存命中/未命中次数",
+    "credential_checks_total": "校验阶段的凭证检查次数（valid、invalid、skipped、pending、cached）",
+    "format_selection_total": "AUTO 格式选择的次数（按所选格式和来源 trial、cached 区分）",
+    "errors_total": "错误次数",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """
+    固定桶直方图，记录计数、总和与各桶累计数
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        result = []
+        for upper, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((upper, total))
+        return result
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "buckets": {str(upper): count for upper, count in self.cumulative()},
+        }
+
+
+class Metrics:
+    """
+    进程级指标注册表：计数器与耗时直方图，按名称和标签区分
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """
+        计数器加 value
+
+        Args:
+            name: 指标名（如 bytes_sent_total）
+            value: 增量
+            **labels: 标签
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """
+        向直方图记录一个观测值
+
+        Args:
+            name: 指标名（如 stage_seconds）
+            value: 观测值（秒）
+            **labels: 标签
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timed(self, stage, **labels):
+        """
+        记录代码块耗时到 stage_seconds{stage=...}，出错时同时计入 errors_total
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("errors_total", stage=stage, **labels)
+            raise
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    @contextmanager
+    def track_node(self, node):
+        """
+        记录节点单次执行的总耗时与执行次数
+        """
+        self.inc("node_calls_total", node=node)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("node_seconds", time.perf_counter() - start, node=node)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """
+        获取所有指标的快照
+
+        Returns:
+            dict: {"counters": {...}, "histograms": {...}}，标签序列以 "k=v,k=v" 作为键
+        """
+        with self._lock:
+            counters = {
+                name: {",".join(f"{k}={v}" for k, v in key): value for key, value in series.items()}
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: {",".join(f"{k}={v}" for k, v in key): h.to_dict() for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """
+        以 Prometheus 文本格式导出
+
+        Returns:
+            str: exposition 文本
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = f"{METRIC_PREFIX}_{name}"
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {full} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {full} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                full = f"{METRIC_PREFIX}_{name}"
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {full} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {full} histogram")
+                for key, h in sorted(series.items()):
+                    for upper, count in h.cumulative():
+                        lines.append(f"{full}_bucket{_format_labels(key, [('le', upper)])} {count}")
+                    lines.append(f"{full}_bucket{_format_labels(key, [('le', '+Inf')])} {h.count}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{full}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+# 所有节点共享的指标注册表
+_METRICS = Metrics()
+
+
+def get_metrics():
+    """
+    获取进程级指标注册表
+
+    Returns:
+        Metrics: 共享的指标注册表
+    """
+    return _METRICS
+
+
+def register_routes():
+    """
+    在 ComfyUI 服务器上注册指标接口（不在 ComfyUI 中运行时忽略）:
+        GET /oss_upload/metrics        Prometheus 文本格式
+        GET /oss_upload/metrics.json   JSON 格式
+    """
+    try:
+        from aiohttp import web
+        from server import PromptServer
+    except ImportError:
+        return False
+
+    instance = getattr(PromptServer, "instance", None)
+    if instance is None:
+        return False
+
+    @instance.routes.get("/oss_upload/metrics")
+    async def metrics_prometheus(request):
+        return web.Response(text=_METRICS.to_prometheus(), content_type="text/plain", charset="utf-8")
+
+    @instance.routes.get("/oss_upload/metrics.json")
+    async def metrics_json(request):
+        return web.json_response(_METRICS.snapshot())
+
+    return True
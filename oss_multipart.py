@@ -0,0 +1,381 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+
+from .oss_adaptive import get_throughput_tracker, plan_upload
+from .oss_buffer import UploadBuffer
+from .oss_checkpoint import UploadCheckpoint
+from .oss_retry import complete_multipart_with_retry, init_multipart_with_retry, put_object_with_retry, upload_part_with_retry
+
+# 默认分片大小 10MB
+DEFAULT_PART_SIZE = 10 * 1024 * 1024
+# 默认并发上传的分片数
+DEFAULT_CONCURRENCY = 4
+# OSS 限制：单个对象最多 10000 个分片，除最后一个外每个分片至少 100KB
+MAX_PARTS = 10000
+MIN_PART_SIZE = 100 * 1024
+
+
+def determine_part_size(total_size, preferred_size=DEFAULT_PART_SIZE):
+    """
+    计算分片大小，保证分片数不超过 OSS 的 10000 个上限
+
+    Args:
+        total_size: 文件总字节数
+        preferred_size: 期望的分片大小
+
+    Returns:
+        int: 实际使用的分片大小
+    """
+    part_size = max(preferred_size, MIN_PART_SIZE)
+    while (total_size + part_size - 1) // part_size > MAX_PARTS:
+        part_size *= 2
+    return part_size
+
+
+def upload_multipart(bucket, key, data, part_size=DEFAULT_PART_SIZE, concurrency=DEFAULT_CONCURRENCY, headers=None, checkpoint_store=None):
+    """
+    并发分片上传内存中的数据
+
+    每个分片只在上传它的线程里从原缓冲区切出，同一时间最多有 concurrency 份分片副本；
+    分片按编号顺序组装，任何分片失败都会取消剩余分片并 abort 本次分片上传。
+    传入 checkpoint_store 时为可续传模式：失败后保留分片上传和断点，
+    下次上传同名对象时只发送缺失的分片。
+
+    Args:
+        bucket: oss2.Bucket
+        key: 对象名
+        data: bytes、BytesIO、UploadBuffer 或 mmap
+        part_size: 期望的分片大小
+        concurrency: 并发上传的分片数
+        headers: 初始化分片上传时的请求头
+        checkpoint_store: CheckpointStore，为 None 时不续传
+
+    Returns:
+        complete_multipart_upload 的请求结果（重试时发现服务端已合并则为 None）
+    """
+    import oss2
+
+    if isinstance(data, UploadBuffer):
+        # 按分片从缓冲区（可能是临时文件）读取，内存中只保留在途分片
+        view = None
+        total_size = data.size
+        read_part = data.read_at
+    else:
+        view = memoryview(data.getbuffer() if hasattr(data, "getbuffer") else data).cast('B')
+        total_size = len(view)
+
+        def read_part(start, size):
+            return bytes(view[start:start + size])
+    try:
+        start_time = time.perf_counter()
+        part_size = determine_part_size(total_size, part_size)
+        part_count = max(1, (total_size + part_size - 1) // part_size)
+        checkpoint = None
+        if checkpoint_store is not None:
+            checkpoint = UploadCheckpoint(checkpoint_store, bucket, key, part_size)
+            upload_id = checkpoint.begin(headers)
+        else:
+            upload_id = init_multipart_with_retry(bucket, key, headers=headers)
+        print(f"分片上传: 分片大小 {part_size / (1024*1024):.2f}MB，共 {part_count} 个分片，并发 {concurrency}")
+
+        def upload_one(part_number):
+            start = (part_number - 1) * part_size
+            chunk = read_part(start, part_size)
+            etag = checkpoint.uploaded_etag(part_number, chunk) if checkpoint else None
+            if etag is None:
+                print(f"上传分片 {part_number}")
+                # 失败时只重发这一个分片
+                etag = upload_part_with_retry(bucket, key, upload_id, part_number, chunk)
+                if checkpoint:
+                    checkpoint.record_part(part_number, etag)
+            return oss2.models.PartInfo(part_number, etag)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, part_count)))
+        try:
+            futures = [executor.submit(upload_one, n) for n in range(1, part_count + 1)]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                if future in done and future.exception() is not None:
+                    raise future.exception()
+            parts = [future.result() for future in futures]
+            response = complete_multipart_with_retry(bucket, key, upload_id, parts)
+            if checkpoint:
+                checkpoint.finish()
+        except Exception:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if checkpoint:
+                print(f"分片上传中断，已保留断点: {key}")
+            else:
+                _abort_multipart(bucket, key, upload_id)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+
+        if checkpoint is None:
+            # 续传时部分分片未实际发送，不计入带宽估计
+            workers = max(1, min(concurrency, part_count))
+            get_throughput_tracker().record_multipart(bucket.endpoint, total_size, time.perf_counter() - start_time,
+                                                      workers, math.ceil(part_count / workers))
+        print(f"分片上传完成，共 {part_count} 个分片")
+        return response
+    finally:
+        if view is not None:
+            view.release()
+
+
+def upload_adaptive(bucket, key, data, headers=None):
+    """
+    按 endpoint 最近的延迟和带宽（oss_adaptive）自动选择普通上传或分片上传、分片大小和并发数
+
+    Args:
+        bucket: oss2.Bucket
+        key: 对象名
+        data: bytes、BytesIO 或 UploadBuffer
+        headers: 请求头
+
+    Returns:
+        tuple: (请求结果, UploadPlan)
+    """
+    plan = plan_upload(bucket, data)
+    if plan.multipart:
+        print(f"自适应上传策略: {plan.describe()}")
+        response = upload_multipart(bucket, key, data, part_size=plan.part_size, concurrency=plan.concurrency, headers=headers)
+    else:
+        if hasattr(data, "seek"):
+            data.seek(0)
+        response = put_object_with_retry(bucket, key, data, headers=headers)
+    return response, plan
+
+
+def _abort_multipart(bucket, key, upload_id):
+    import oss2
+
+    try:
+        bucket.abort_multipart_upload(key, upload_id)
+        print(f"已取消分片上传: {key}")
+    except oss2.exceptions.OssError as e:
+        print(f"取消分片上传失败 {key}: {e}")
+
+
+class MultipartStreamWriter:
+    """
+    边写边传的分片上传写入器（类文件对象）
+
+    视频封装器直接写入该对象，写满一个分片就通过 upload_part 发送，最多
+    concurrency 个分片并发上传，在途分片数受 max_in_flight 限制（默认为并发数的2倍），
+    因此峰值内存与视频长度无关。
+
+    MP4 封装器在结束时会回写文件头部的 mdat 大小，所以第1个分片会一直保留在
+    内存中直到 close()；其余分片一旦写满并且写入位置越过它就会被上传，
+    之后不能再修改。如果直到 close() 都没有发出任何分片，则改用普通上传。
+
+    传入 checkpoint_store 时为可续传模式：重新编码同一视频时，服务端已有且内容一致的
+    分片不会重复发送，失败时保留分片上传以便下次续传。
+    """
+
+    def __init__(self, bucket, key, headers=None, part_size=DEFAULT_PART_SIZE, concurrency=DEFAULT_CONCURRENCY, max_in_flight=None, checkpoint_store=None):
+        self.bucket = bucket
+        self.key = key
+        self.headers = headers
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.upload_id = None
+        # 完成上传后的 oss2 请求结果（PutObjectResult 或 complete_multipart_upload 的结果）
+        self.response = None
+        self.checkpoint = UploadCheckpoint(checkpoint_store, bucket, key, self.part_size) if checkpoint_store is not None else None
+
+        self._pos = 0
+        self._size = 0
+        self._buffers = {}
+        self._uploaded = set()
+        self._etags = {}
+        self._futures = []
+        self._closed = False
+        self._slots = threading.BoundedSemaphore(max_in_flight or concurrency * 2)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    @property
+    def size(self):
+        """
+        已写入的总字节数
+        """
+        return self._size
+
+    @property
+    def parts_count(self):
+        """
+        已上传（或正在上传）的分片数
+        """
+        return len(self._uploaded)
+
+    # ---- 类文件接口 ----
+
+    def writable(self):
+        return True
+
+    def readable(self):
+        return False
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def seek(self, offset, whence=0):
+        if whence == 0:
+            pos = offset
+        elif whence == 1:
+            pos = self._pos + offset
+        elif whence == 2:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"不支持的 whence: {whence}")
+        if pos < 0:
+            raise ValueError("seek 位置不能为负数")
+        self._pos = pos
+        return pos
+
+    def write(self, data):
+        if self._closed:
+            raise ValueError("写入器已关闭")
+
+        view = memoryview(data).cast('B')
+        total = len(view)
+        offset = 0
+        while offset < total:
+            part_number = self._pos // self.part_size + 1
+            start = self._pos - (part_number - 1) * self.part_size
+            chunk = min(self.part_size - start, total - offset)
+
+            buffer = self._part_buffer(part_number)
+            if len(buffer) < start:
+                # 跳跃写入时用0补齐
+                buffer.extend(bytes(start - len(buffer)))
+            buffer[start:start + chunk] = view[offset:offset + chunk]
+
+            offset += chunk
+            self._pos += chunk
+
+        self._size = max(self._size, self._pos)
+        self._submit_full_parts()
+        return total
+
+    # ---- 分片管理 ----
+
+    def _part_buffer(self, part_number):
+        if part_number in self._uploaded:
+            raise IOError(f"分片 {part_number} 已上传，无法回写")
+        if part_number > MAX_PARTS:
+            raise IOError(f"分片数超过上限 {MAX_PARTS}，请增大分片大小")
+        buffer = self._buffers.get(part_number)
+        if buffer is None:
+            buffer = bytearray()
+            self._buffers[part_number] = buffer
+        return buffer
+
+    def _submit_full_parts(self):
+        current = self._pos // self.part_size + 1
+        for part_number in sorted(self._buffers):
+            # 第1个分片保留到最后，用于封装器回写文件头
+            if part_number == 1 or part_number >= current:
+                continue
+            if len(self._buffers[part_number]) == self.part_size:
+                self._submit(part_number)
+
+    def _submit(self, part_number):
+        self._check_errors()
+        # 直接交出分片的 bytearray，不再复制一份
+        data = self._buffers.pop(part_number)
+        # 在途分片已满时阻塞写入方，形成背压
+        self._slots.acquire()
+        if self.upload_id is None:
+            if self.checkpoint:
+                self.upload_id = self.checkpoint.begin(self.headers)
+            else:
+                self.upload_id = init_multipart_with_retry(self.bucket, self.key, headers=self.headers)
+        self._uploaded.add(part_number)
+        future = self._executor.submit(self._upload_part, part_number, data)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number, data):
+        etag = self.checkpoint.uploaded_etag(part_number, data) if self.checkpoint else None
+        if etag is None:
+            print(f"上传分片 {part_number}")
+            etag = upload_part_with_retry(self.bucket, self.key, self.upload_id, part_number, UploadBuffer.wrap(data))
+            if self.checkpoint:
+                self.checkpoint.record_part(part_number, etag)
+        self._etags[part_number] = etag
+
+    def _check_errors(self):
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+    # ---- 结束 ----
+
+    def close(self):
+        """
+        上传剩余分片并完成分片上传；若从未发出分片则使用普通上传
+
+        Returns:
+            int: 上传的总字节数
+        """
+        import oss2
+
+        if self._closed:
+            return self._size
+        self._closed = True
+
+        try:
+            if self.upload_id is None:
+                data = b"".join(self._buffers[n] for n in sorted(self._buffers))
+                self._buffers.clear()
+                self.response = put_object_with_retry(self.bucket, self.key, data, headers=self.headers)
+                return self._size
+
+            for part_number in sorted(self._buffers):
+                self._submit(part_number)
+            for future in self._futures:
+                future.result()
+
+            parts = [oss2.models.PartInfo(n, self._etags[n]) for n in sorted(self._etags)]
+            self.response = complete_multipart_with_retry(self.bucket, self.key, self.upload_id, parts)
+            if self.checkpoint:
+                self.checkpoint.finish()
+            print(f"分片上传完成，共 {len(parts)} 个分片")
+            return self._size
+        except Exception:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._abort_upload()
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def abort(self):
+        """
+        放弃上传，取消已初始化的分片上传
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._buffers.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._abort_upload()
+
+    def _abort_upload(self):
+        if self.upload_id is None:
+            return
+        if self.checkpoint:
+            print(f"分片上传中断，已保留断点: {self.key}")
+        else:
+            _abort_multipart(self.bucket, self.key, self.upload_id)
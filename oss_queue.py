@@ -0,0 +1,241 @@
+import atexit
+import threading
+import time
+from collections import deque
+
+from .oss_buffer import UploadBuffer, buffer_size
+from .oss_metrics import get_metrics
+from .oss_multipart import DEFAULT_CONCURRENCY, DEFAULT_PART_SIZE, upload_multipart
+from .oss_retry import put_object_with_retry
+from .oss_spool import get_spool
+
+# 内存中排队数据的总字节上限，超过后溢写到暂存目录
+UPLOAD_QUEUE_MAX_BYTES = 256 * 1024 * 1024
+# 后台上传线程数
+UPLOAD_QUEUE_WORKERS = 4
+# 进程退出时等待队列清空的最长时间（秒）
+SHUTDOWN_FLUSH_TIMEOUT = 300
+
+
+class UploadTask:
+    """
+    一个在内存中排队的待上传对象
+    """
+
+    def __init__(self, bucket, key, data, headers=None, multipart_threshold=None, part_size=DEFAULT_PART_SIZE, concurrency=DEFAULT_CONCURRENCY, on_success=None):
+        self.bucket = bucket
+        self.key = key
+        self.data = data
+        self.size = buffer_size(data)
+        # 已转存到临时文件的缓冲区不占用内存额度
+        self.memory_bytes = 0 if isinstance(data, UploadBuffer) and data.spilled else self.size
+        self.headers = headers
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.on_success = on_success
+
+
+class UploadQueue:
+    """
+    进程内后台上传队列
+
+    节点把编码好的数据交给队列后立即返回，由后台线程完成上传。
+    内存中排队的数据超过 max_bytes 时，新任务转交给暂存目录（oss_spool），由暂存目录落盘后上传。
+    重试后仍上传失败的任务同样转交暂存目录继续重试（节点已返回其URL），只有转交也失败时才丢弃。
+    """
+
+    def __init__(self, max_bytes=UPLOAD_QUEUE_MAX_BYTES, workers=UPLOAD_QUEUE_WORKERS, spool=None):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.spool = spool
+
+        self._memory = deque()
+        self._spilled = 0
+        self._memory_bytes = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._spooled_after_failure = 0
+        self._errors = deque(maxlen=20)
+        self._threads = []
+        self._cond = threading.Condition()
+
+    def submit(self, bucket, key, data, headers=None, multipart_threshold=None, part_size=DEFAULT_PART_SIZE, concurrency=DEFAULT_CONCURRENCY, on_success=None):
+        """
+        提交上传任务
+
+        Args:
+            bucket: oss2.Bucket
+            key: 对象名
+            data: 对象内容（bytes 或 UploadBuffer）；传入 UploadBuffer 时所有权交给队列，上传后由队列关闭
+            headers: 上传请求头
+            multipart_threshold: 超过该字节数时使用分片上传，None 表示总是普通上传
+            part_size: 分片大小
+            concurrency: 分片并发数
+            on_success: 上传成功后在后台线程中调用的回调
+        """
+        task = UploadTask(bucket, key, data, headers, multipart_threshold, part_size, concurrency, on_success)
+        with self._cond:
+            in_memory = self._memory_bytes + task.memory_bytes <= self.max_bytes or not self._memory
+            if in_memory:
+                self._memory.append(task)
+                self._memory_bytes += task.memory_bytes
+
+        if not in_memory:
+            # 背压：转交暂存目录，数据落盘后由暂存目录的后台线程上传
+            try:
+                self._get_spool().add(bucket, key, data, headers, multipart_threshold, part_size, concurrency, on_success)
+            finally:
+                if isinstance(data, UploadBuffer):
+                    data.close()
+            print(f"上传队列已满，任务溢写到暂存目录: {task.key}")
+            with self._cond:
+                self._spilled += 1
+            return
+
+        with self._cond:
+            self._ensure_workers()
+            self._cond.notify()
+
+    def _get_spool(self):
+        return self.spool if self.spool is not None else get_spool()
+
+    def _ensure_workers(self):
+        # 调用方需持有锁
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name="oss-upload-queue", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._memory:
+                    self._cond.wait()
+                task = self._memory.popleft()
+                self._memory_bytes -= task.memory_bytes
+                self._active += 1
+
+            error = None
+            spooled = False
+            try:
+                self._upload(task)
+            except Exception as e:
+                error = f"{task.key}: {e}"
+                print(f"后台上传失败 {error}")
+                spooled, error = self._spool_failed(task, error)
+            else:
+                print(f'后台上传完成: {task.key}')
+                if task.on_success is not None:
+                    try:
+                        task.on_success()
+                    except Exception as e:
+                        print(f"后台上传回调失败 {task.key}: {e}")
+            finally:
+                if isinstance(task.data, UploadBuffer):
+                    task.data.close()
+                task.data = None
+
+            get_metrics().inc("queue_tasks_total", result="spooled" if spooled else "failed" if error else "uploaded")
+            with self._cond:
+                self._active -= 1
+                if error is None:
+                    self._completed += 1
+                elif spooled:
+                    self._spooled_after_failure += 1
+                    self._errors.append(error)
+                else:
+                    self._failed += 1
+                    self._errors.append(error)
+                self._cond.notify_all()
+
+    def _spool_failed(self, task, error):
+        # 重试后仍失败：节点已返回该对象的URL，转交暂存目录落盘后继续重试，不丢弃对象
+        try:
+            self._get_spool().add(task.bucket, task.key, task.data, task.headers, task.multipart_threshold,
+                                  task.part_size, task.concurrency, task.on_success)
+        except Exception as e:
+            error = f"{error}（转交暂存目录失败，已丢弃: {e}）"
+            print(f"后台上传失败的任务无法写入暂存目录 {error}")
+            return False, error
+        print(f"后台上传失败的任务已转交暂存目录继续重试: {task.key}")
+        return True, error
+
+    def _upload(self, task):
+        data = task.data
+        if isinstance(data, UploadBuffer):
+            data.seek(0)
+        if task.multipart_threshold is not None and task.size > task.multipart_threshold:
+            upload_multipart(task.bucket, task.key, data, part_size=task.part_size, concurrency=task.concurrency, headers=task.headers)
+        else:
+            put_object_with_retry(task.bucket, task.key, data, headers=task.headers)
+
+    def status(self):
+        """
+        获取队列状态
+
+        Returns:
+            dict: 排队、已溢写、上传中、已完成、失败后转交暂存目录、失败（已丢弃）的任务数、最近的错误及暂存目录状态
+        """
+        spool_status = self._get_spool().status()
+        with self._cond:
+            return {
+                "pending": len(self._memory),
+                "pending_bytes": self._memory_bytes,
+                "spilled": self._spilled,
+                "in_progress": self._active,
+                "completed": self._completed,
+                "spooled_after_failure": self._spooled_after_failure,
+                "failed": self._failed,
+                "recent_errors": list(self._errors),
+                "spool": spool_status,
+            }
+
+    def flush(self, timeout=None, include_spool=True):
+        """
+        等待队列中的任务全部完成
+
+        Args:
+            timeout: 最长等待秒数，None 表示一直等待
+            include_spool: 是否同时等待暂存目录中可上传的对象
+
+        Returns:
+            bool: 是否已全部完成
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._memory or self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        if not include_spool:
+            return True
+        return self._get_spool().flush(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+
+# 所有节点共享的后台上传队列
+_UPLOAD_QUEUE = UploadQueue()
+
+
+def get_upload_queue():
+    """
+    获取进程级后台上传队列
+
+    Returns:
+        UploadQueue: 共享的上传队列
+    """
+    return _UPLOAD_QUEUE
+
+
+def _flush_on_exit():
+    # 暂存目录中的对象已落盘，下次启动后继续上传，退出时只等待内存中的任务
+    if not _UPLOAD_QUEUE.flush(0, include_spool=False):
+        print("等待后台上传队列完成...")
+        if not _UPLOAD_QUEUE.flush(SHUTDOWN_FLUSH_TIMEOUT, include_spool=False):
+            print(f"后台上传队列未能在 {SHUTDOWN_FLUSH_TIMEOUT} 秒内完成")
+
+
+atexit.register(_flush_on_exit)
@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+import time
+
+from .oss_metrics import get_metrics
+
+# 全局带宽上限（MB/秒），未设置或为0时不限制
+ENV_MB_PER_SECOND = "OSS_UPLOAD_MB_PER_SECOND"
+# 全局请求速率上限（请求/秒），未设置或为0时不限制
+ENV_REQUESTS_PER_SECOND = "OSS_UPLOAD_REQUESTS_PER_SECOND"
+# 按 endpoint / 存储桶的限速规则（JSON），如 {"bucket:my-bucket": {"mb_per_second": 10}}
+ENV_RATE_LIMITS = "OSS_UPLOAD_RATE_LIMITS"
+
+# 令牌桶容量（以秒计的突发量），空闲后最多允许突发这么多秒的配额
+RATE_LIMIT_BURST_SECONDS = 1.0
+# 上传数据每累计这么多字节申请一次带宽配额；并发上传按该粒度轮流发送
+THROTTLE_CHUNK_SIZE = 64 * 1024
+
+GLOBAL_SCOPE = "*"
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    申请配额时按到达顺序预留令牌，令牌不足时记为欠账，调用方按欠账等待，
+    因此并发申请按先来后到依次获得配额，不会出现某个上传一直抢不到的情况。
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate * RATE_LIMIT_BURST_SECONDS)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """
+        预留 amount 个令牌
+
+        Returns:
+            float: 需要等待的秒数，0 表示可以立即发送
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class RateLimit:
+    """
+    一个限速范围（全局、endpoint 或存储桶）的带宽和请求速率上限
+    """
+
+    def __init__(self, scope, bytes_per_second=None, requests_per_second=None):
+        self.scope = scope
+        self.bytes_per_second = bytes_per_second
+        self.requests_per_second = requests_per_second
+        self.bytes = TokenBucket(bytes_per_second, max(bytes_per_second * RATE_LIMIT_BURST_SECONDS, THROTTLE_CHUNK_SIZE)) if bytes_per_second else None
+        self.requests = TokenBucket(requests_per_second, max(requests_per_second * RATE_LIMIT_BURST_SECONDS, 1)) if requests_per_second else None
+
+
+class UploadThrottle:
+    """
+    单次请求的带宽节流器，作为 oss2 的 progress_callback 使用
+
+    oss2 每读出一块请求体就回调一次，累计满 THROTTLE_CHUNK_SIZE 后向各范围申请带宽配额，
+    配额不足时在发送线程中等待，从而把发送速率限制在上限以内。
+    """
+
+    def __init__(self, limiter, limits):
+        self.limiter = limiter
+        self.limits = limits
+        self._consumed = 0
+        self._pending = 0
+
+    def __call__(self, consumed_bytes, total_bytes):
+        self._pending += max(0, consumed_bytes - self._consumed)
+        self._consumed = consumed_bytes
+        if self._pending >= THROTTLE_CHUNK_SIZE or (total_bytes is not None and consumed_bytes >= total_bytes):
+            amount, self._pending = self._pending, 0
+            self.limiter.wait([limit.bytes for limit in self.limits if limit.bytes], amount, "bytes")
+
+
+class RateLimiter:
+    """
+    进程级上传限速器
+
+    所有节点的上传请求（普通上传、分片上传的每个分片、初始化/完成分片上传、去重 HEAD）
+    都经过这里：每个请求先申请请求速率配额，发送请求体时再按块申请带宽配额。
+    一个请求同时受全局、所属 endpoint 和所属存储桶三个范围的限制，取等待时间最长者。
+    """
+
+    def __init__(self):
+        self._limits = {}
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def configure(self, bytes_per_second=None, requests_per_second=None, endpoint=None, bucket_name=None):
+        """
+        设置限速，两个上限都为 None 或 0 时取消该范围的限速
+
+        Args:
+            bytes_per_second: 带宽上限（字节/秒）
+            requests_per_second: 请求速率上限（请求/秒）
+            endpoint: 只限制该 endpoint（如 oss-cn-hangzhou.aliyuncs.com），与 bucket_name 都为空时为全局限速
+            bucket_name: 只限制该存储桶
+        """
+        scope = _scope_key(endpoint, bucket_name)
+        with self._lock:
+            if bytes_per_second or requests_per_second:
+                self._limits[scope] = RateLimit(scope, bytes_per_second or None, requests_per_second or None)
+            else:
+                self._limits.pop(scope, None)
+            self._resolved.clear()
+
+    def clear(self):
+        """
+        取消所有限速
+        """
+        with self._lock:
+            self._limits.clear()
+            self._resolved.clear()
+
+    def load_env(self, environ=None):
+        """
+        从环境变量读取限速配置，格式错误的配置会被忽略
+        """
+        environ = os.environ if environ is None else environ
+        mb_per_second = _parse_number(environ.get(ENV_MB_PER_SECOND), ENV_MB_PER_SECOND)
+        requests_per_second = _parse_number(environ.get(ENV_REQUESTS_PER_SECOND), ENV_REQUESTS_PER_SECOND)
+        if mb_per_second or requests_per_second:
+            self.configure(int(mb_per_second * 1024 * 1024) or None, requests_per_second or None)
+
+        rules = environ.get(ENV_RATE_LIMITS)
+        if not rules:
+            return
+        try:
+            rules = json.loads(rules)
+            for scope, rule in rules.items():
+                kind, _, name = scope.partition(":")
+                if kind not in ("endpoint", "bucket") or not name:
+                    raise ValueError(f"无效的范围 {scope}，应为 endpoint:<endpoint> 或 bucket:<存储桶>")
+                mb_per_second = float(rule.get("mb_per_second") or 0)
+                requests_per_second = float(rule.get("requests_per_second") or 0)
+                self.configure(int(mb_per_second * 1024 * 1024) or None, requests_per_second or None,
+                               endpoint=name if kind == "endpoint" else None,
+                               bucket_name=name if kind == "bucket" else None)
+        except (ValueError, AttributeError, TypeError) as e:
+            print(f"{ENV_RATE_LIMITS} 格式错误，已忽略: {e}")
+
+    def _limits_for(self, bucket):
+        key = (_endpoint_host(bucket.endpoint), bucket.bucket_name)
+        with self._lock:
+            limits = self._resolved.get(key)
+            if limits is None:
+                scopes = (GLOBAL_SCOPE, _scope_key(key[0], None), _scope_key(None, key[1]))
+                limits = self._resolved[key] = [self._limits[s] for s in scopes if s in self._limits]
+            return limits
+
+    def acquire_request(self, bucket):
+        """
+        发出一个请求前调用，超过请求速率上限时等待
+        """
+        limits = self._limits_for(bucket)
+        if limits:
+            self.wait([limit.requests for limit in limits if limit.requests], 1, "requests")
+
+    def throttle(self, bucket):
+        """
+        获取一次上传请求的带宽节流回调
+
+        Returns:
+            UploadThrottle 或 None（没有带宽限制时）
+        """
+        limits = [limit for limit in self._limits_for(bucket) if limit.bytes]
+        return UploadThrottle(self, limits) if limits else None
+
+    def wait(self, token_buckets, amount, kind):
+        if not token_buckets:
+            return
+        delay = max(token_bucket.reserve(amount) for token_bucket in token_buckets)
+        if delay > 0:
+            get_metrics().observe("stage_seconds", delay, stage="rate_limit_wait", kind=kind)
+            time.sleep(delay)
+
+    def status(self):
+        """
+        获取当前限速配置
+
+        Returns:
+            dict: {范围: {"bytes_per_second": ..., "requests_per_second": ...}}
+        """
+        with self._lock:
+            return {scope: {"bytes_per_second": limit.bytes_per_second, "requests_per_second": limit.requests_per_second}
+                    for scope, limit in self._limits.items()}
+
+
+def _endpoint_host(endpoint):
+    return endpoint.split("://", 1)[-1].rstrip("/")
+
+
+def _scope_key(endpoint, bucket_name):
+    if bucket_name:
+        return f"bucket:{bucket_name}"
+    if endpoint:
+        return f"endpoint:{_endpoint_host(endpoint)}"
+    return GLOBAL_SCOPE
+
+
+def _parse_number(value, name):
+    if not value:
+        return 0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        print(f"{name} 不是有效的数字，已忽略: {value}")
+        return 0
+
+
+# 所有节点共享的限速器，启动时读取环境变量
+_RATE_LIMITER = RateLimiter()
+_RATE_LIMITER.load_env()
+
+
+def get_rate_limiter():
+    """
+    获取进程级上传限速器
+
+    Returns:
+        RateLimiter: 共享的限速器
+    """
+    return _RATE_LIMITER
@@ -0,0 +1,131 @@
+import json
+import time
+from contextlib import contextmanager
+
+# 上传结果状态
+STATUS_UPLOADED = "uploaded"
+STATUS_QUEUED = "queued"
+STATUS_SPOOLED = "spooled"
+STATUS_DEDUPED = "deduped"
+STATUS_FAILED = "failed"
+
+
+def owns_buffer(status):
+    """
+    上传结束后调用方是否仍需关闭（或交还缓冲区池）编码缓冲区
+
+    加入后台队列（queued）的缓冲区归队列所有，由队列在上传后关闭；其他状态下（包括已复制到
+    本地暂存目录）由调用方释放。
+
+    Args:
+        status: 上传状态，出错时可为 None 或 failed
+    """
+    return status != STATUS_QUEUED
+
+
+class UploadResult:
+    """
+    单个对象的上传结果，节点除旧版的逗号拼接字符串外，另输出这些结果的 JSON 列表
+    """
+
+    def __init__(self, key=None):
+        self.key = key
+        self.url = None
+        self.status = STATUS_FAILED
+        self.bytes = 0
+        self.content_hash = None
+        self.etag = None
+        self.crc64 = None
+        self.timings = {}
+        self.error = None
+        # 归档输出时：图片在归档中的成员名和字节范围（Range 请求头的值）
+        self.member = None
+        self.range = None
+        # 衍生图：规格名（如 "256:WEBP"），原图结果中的 derivatives 为各衍生图的结果
+        self.variant = None
+        self.derivatives = []
+        # 参数组合中未生效的选项等提示，不影响上传状态
+        self.warnings = []
+
+    @contextmanager
+    def timed(self, stage):
+        """
+        记录本对象某个阶段的耗时（秒），同名阶段累加
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def record_response(self, response):
+        """
+        从 oss2 的请求结果中记录 ETag 和服务端 CRC64
+
+        Args:
+            response: put_object / complete_multipart_upload 的返回值，可为 None
+        """
+        if response is None:
+            return
+        etag = getattr(response, "etag", None)
+        self.etag = etag.strip('"') if etag else None
+        self.crc64 = getattr(response, "crc", None)
+
+    def warn(self, message):
+        """
+        打印并记录一条提示（如某个选项在当前模式下不生效）
+        """
+        print(f"注意: {message}")
+        self.warnings.append(message)
+
+    def fail(self, error_msg):
+        self.status = STATUS_FAILED
+        self.url = None
+        self.error = error_msg
+
+    def legacy(self):
+        """
+        旧版字符串输出中的一项：成功时为URL，失败时为错误信息
+        """
+        return self.error if self.error is not None else self.url
+
+    def to_dict(self):
+        return {
+            "key": self.key,
+            "url": self.url,
+            "status": self.status,
+            "bytes": self.bytes,
+            "content_hash": self.content_hash,
+            "etag": self.etag,
+            "crc64": str(self.crc64) if self.crc64 is not None else None,
+            "timings": {stage: round(seconds, 6) for stage, seconds in self.timings.items()},
+            "error": self.error,
+            "member": self.member,
+            "range": self.range,
+            "variant": self.variant,
+            "derivatives": [derivative.to_dict() for derivative in self.derivatives],
+            "warnings": self.warnings,
+        }
+
+
+def results_to_json(results):
+    """
+    将上传结果序列化为 JSON 列表，顺序与节点输入一致
+
+    Args:
+        results: UploadResult 列表
+
+    Returns:
+        str: JSON 字符串
+    """
+    return json.dumps([result.to_dict() for result in results], ensure_ascii=False)
+
+
+def results_to_legacy(results):
+    """
+    旧版输出：URL 与错误信息按顺序以逗号拼接
+
+    Returns:
+        str: 拼接后的字符串
+    """
+    return ", ".join(result.legacy() for result in results)
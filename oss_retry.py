@@ -0,0 +1,246 @@
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+from .oss_adaptive import get_throughput_tracker
+from .oss_buffer import buffer_size
+from .oss_metrics import get_metrics
+from .oss_ratelimit import get_rate_limiter
+
+# 单次操作的最多尝试次数（含首次）
+RETRY_ATTEMPTS = 4
+# 指数退避的基础延迟与上限（秒）
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 10.0
+# 同一 endpoint 连续失败多少次后熔断
+BREAKER_FAILURE_THRESHOLD = 5
+# 熔断后多久放行一次试探请求（秒）
+BREAKER_RESET_SECONDS = 30.0
+
+# 可重试的 HTTP 状态码与错误码
+RETRYABLE_STATUS = {408, 429}
+RETRYABLE_CODES = {"RequestTimeout", "InternalError", "ServiceUnavailable"}
+
+
+class CircuitOpenError(Exception):
+    """
+    endpoint 处于熔断状态，请求未发出
+    """
+
+
+def is_retryable(error):
+    """
+    判断错误是否值得重试：网络错误、CRC 校验失败、5xx、限流和超时
+
+    Args:
+        error: 捕获的异常
+
+    Returns:
+        bool: 是否可重试
+    """
+    import oss2
+
+    if isinstance(error, (oss2.exceptions.RequestError, oss2.exceptions.InconsistentError)):
+        return True
+    if isinstance(error, oss2.exceptions.OssError):
+        return error.status >= 500 or error.status in RETRYABLE_STATUS or error.code in RETRYABLE_CODES
+    return False
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """
+    指数退避加全抖动：在 [0, min(cap, base * 2^attempt)] 中随机取值，
+    避免大量并发请求在同一时刻一起重试
+
+    Args:
+        attempt: 已失败的次数（从 0 开始）
+
+    Returns:
+        float: 等待秒数
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    单个 endpoint 的熔断器
+
+    连续出现 failure_threshold 次可重试错误后进入熔断，期间请求直接失败；
+    reset_seconds 后放行一个试探请求，成功则恢复，失败则继续熔断。
+    """
+
+    def __init__(self, endpoint, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        请求发出前调用，熔断中时抛出 CircuitOpenError
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+            if remaining <= 0 and not self._probing:
+                # 放行一个试探请求
+                self._probing = True
+                return
+        raise CircuitOpenError(f"{self.endpoint} 连续失败 {self.failure_threshold} 次，已暂停请求，"
+                               f"{max(0, int(remaining))} 秒后重试")
+
+    def is_open(self):
+        """
+        是否处于熔断状态（包括等待试探的阶段）
+        """
+        with self._lock:
+            return self._opened_at is not None
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    print(f"OSS endpoint 熔断: {self.endpoint}")
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release_probe(self):
+        # 试探请求以非网络错误结束时，允许下一个请求继续试探
+        with self._lock:
+            self._probing = False
+
+
+_BREAKERS = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(endpoint):
+    """
+    获取 endpoint 对应的熔断器
+
+    Args:
+        endpoint: bucket.endpoint
+
+    Returns:
+        CircuitBreaker: 共享的熔断器
+    """
+    with _breakers_lock:
+        breaker = _BREAKERS.get(endpoint)
+        if breaker is None:
+            breaker = _BREAKERS[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+
+def call_with_retry(bucket, stage, func, data=None, attempts=RETRY_ATTEMPTS, already_done=None, payload_size=None, measure_bandwidth=True):
+    """
+    带重试和熔断地执行一次 OSS 请求
+
+    Args:
+        bucket: oss2.Bucket（用于确定熔断器）
+        stage: 指标中的阶段名
+        func: 无参数的请求函数
+        data: 请求体，若为可 seek 的流则在每次重试前回到初始位置
+        attempts: 最多尝试次数
+        already_done: 重试时遇到错误后调用，返回 True 表示上一次请求实际已在服务端成功
+        payload_size: 请求体字节数，不为 None 时成功请求的耗时计入吞吐量统计（oss_adaptive），用于自适应上传
+        measure_bandwidth: 是否把该请求的速率计入带宽估计
+
+    Returns:
+        func 的返回值
+    """
+    breaker = get_breaker(bucket.endpoint)
+    limiter = get_rate_limiter()
+    tracker = get_throughput_tracker()
+    metrics = get_metrics()
+    start_pos = data.tell() if hasattr(data, "seek") and hasattr(data, "tell") else None
+
+    for attempt in range(attempts):
+        breaker.allow()
+        # 重试同样计入请求速率
+        limiter.acquire_request(bucket)
+        if start_pos is not None:
+            data.seek(start_pos)
+        try:
+            with metrics.timed(stage), tracker.measure(bucket.endpoint, payload_size, measure_bandwidth) if payload_size is not None else nullcontext():
+                result = func()
+        except Exception as e:
+            if not is_retryable(e):
+                if attempt > 0 and already_done is not None and already_done(e):
+                    breaker.record_success()
+                    return None
+                breaker.release_probe()
+                raise
+            breaker.record_failure()
+            if attempt + 1 >= attempts:
+                raise
+            delay = backoff_delay(attempt)
+            metrics.inc("retries_total", stage=stage)
+            print(f"{stage} 请求失败，{delay:.2f} 秒后第 {attempt + 1} 次重试: {e}")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+def put_object_with_retry(bucket, key, data, headers=None):
+    """
+    带重试的普通上传，data 可为 bytes、UploadBuffer 或可 seek 的流；发送速率受 oss_ratelimit 限制
+    """
+    limiter = get_rate_limiter()
+    size = buffer_size(data)
+    result = call_with_retry(bucket, "put", lambda: bucket.put_object(key, data, headers=headers, progress_callback=limiter.throttle(bucket)),
+                             data=data, payload_size=size)
+    get_metrics().inc("bytes_sent_total", size, mode="put")
+    return result
+
+
+def init_multipart_with_retry(bucket, key, headers=None):
+    """
+    带重试的分片上传初始化
+
+    Returns:
+        str: upload_id
+    """
+    return call_with_retry(bucket, "init_multipart", lambda: bucket.init_multipart_upload(key, headers=headers), payload_size=0).upload_id
+
+
+def upload_part_with_retry(bucket, key, upload_id, part_number, data):
+    """
+    带重试的分片上传，失败时只重发该分片；data 可为 bytes 或 UploadBuffer
+
+    Returns:
+        str: 分片 ETag
+    """
+    limiter = get_rate_limiter()
+    size = buffer_size(data)
+    result = call_with_retry(bucket, "upload_part", lambda: bucket.upload_part(key, upload_id, part_number, data, progress_callback=limiter.throttle(bucket)),
+                             data=data, payload_size=size, measure_bandwidth=False)
+    get_metrics().inc("bytes_sent_total", size, mode="part")
+    return result.etag
+
+
+def complete_multipart_with_retry(bucket, key, upload_id, parts, headers=None):
+    """
+    带重试的完成分片上传
+
+    完成请求超时但服务端已合并时，重试会得到 NoSuchUpload；此时对象已存在即视为成功。
+    """
+    import oss2
+
+    def already_done(error):
+        return isinstance(error, oss2.exceptions.NoSuchUpload) and bucket.object_exists(key)
+
+    return call_with_retry(bucket, "complete_multipart", lambda: bucket.complete_multipart_upload(key, upload_id, parts, headers=headers),
+                           already_done=already_done)
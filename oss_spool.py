@@ -0,0 +1,525 @@
+import json
+import mmap
+import os
+import threading
+import time
+import uuid
+
+from .oss_buffer import UploadBuffer, buffer_size
+from .oss_metrics import get_metrics
+from .oss_multipart import DEFAULT_CONCURRENCY, DEFAULT_PART_SIZE, upload_multipart
+from .oss_retry import CircuitOpenError, is_retryable, put_object_with_retry
+from .oss_utils import check_directory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# 默认暂存目录（插件目录下）
+DEFAULT_SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".oss_spool")
+# 同一暂存目录最多可同时使用的进程数：每个进程独占一个槽位（第0个槽位为暂存目录本身，其余为 proc-N 子目录）
+SPOOL_MAX_SLOTS = 64
+# 已确认上传的对象在暂存目录中最多保留的总字节数，超出后按上传时间淘汰
+SPOOL_MAX_BYTES = 1024 * 1024 * 1024
+# 后台上传线程数
+SPOOL_DRAIN_WORKERS = 4
+# 上传失败（可重试错误）后的重试间隔（秒），按失败次数指数增长
+SPOOL_RETRY_BASE_DELAY = 5.0
+SPOOL_RETRY_MAX_DELAY = 300.0
+# 不可重试的错误（如权限不足）后的重试间隔（秒），按连续失败次数指数增长；节点换用新凭证时立即重试
+SPOOL_FAILED_BASE_DELAY = 600.0
+SPOOL_FAILED_MAX_DELAY = 6 * 3600.0
+# 写入暂存目录时每次复制的字节数
+SPOOL_COPY_CHUNK = 8 * 1024 * 1024
+# 清单中的无效记录超过该数量时重写清单
+SPOOL_COMPACT_THRESHOLD = 1000
+
+# 暂存对象状态
+PENDING = "pending"
+UPLOADED = "uploaded"
+FAILED = "failed"
+
+
+def _fsync_dir(path):
+    # Windows 上无法对目录 fsync，忽略
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _try_lock(path):
+    """
+    以非阻塞方式对锁文件加排他锁，进程退出（包括崩溃）时由操作系统释放
+
+    Returns:
+        锁文件对象（保持打开即持有锁），已被其他进程持有时返回 None
+    """
+    f = open(path, 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+class SpoolEntry:
+    """
+    暂存目录中的一个对象，数据位于 objects/<id>.bin
+    """
+
+    def __init__(self, entry_id, bucket_name, key, size, headers=None, multipart_threshold=None,
+                 part_size=DEFAULT_PART_SIZE, concurrency=DEFAULT_CONCURRENCY, created=None):
+        self.id = entry_id
+        self.bucket_name = bucket_name
+        self.key = key
+        self.size = size
+        self.headers = headers
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.created = created or time.time()
+        self.state = PENDING
+        self.uploaded_at = None
+        self.attempts = 0
+        # 连续的不可重试错误次数
+        self.failures = 0
+        self.uploading = False
+        self.next_attempt = 0.0
+        self.error = None
+        self.on_success = None
+
+    def to_record(self):
+        return {
+            "op": "add",
+            "id": self.id,
+            "bucket": self.bucket_name,
+            "key": self.key,
+            "size": self.size,
+            "headers": self.headers,
+            "multipart_threshold": self.multipart_threshold,
+            "part_size": self.part_size,
+            "concurrency": self.concurrency,
+            "created": self.created,
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(record["id"], record["bucket"], record["key"], record["size"], record.get("headers"),
+                   record.get("multipart_threshold"), record.get("part_size", DEFAULT_PART_SIZE),
+                   record.get("concurrency", DEFAULT_CONCURRENCY), record.get("created"))
+
+
+class UploadSpool:
+    """
+    本地暂存目录（先写盘、后上传）
+
+    对象先写入暂存目录并 fsync，清单（manifest.jsonl，追加写并 fsync）记录对象的新增、
+    上传完成和淘汰，进程崩溃或重启后未上传的对象不会丢失。后台线程以有限并发上传，
+    OSS 不可达时按指数间隔重试，不会丢弃对象。已确认上传的对象作为本地缓存保留，
+    总大小超过 max_bytes 后按上传时间从旧到新淘汰；未上传的对象从不淘汰。
+
+    清单中不保存访问密钥：重启后恢复的对象要等到节点再次使用同一个存储桶
+    （提供了凭证）时才会继续上传。
+
+    同一台机器上的多个 ComfyUI 进程共用暂存目录时，每个进程在首次使用时独占一个槽位
+    （对槽位中的 .lock 加文件锁），清单读取、重写和孤立数据文件的清理都只在自己的槽位中进行，
+    不会删除其他进程尚未上传的对象。进程退出或崩溃后锁随之释放，下一个启动的进程接管该槽位
+    并继续上传其中的对象。
+    """
+
+    def __init__(self, spool_dir=DEFAULT_SPOOL_DIR, max_bytes=SPOOL_MAX_BYTES, workers=SPOOL_DRAIN_WORKERS):
+        self.root_dir = spool_dir
+        # 首次使用时确定为本进程独占的槽位目录
+        self.spool_dir = spool_dir
+        self.max_bytes = max_bytes
+        self.workers = workers
+
+        self._entries = {}
+        self._buckets = {}
+        self._uploaded_bytes = 0
+        self._active = 0
+        self._stale_records = 0
+        self._loaded = False
+        self._manifest = None
+        self._slot_lock = None
+        self._errors = []
+        self._threads = []
+        self._cond = threading.Condition()
+
+    # ---- 存储 ----
+
+    @property
+    def objects_dir(self):
+        return os.path.join(self.spool_dir, "objects")
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.spool_dir, "manifest.jsonl")
+
+    def _data_path(self, entry_id):
+        return os.path.join(self.objects_dir, f"{entry_id}.bin")
+
+    def _claim_slot(self):
+        # 调用方需持有锁；独占第一个未被其他进程持有的槽位
+        for slot in range(SPOOL_MAX_SLOTS):
+            slot_dir = check_directory(self.root_dir if slot == 0 else os.path.join(self.root_dir, f"proc-{slot}"))
+            lock = _try_lock(os.path.join(slot_dir, ".lock"))
+            if lock is not None:
+                self._slot_lock = lock
+                self.spool_dir = slot_dir
+                return
+        raise RuntimeError(f"暂存目录 {self.root_dir} 的 {SPOOL_MAX_SLOTS} 个槽位都已被其他进程占用")
+
+    def _ensure_loaded(self):
+        # 调用方需持有锁；首次使用时独占槽位并读取清单，恢复未上传的对象
+        if self._loaded:
+            return
+        self._claim_slot()
+        check_directory(self.objects_dir)
+        entries = {}
+        records = 0
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 写到一半的最后一行
+                        continue
+                    records += 1
+                    op = record.get("op")
+                    if op == "add":
+                        entries[record["id"]] = SpoolEntry.from_record(record)
+                    elif op == "done" and record["id"] in entries:
+                        entries[record["id"]].state = UPLOADED
+                        entries[record["id"]].uploaded_at = record.get("time")
+                    elif op == "evict":
+                        entries.pop(record["id"], None)
+        except FileNotFoundError:
+            pass
+
+        # 清单中缺少数据文件的对象无法恢复；没有清单记录的数据文件是写入清单前中断留下的。
+        # 槽位由本进程独占，这里的清理不会影响其他进程的对象
+        for entry_id in list(entries):
+            if not os.path.exists(self._data_path(entry_id)):
+                print(f"暂存对象数据缺失，已忽略: {entries[entry_id].key}")
+                del entries[entry_id]
+        for name in os.listdir(self.objects_dir):
+            if name.rsplit('.', 1)[0] not in entries:
+                try:
+                    os.remove(os.path.join(self.objects_dir, name))
+                except OSError:
+                    pass
+
+        self._entries = entries
+        self._uploaded_bytes = sum(e.size for e in entries.values() if e.state == UPLOADED)
+        self._stale_records = records - len(entries)
+        self._loaded = True
+        self._compact()
+        pending = sum(1 for e in entries.values() if e.state == PENDING)
+        if pending:
+            print(f"暂存目录中有 {pending} 个未上传的对象，将在节点再次使用对应存储桶时继续上传")
+
+    def _append(self, record):
+        # 调用方需持有锁
+        if self._manifest is None:
+            self._manifest = open(self.manifest_path, 'a', encoding='utf-8')
+        self._manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._manifest.flush()
+        os.fsync(self._manifest.fileno())
+
+    def _compact(self):
+        # 调用方需持有锁；用当前对象重写清单，丢弃已淘汰对象的记录
+        if self._manifest is not None:
+            self._manifest.close()
+            self._manifest = None
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry.to_record(), ensure_ascii=False) + "\n")
+                if entry.state == UPLOADED:
+                    f.write(json.dumps({"op": "done", "id": entry.id, "time": entry.uploaded_at}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        _fsync_dir(self.spool_dir)
+        self._stale_records = 0
+
+    def _write_data(self, entry_id, data):
+        path = self._data_path(entry_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            if isinstance(data, UploadBuffer):
+                # 按块复制，已转存到临时文件的大对象不会整个读入内存
+                for offset in range(0, data.size, SPOOL_COPY_CHUNK):
+                    f.write(data.read_at(offset, SPOOL_COPY_CHUNK))
+            else:
+                with memoryview(data.getbuffer() if hasattr(data, "getbuffer") else data) as view:
+                    f.write(view)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(self.objects_dir)
+
+    # ---- 提交 ----
+
+    def add(self, bucket, key, data, headers=None, multipart_threshold=None, part_size=DEFAULT_PART_SIZE, concurrency=DEFAULT_CONCURRENCY, on_success=None):
+        """
+        把对象写入暂存目录（数据和清单都已落盘后返回），由后台线程上传
+
+        Args:
+            bucket: oss2.Bucket
+            key: 对象名
+            data: 对象内容（bytes、memoryview、BytesIO 或 UploadBuffer）
+            headers: 上传请求头
+            multipart_threshold: 超过该字节数时使用分片上传，None 表示总是普通上传
+            part_size: 分片大小
+            concurrency: 分片并发数
+            on_success: 上传成功后在后台线程中调用的回调（不会持久化）
+        """
+        entry = SpoolEntry(uuid.uuid4().hex, bucket.bucket_name, key, buffer_size(data), headers, multipart_threshold, part_size, concurrency)
+        entry.on_success = on_success
+        with self._cond:
+            self._ensure_loaded()
+        self._write_data(entry.id, data)
+
+        with self._cond:
+            self._append(entry.to_record())
+            self._entries[entry.id] = entry
+            self._buckets[bucket.bucket_name] = bucket
+            self._ensure_workers()
+            self._cond.notify_all()
+        get_metrics().inc("spool_objects_total", result="added")
+
+    def register_bucket(self, bucket):
+        """
+        提供存储桶凭证，恢复的同名存储桶对象随即开始上传
+        """
+        with self._cond:
+            if self._buckets.get(bucket.bucket_name) is bucket:
+                return
+            self._buckets[bucket.bucket_name] = bucket
+            if not self._loaded:
+                # 从未使用过暂存目录时不创建目录
+                if not os.path.exists(self.root_dir):
+                    return
+                self._ensure_loaded()
+            # 换用新的凭证后，因权限等原因失败的对象立即重试
+            for entry in self._entries.values():
+                if entry.state == FAILED and entry.bucket_name == bucket.bucket_name:
+                    entry.state = PENDING
+                    entry.next_attempt = 0.0
+            if any(e.state == PENDING and e.bucket_name == bucket.bucket_name for e in self._entries.values()):
+                self._ensure_workers()
+                self._cond.notify_all()
+
+    # ---- 后台上传 ----
+
+    def _ensure_workers(self):
+        # 调用方需持有锁
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name="oss-spool-drain", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_ready(self):
+        # 调用方需持有锁；返回 (可上传的对象, 最早的重试时间)
+        now = time.time()
+        earliest = None
+        for entry in self._entries.values():
+            if entry.state not in (PENDING, FAILED) or entry.uploading or entry.bucket_name not in self._buckets:
+                continue
+            if entry.next_attempt <= now:
+                return entry, None
+            earliest = entry.next_attempt if earliest is None else min(earliest, entry.next_attempt)
+        return None, earliest
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    entry, earliest = self._next_ready()
+                    if entry is not None:
+                        break
+                    self._cond.wait(None if earliest is None else max(0.0, earliest - time.time()))
+                entry.uploading = True
+                bucket = self._buckets[entry.bucket_name]
+                self._active += 1
+
+            error = None
+            retry = False
+            try:
+                self._upload(bucket, entry)
+            except Exception as e:
+                error = f"{entry.key}: {e}"
+                retry = isinstance(e, CircuitOpenError) or is_retryable(e)
+
+            with self._cond:
+                self._active -= 1
+                entry.uploading = False
+                entry.attempts += 1
+                if error is None:
+                    entry.failures = 0
+                    self._mark_uploaded(entry)
+                elif retry:
+                    delay = min(SPOOL_RETRY_MAX_DELAY, SPOOL_RETRY_BASE_DELAY * (2 ** (entry.attempts - 1)))
+                    entry.state = PENDING
+                    entry.next_attempt = time.time() + delay
+                    entry.error = error
+                    print(f"暂存对象上传失败，{delay:.0f} 秒后重试 {error}")
+                else:
+                    # 不可重试的错误（如权限、存储桶不存在）：保留数据，以较长的间隔重试，
+                    # 节点换用新凭证、手动重新排队或下次启动时立即重试
+                    entry.failures += 1
+                    delay = min(SPOOL_FAILED_MAX_DELAY, SPOOL_FAILED_BASE_DELAY * (2 ** (entry.failures - 1)))
+                    entry.state = FAILED
+                    entry.next_attempt = time.time() + delay
+                    entry.error = error
+                    self._errors = (self._errors + [error])[-20:]
+                    print(f"暂存对象上传失败，{delay:.0f} 秒后重试 {error}")
+                self._cond.notify_all()
+
+            if error is None:
+                print(f'暂存对象上传完成: {entry.key}')
+                get_metrics().inc("spool_objects_total", result="uploaded")
+                if entry.on_success is not None:
+                    try:
+                        entry.on_success()
+                    except Exception as e:
+                        print(f"暂存对象上传回调失败 {entry.key}: {e}")
+                    entry.on_success = None
+            else:
+                get_metrics().inc("spool_objects_total", result="retry" if retry else "failed")
+
+    def _upload(self, bucket, entry):
+        path = self._data_path(entry.id)
+        if entry.multipart_threshold is not None and entry.size > entry.multipart_threshold:
+            # 大对象通过 mmap 交给分片上传，不把整个文件读入内存
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                upload_multipart(bucket, entry.key, data, part_size=entry.part_size, concurrency=entry.concurrency, headers=entry.headers)
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+            put_object_with_retry(bucket, entry.key, data, headers=entry.headers)
+
+    def _mark_uploaded(self, entry):
+        # 调用方需持有锁
+        entry.state = UPLOADED
+        entry.uploaded_at = time.time()
+        entry.error = None
+        self._append({"op": "done", "id": entry.id, "time": entry.uploaded_at})
+        self._uploaded_bytes += entry.size
+        self._evict()
+
+    def _evict(self):
+        # 调用方需持有锁；只淘汰已确认上传的对象
+        if self._uploaded_bytes <= self.max_bytes:
+            return
+        uploaded = sorted((e for e in self._entries.values() if e.state == UPLOADED), key=lambda e: e.uploaded_at)
+        for entry in uploaded:
+            if self._uploaded_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._data_path(entry.id))
+            except FileNotFoundError:
+                pass
+            self._append({"op": "evict", "id": entry.id})
+            del self._entries[entry.id]
+            self._uploaded_bytes -= entry.size
+            self._stale_records += 3
+            get_metrics().inc("spool_objects_total", result="evicted")
+        if self._stale_records > SPOOL_COMPACT_THRESHOLD:
+            self._compact()
+
+    def retry_failed(self):
+        """
+        将因不可重试的错误而失败的对象重新排队，立即重试
+
+        Returns:
+            int: 重新排队的对象数
+        """
+        with self._cond:
+            self._ensure_loaded()
+            failed = [e for e in self._entries.values() if e.state == FAILED]
+            for entry in failed:
+                entry.state = PENDING
+                entry.next_attempt = 0.0
+            if failed:
+                self._ensure_workers()
+                self._cond.notify_all()
+        if failed:
+            print(f"暂存目录中 {len(failed)} 个失败的对象已重新排队")
+        return len(failed)
+
+    # ---- 查询 ----
+
+    def status(self):
+        """
+        获取暂存目录状态
+
+        Returns:
+            dict: 待上传（含等待凭证的）、上传中、已上传（缓存）、失败的对象数与字节数及最近的错误
+        """
+        with self._cond:
+            self._ensure_loaded()
+            pending = [e for e in self._entries.values() if e.state == PENDING]
+            return {
+                "spool_dir": self.spool_dir,
+                "pending": len(pending),
+                "pending_bytes": sum(e.size for e in pending),
+                "waiting_credentials": sum(1 for e in pending if e.bucket_name not in self._buckets),
+                "in_progress": self._active,
+                "cached": sum(1 for e in self._entries.values() if e.state == UPLOADED),
+                "cached_bytes": self._uploaded_bytes,
+                "failed": sum(1 for e in self._entries.values() if e.state == FAILED),
+                "recent_errors": list(self._errors),
+            }
+
+    def flush(self, timeout=None):
+        """
+        等待所有可上传（已有凭证）的对象上传完成
+
+        Args:
+            timeout: 最长等待秒数，None 表示一直等待
+
+        Returns:
+            bool: 是否已全部完成
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._ensure_loaded()
+            while self._active or any(e.state == PENDING and e.bucket_name in self._buckets for e in self._entries.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+
+# 所有节点共享的暂存目录
+_UPLOAD_SPOOL = UploadSpool()
+
+
+def get_spool():
+    """
+    获取进程级暂存目录
+
+    Returns:
+        UploadSpool: 共享的暂存目录
+    """
+    return _UPLOAD_SPOOL
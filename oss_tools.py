@@ -0,0 +1,95 @@
+import json
+
+from .oss_adaptive import get_throughput_tracker
+from .oss_metrics import get_metrics
+from .oss_queue import get_upload_queue
+from .oss_ratelimit import get_rate_limiter
+from .oss_spool import get_spool
+
+# OSS上传辅助节点
+
+
+class OSSUploadQueueStatusNode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {},
+            "optional": {
+                "flush": (["是", "否"], {"default": "否"}),
+                "timeout_seconds": ("INT", {"default": 300, "min": 1, "max": 86400, "step": 1}),
+                "retry_failed": (["是", "否"], {"default": "否"}),
+            }
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # 状态随时变化，每次都重新执行
+        return float("nan")
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("队列状态",)
+    FUNCTION = "get_status"
+    CATEGORY = "API/oss"
+    OUTPUT_NODE = True
+
+    def get_status(self, flush="否", timeout_seconds=300, retry_failed="否"):
+        queue = get_upload_queue()
+        if retry_failed == "是":
+            # 暂存目录中因权限等不可重试错误而失败的对象立即重新上传
+            get_spool().retry_failed()
+        if flush == "是":
+            print("等待后台上传队列完成...")
+            if not queue.flush(timeout_seconds):
+                print(f"后台上传队列未能在 {timeout_seconds} 秒内完成")
+        status = queue.status()
+        status["rate_limits"] = get_rate_limiter().status()
+        status["throughput"] = get_throughput_tracker().status()
+        print(f"后台上传队列状态: {status}")
+        return (json.dumps(status, ensure_ascii=False),)
+
+
+class OSSUploadMetricsNode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {},
+            "optional": {
+                "output_format": (["JSON", "Prometheus"], {"default": "JSON"}),
+                "reset": (["是", "否"], {"default": "否"}),
+            }
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # 指标随时变化，每次都重新执行
+        return float("nan")
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("上传指标",)
+    FUNCTION = "get_metrics"
+    CATEGORY = "API/oss"
+    OUTPUT_NODE = True
+
+    def get_metrics(self, output_format="JSON", reset="否"):
+        metrics = get_metrics()
+        if output_format == "Prometheus":
+            result = metrics.to_prometheus()
+        else:
+            result = metrics.to_json()
+        if reset == "是":
+            # 读取后清零，便于按批次对比
+            metrics.reset()
+        return (result,)
+
+
+# 节点映射字典
+NODE_CLASS_MAPPINGS = {
+    "OSSUploadQueueStatusNode": OSSUploadQueueStatusNode,
+    "OSSUploadMetricsNode": OSSUploadMetricsNode
+}
+
+# 节点显示名称映射字典
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "OSSUploadQueueStatusNode": "OSS后台上传队列状态",
+    "OSSUploadMetricsNode": "OSS上传性能指标"
+}
@@ -1,13 +1,14 @@
-import oss2
-import os
-import datetime
 import uuid
-from io import BytesIO
-from PIL.PngImagePlugin import PngInfo
-from comfy.cli_args import args
-import ast
 
-from .oss_utils import tensor_to_pil, image_to_base64, format_folder_path, generate_timestamp, OSS_ENDPOINT_LIST
+from .oss_archive import OUTPUT_MODES
+from .oss_client import get_bucket
+from .oss_credentials import mask_key, validate_credentials
+from .oss_derivative import parse_derivatives
+from .oss_encoder import build_save_options
+from .oss_image_upload import build_result_urls, upload_archive, upload_images
+from .oss_metrics import get_metrics
+from .oss_result import results_to_json, results_to_legacy
+from .oss_utils import tensor_batch_to_uint8, format_folder_path, generate_timestamp, OSS_ENDPOINT_LIST
 
 class OSSAutoUploadNode:
     @classmethod
@@ -25,76 +26,73 @@ class OSSAutoUploadNode:
             "optional": {
                 "use_temporary_url": (["是", "否"], {"default": "否"}),
                 "expiration_hours": ("INT", {"default": 24, "min": 1, "max": 720, "step": 1}),
+                "max_workers": ("INT", {"default": 4, "min": 1, "max": 32, "step": 1}),
+                "async_upload": (["是", "否"], {"default": "否"}),
+                "dedup_upload": (["是", "否"], {"default": "否"}),
+                "cdn_domain": ("STRING", {"default": ""}),
+                "spool_upload": (["是", "否"], {"default": "否"}),
+                "output_mode": (OUTPUT_MODES, {"default": "单独对象"}),
+                "derivatives": ("STRING", {"default": ""}),
             }
         }
 
     # 校验参数是否正确
     @classmethod
-    def VALIDATE_INPUTS(cls, image, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, use_temporary_url=None, expiration_hours=None):
-        print("参数校验:\t%s, %s, %s, %s, %s, %s" % (prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder))
+    def VALIDATE_INPUTS(cls, image, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, use_temporary_url=None, expiration_hours=None, derivatives=None):
+        print("参数校验:\t%s, %s, %s, %s, %s" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder))
         if access_key_id == "" or access_key_secret == "" or bucket_name == "" or endpoint == "":
             return "关键参数不能为空"
         # 检查endpoint
         if endpoint not in OSS_ENDPOINT_LIST:
             return "endpoint 不正确\t %s" % endpoint
-        return True
+        # 检查衍生图规格
+        try:
+            parse_derivatives(derivatives)
+        except ValueError as e:
+            return str(e)
+        return validate_credentials(access_key_id, access_key_secret, endpoint, bucket_name)
     
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("上传结果",)
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("上传结果", "结果详情")
     FUNCTION = "upload_to_oss"
     CATEGORY = "API/oss"
     OUTPUT_NODE = True
     
-    def upload_to_oss(self, image, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, use_temporary_url="否", expiration_hours=24):
-        print("参数信息: \t%s, %s, %s, %s, %s, %s\n" % (prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder))
+    @get_metrics().track_node("OSSAutoUploadNode")
+    def upload_to_oss(self, image, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, use_temporary_url="否", expiration_hours=24, max_workers=4, async_upload="否", dedup_upload="否", cdn_domain="", spool_upload="否", output_mode="单独对象", derivatives=""):
+        print("参数信息: \t%s, %s, %s, %s, %s\n" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder))
         
-        results = []
         folder = format_folder_path(folder)
+        bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
+        # 整批一次性转换为uint8，每张图片只取零拷贝视图
+        with get_metrics().timed("tensor_to_host"):
+            frames = tensor_batch_to_uint8(image)
+        # 保存为 JPEG 格式（质量75，与PIL默认一致）
+        save_options = build_save_options("JPEG", quality=75)
         
-        for i, img in enumerate(image):
-            # 自动生成文件名: 前缀_日期时间_uuid.jpg
+        if output_mode == "归档":
             timestamp = generate_timestamp()
             unique_id = str(uuid.uuid4())[:8]  # 使用UUID的前8位
-            
-            filename = f"{folder}{prefix}_{timestamp}_{i}_{unique_id}.jpg"
-            
-            pil_img = tensor_to_pil(img)
-            print(f"正在上传图片: {filename} \t文件类型: {type(pil_img)}")
-            
-            try:
-                result = self.put_object(pil_img, filename, access_key_id, access_key_secret, bucket_name, endpoint, use_temporary_url, expiration_hours)
-                results.append(result)
-            except Exception as e:
-                error_msg = f"上传失败 {filename}: {str(e)}"
-                print(error_msg)
-                results.append(error_msg)
-
-        return (", ".join(results),)
+            key = f"{folder}{prefix}_{timestamp}_{unique_id}.tar"
+            width = len(str(len(frames) - 1))
+            names = [f"{prefix}_{i:0{width}d}.jpg" for i in range(len(frames))]
+            return upload_archive(frames, bucket, key, names, save_options, "OSSAutoUploadNode", bucket_name, endpoint, max_workers,
+                                  async_upload, spool_upload, use_temporary_url, expiration_hours, cdn_domain, dedup_upload, derivatives)
+        
+        def make_key(i, ext):
+            # 自动生成文件名: 前缀_日期时间_序号_uuid.jpg
+            timestamp = generate_timestamp()
+            unique_id = str(uuid.uuid4())[:8]  # 使用UUID的前8位
+            return f"{folder}{prefix}_{timestamp}_{i}_{unique_id}.{ext}"
+        
+        # 并发编码+上传，衍生图规格（如缩略图）与原图同一轮编码、并发上传
+        results = upload_images(frames, bucket, folder, prefix, lambda frame: ("JPEG", save_options), make_key, "OSSAutoUploadNode",
+                                max_workers, async_upload, dedup_upload, spool_upload, parse_derivatives(derivatives), extension="jpg")
+        
+        # 上传完成后批量生成URL，签名URL在有效期窗口内复用缓存
+        build_result_urls(results, bucket, bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)
 
-    def put_object(self, file, filename, access_key_id, access_key_secret, bucket_name, endpoint, use_temporary_url="否", expiration_hours=24):
-        auth = oss2.Auth(access_key_id, access_key_secret)
-        bucket = oss2.Bucket(auth, endpoint, bucket_name)
-        image_bytes = BytesIO()
-        file.save(image_bytes, format='JPEG')  # 保存为 JPEG 格式
-        image_bytes.seek(0)  # 将流指针回到开头
-        try:
-            bucket.put_object(filename, image_bytes)
-            print(f'图片成功上传到 OSS，文件名为: {filename}')
-            
-            if use_temporary_url == "是":
-                # 生成带有过期时间的临时URL
-                url = bucket.sign_url('GET', filename, expiration_hours * 3600)  # 转换为秒
-                # 确保URL使用https协议
-                if url.startswith('http://'):
-                    url = 'https://' + url[7:]
-                print(f'生成临时URL，过期时间: {expiration_hours}小时')
-            else:
-                # 构建普通URL
-                url = f"https://{bucket_name}.{endpoint}/{filename}"
-            
-            return url
-        except oss2.exceptions.OssError as e:
-            raise ValueError(f'上传失败，错误信息: {e}')
+        return (results_to_legacy(results), results_to_json(results))
 
 # 节点映射字典
 NODE_CLASS_MAPPINGS = {
@@ -1,19 +1,25 @@
-import oss2
-import os
-import datetime
 import uuid
-from io import BytesIO
-from PIL.PngImagePlugin import PngInfo
-from comfy.cli_args import args
-import ast
+from functools import partial
 
+from .oss_archive import OUTPUT_MODES
+from .oss_autoformat import AUTO_FORMAT, FORMAT_OPTIONS, get_format_selector, workflow_identity
+from .oss_client import get_bucket
+from .oss_credentials import mask_key, validate_credentials
+from .oss_derivative import parse_derivatives
+from .oss_encoder import (
+    build_save_options,
+    ENCODE_PRESET_NAMES,
+    BOOL_OVERRIDE_OPTIONS,
+    JPEG_SUBSAMPLING_OPTIONS
+)
+from .oss_image_upload import build_result_urls, upload_archive, upload_images
+from .oss_metrics import get_metrics
+from .oss_result import results_to_json, results_to_legacy
 from .oss_utils import (
-    tensor_to_pil, 
-    image_to_base64, 
+    tensor_batch_to_uint8, 
     format_folder_path, 
     generate_timestamp, 
-    OSS_ENDPOINT_LIST,
-    IMAGE_FORMATS
+    OSS_ENDPOINT_LIST
 )
 
 class OSSAdvancedUploadNode:
@@ -28,89 +34,122 @@ class OSSAdvancedUploadNode:
                 "bucket_name": ("STRING", {"default": "bucket_name"}),
                 "endpoint": (OSS_ENDPOINT_LIST, {"default": "oss-cn-hangzhou.aliyuncs.com"}),
                 "folder": ("STRING", {"default": ""}),
-                "format": (IMAGE_FORMATS, {"default": "JPEG"}),
+                "format": (FORMAT_OPTIONS, {"default": "JPEG"}),
                 "include_date": (["是", "否"], {"default": "是"}),
                 "quality": ("INT", {"default": 90, "min": 1, "max": 100, "step": 1}),
+            },
+            "optional": {
+                "max_workers": ("INT", {"default": 4, "min": 1, "max": 32, "step": 1}),
+                "async_upload": (["是", "否"], {"default": "否"}),
+                "dedup_upload": (["是", "否"], {"default": "否"}),
+                "encode_preset": (ENCODE_PRESET_NAMES, {"default": "快速"}),
+                "png_compress_level": ("INT", {"default": -1, "min": -1, "max": 9, "step": 1}),
+                "webp_method": ("INT", {"default": -1, "min": -1, "max": 6, "step": 1}),
+                "jpeg_optimize": (BOOL_OVERRIDE_OPTIONS, {"default": "预设"}),
+                "jpeg_progressive": (BOOL_OVERRIDE_OPTIONS, {"default": "预设"}),
+                "jpeg_subsampling": (JPEG_SUBSAMPLING_OPTIONS, {"default": "预设"}),
+                "cdn_domain": ("STRING", {"default": ""}),
+                "spool_upload": (["是", "否"], {"default": "否"}),
+                "output_mode": (OUTPUT_MODES, {"default": "单独对象"}),
+                "derivatives": ("STRING", {"default": ""}),
+                "auto_max_kb": ("INT", {"default": 0, "min": 0, "max": 102400, "step": 1}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
+                "prompt": "PROMPT",
+                "extra_pnginfo": "EXTRA_PNGINFO",
             }
         }
 
     # 校验参数是否正确
     @classmethod
-    def VALIDATE_INPUTS(cls, image, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, format, include_date, quality):
-        print("参数校验:\t%s, %s, %s, %s, %s, %s, %s, %s, %s" % (prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, format, include_date, quality))
+    def VALIDATE_INPUTS(cls, image, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, format, include_date, quality, derivatives=None):
+        print("参数校验:\t%s, %s, %s, %s, %s, %s, %s, %s" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder, format, include_date, quality))
         if access_key_id == "" or access_key_secret == "" or bucket_name == "" or endpoint == "":
             return "关键参数不能为空"
         # 检查endpoint
         if endpoint not in OSS_ENDPOINT_LIST:
             return "endpoint 不正确\t %s" % endpoint
         # 检查图片格式
-        if format not in IMAGE_FORMATS:
+        if format not in FORMAT_OPTIONS:
             return "图片格式不支持\t %s" % format
         # 检查质量设置
         if quality < 1 or quality > 100:
             return "图片质量设置范围应为1-100"
-        return True
+        # 检查衍生图规格
+        try:
+            parse_derivatives(derivatives)
+        except ValueError as e:
+            return str(e)
+        return validate_credentials(access_key_id, access_key_secret, endpoint, bucket_name)
     
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("上传结果",)
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("上传结果", "结果详情")
     FUNCTION = "upload_to_oss"
     CATEGORY = "API/oss"
     OUTPUT_NODE = True
     
-    def upload_to_oss(self, image, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, format, include_date, quality):
-        print("参数信息: \t%s, %s, %s, %s, %s, %s, %s, %s, %s\n" % (prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, format, include_date, quality))
+    @get_metrics().track_node("OSSAdvancedUploadNode")
+    def upload_to_oss(self, image, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, format, include_date, quality, max_workers=4, async_upload="否", dedup_upload="否",
+                      encode_preset="快速", png_compress_level=-1, webp_method=-1, jpeg_optimize="预设", jpeg_progressive="预设", jpeg_subsampling="预设", cdn_domain="", spool_upload="否", output_mode="单独对象", derivatives="", auto_max_kb=0,
+                      unique_id=None, prompt=None, extra_pnginfo=None):
+        print("参数信息: \t%s, %s, %s, %s, %s, %s, %s, %s\n" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder, format, include_date, quality))
         
-        results = []
         folder = format_folder_path(folder)
+        metrics = get_metrics()
+        bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
+        # 整批一次性转换为uint8，每张图片只取零拷贝视图
+        with metrics.timed("tensor_to_host"):
+            frames = tensor_batch_to_uint8(image)
+        options_for = partial(build_save_options, quality=quality, preset=encode_preset, png_compress_level=png_compress_level,
+                              webp_method=webp_method, jpeg_optimize=jpeg_optimize, jpeg_progressive=jpeg_progressive,
+                              jpeg_subsampling=jpeg_subsampling)
+        
+        workflow_id = workflow_identity(prompt, extra_pnginfo) if format == AUTO_FORMAT else None
+
+        def resolve_format(frame):
+            """
+            返回 (格式, save 参数)；AUTO 时按图片类型试编码选择字节数最少的编码，同一工作流节点的结果会缓存
+            """
+            if format != AUTO_FORMAT:
+                return format, options_for(format)
+            # 不同工作流、节点或编码设置的选择结果互不影响（unique_id 在不同工作流中会重复）；
+            # 无法确定工作流或节点（如直接调用）时不缓存
+            workflow_key = None if unique_id is None or workflow_id is None else (
+                workflow_id, str(unique_id), quality, encode_preset, png_compress_level, webp_method,
+                jpeg_optimize, jpeg_progressive, jpeg_subsampling)
+            choice = get_format_selector().choose(frame, options_for, workflow_key, auto_max_kb * 1024 or None)
+            return choice.format, choice.save_options(options_for)
+        
+        if output_mode == "归档":
+            # 归档内的图片使用同一种格式，AUTO 时按第一张图片选择
+            archive_format, save_options = resolve_format(frames[0])
+            timestamp = ""
+            if include_date == "是":
+                timestamp = generate_timestamp() + "_"
+            name_id = str(uuid.uuid4())[:8]  # 使用UUID的前8位
+            key = f"{folder}{prefix}_{timestamp}{name_id}.tar"
+            width = len(str(len(frames) - 1))
+            names = [f"{prefix}_{i:0{width}d}.{archive_format.lower()}" for i in range(len(frames))]
+            return upload_archive(frames, bucket, key, names, save_options, "OSSAdvancedUploadNode", bucket_name, endpoint, max_workers,
+                                  async_upload, spool_upload, cdn_domain=cdn_domain, dedup_upload=dedup_upload, derivatives=derivatives)
         
-        for i, img in enumerate(image):
+        def make_key(i, ext):
             # 自动生成文件名
             timestamp = ""
             if include_date == "是":
                 timestamp = generate_timestamp() + "_"
-            
-            unique_id = str(uuid.uuid4())[:8]  # 使用UUID的前8位
-            
-            # 文件扩展名根据格式确定
-            ext = format.lower()
-            
-            filename = f"{folder}{prefix}_{timestamp}{i}_{unique_id}.{ext}"
-            
-            pil_img = tensor_to_pil(img)
-            print(f"正在上传图片: {filename} \t文件类型: {type(pil_img)} \t格式: {format} \t质量: {quality}")
-            
-            try:
-                result = self.put_object(pil_img, filename, access_key_id, access_key_secret, bucket_name, endpoint, format, quality)
-                results.append(result)
-            except Exception as e:
-                error_msg = f"上传失败 {filename}: {str(e)}"
-                print(error_msg)
-                results.append(error_msg)
-
-        return (", ".join(results),)
-
-    def put_object(self, file, filename, access_key_id, access_key_secret, bucket_name, endpoint, format, quality):
-        auth = oss2.Auth(access_key_id, access_key_secret)
-        bucket = oss2.Bucket(auth, endpoint, bucket_name)
-        image_bytes = BytesIO()
+            name_id = str(uuid.uuid4())[:8]  # 使用UUID的前8位
+            return f"{folder}{prefix}_{timestamp}{i}_{name_id}.{ext}"
         
-        # 保存为指定格式
-        # PNG格式不使用quality参数
-        if format == "PNG":
-            file.save(image_bytes, format=format)
-        else:
-            file.save(image_bytes, format=format, quality=quality)
-            
-        image_bytes.seek(0)  # 将流指针回到开头
+        # 并发编码+上传，衍生图规格（如缩略图）与原图同一轮编码、并发上传
+        results = upload_images(frames, bucket, folder, prefix, resolve_format, make_key, "OSSAdvancedUploadNode", max_workers,
+                                async_upload, dedup_upload, spool_upload, parse_derivatives(derivatives), encode_preset)
         
-        try:
-            bucket.put_object(filename, image_bytes)
-            print(f'图片成功上传到 OSS，文件名为: {filename}')
-            # 构建可能的URL（注意：这个URL可能需要根据你的OSS配置调整）
-            url = f"https://{bucket_name}.{endpoint}/{filename}"
-            return url
-        except oss2.exceptions.OssError as e:
-            raise ValueError(f'上传失败，错误信息: {e}')
+        # 上传完成后批量生成URL（注意：URL可能需要根据你的OSS配置调整，或通过 cdn_domain 使用CDN域名）
+        build_result_urls(results, bucket, bucket_name, endpoint, cdn_domain=cdn_domain)
+
+        return (results_to_legacy(results), results_to_json(results))
 
 # 节点映射字典
 NODE_CLASS_MAPPINGS = {
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+from .oss_endpoint import public_endpoint, to_public_url
+from .oss_metrics import get_metrics
+
+# 签名URL缓存的最大条目数
+URL_CACHE_MAX_ENTRIES = 10000
+# 过期时间对齐的粒度上限（秒）：同一窗口内对同一对象的请求复用同一个签名
+URL_SIGN_WINDOW = 300
+
+
+def _https(url):
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(scheme="https"))
+
+
+def rewrite_cdn(url, cdn_domain):
+    """
+    将URL的域名替换为CDN域名
+
+    Args:
+        url: OSS URL
+        cdn_domain: CDN域名（可带 https:// 前缀），为空时原样返回
+
+    Returns:
+        str: 使用CDN域名的URL
+    """
+    cdn_domain = (cdn_domain or "").strip().rstrip("/")
+    if not cdn_domain:
+        return url
+    cdn = urlsplit(cdn_domain if "://" in cdn_domain else f"https://{cdn_domain}")
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(scheme=cdn.scheme, netloc=cdn.netloc))
+
+
+class URLService:
+    """
+    对象URL生成：签名URL按 (对象, 有效期, 过期窗口) 缓存
+
+    过期时间按窗口对齐为 ceil(当前时间 / 窗口) * 窗口 + 有效期，保证返回的URL
+    剩余有效期不少于请求的时长，同一窗口内重复请求同一对象得到同一个URL。
+    """
+
+    def __init__(self, max_entries=URL_CACHE_MAX_ENTRIES, window_seconds=URL_SIGN_WINDOW):
+        self.max_entries = max_entries
+        self.window_seconds = window_seconds
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expires_at(self, expires, now):
+        # 窗口不超过有效期的十分之一，避免短有效期的URL多出过多时间
+        window = max(1, min(self.window_seconds, expires // 10))
+        return (now // window + 1) * window + expires
+
+    def sign_urls(self, bucket, keys, expires, endpoint=""):
+        """
+        批量生成签名URL（https，auto 端点下使用公网域名）
+
+        Args:
+            bucket: oss2.Bucket
+            keys: 对象名列表
+            expires: 有效期（秒）
+            endpoint: 节点中选择的端点
+
+        Returns:
+            dict: 对象名 -> 签名URL
+        """
+        now = int(time.time())
+        expires_at = self._expires_at(expires, now)
+        identity = (bucket.endpoint, bucket.bucket_name, getattr(bucket.auth, "id", ""), endpoint, expires_at)
+        metrics = get_metrics()
+
+        urls = {}
+        missing = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                url = self._cache.get(identity + (key,))
+                if url is None:
+                    missing.append(key)
+                else:
+                    self._cache.move_to_end(identity + (key,))
+                    urls[key] = url
+        metrics.inc("url_cache_total", len(urls), result="hit")
+        if not missing:
+            return urls
+        metrics.inc("url_cache_total", len(missing), result="miss")
+
+        signed = {}
+        with metrics.timed("sign_url"):
+            for key in missing:
+                # sign_url 按相对秒数计算过期时间，这里换算为对齐后的绝对时间
+                url = bucket.sign_url('GET', key, expires_at - int(time.time()))
+                signed[key] = _https(to_public_url(url, bucket, endpoint))
+
+        with self._lock:
+            for key, url in signed.items():
+                self._cache[identity + (key,)] = url
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        urls.update(signed)
+        return urls
+
+    def build_urls(self, bucket, keys, bucket_name, endpoint, use_temporary_url="否", expiration_hours=24, cdn_domain=""):
+        """
+        为一批对象生成返回给用户的URL
+
+        Args:
+            bucket: oss2.Bucket
+            keys: 对象名列表
+            bucket_name: 存储桶名称
+            endpoint: 节点中选择的端点
+            use_temporary_url: 是否生成带过期时间的签名URL（是/否）
+            expiration_hours: 签名URL有效期（小时）
+            cdn_domain: CDN域名，为空时使用OSS域名
+
+        Returns:
+            dict: 对象名 -> URL
+        """
+        if use_temporary_url == "是":
+            urls = self.sign_urls(bucket, keys, expiration_hours * 3600, endpoint)
+            print(f'生成临时URL，过期时间: {expiration_hours}小时')
+        else:
+            host = public_endpoint(endpoint)
+            urls = {key: f"https://{bucket_name}.{host}/{key}" for key in keys}
+        if cdn_domain and cdn_domain.strip():
+            urls = {key: rewrite_cdn(url, cdn_domain) for key, url in urls.items()}
+        return urls
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# 所有节点共享的URL服务
+_URL_SERVICE = URLService()
+
+
+def get_url_service():
+    """
+    获取进程级URL服务
+
+    Returns:
+        URLService: 共享的URL服务
+    """
+    return _URL_SERVICE
+
+
+def build_url(bucket, key, bucket_name, endpoint, use_temporary_url="否", expiration_hours=24, cdn_domain=""):
+    """
+    为单个对象生成返回给用户的URL，参数同 URLService.build_urls
+
+    Returns:
+        str: URL
+    """
+    return _URL_SERVICE.build_urls(bucket, [key], bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)[key]
@@ -5,6 +5,7 @@ from PIL import Image
 import datetime
 import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 def tensor_to_pil(image):
     """
@@ -16,7 +17,56 @@ def tensor_to_pil(image):
     Returns:
         PIL.Image: 转换后的PIL图像
     """
-    return Image.fromarray(np.clip(255. * image.cpu().numpy().squeeze(), 0, 255).astype(np.uint8))
+    return Image.fromarray(np.squeeze(tensor_batch_to_uint8(image)))
+
+def tensor_batch_to_uint8(images):
+    """
+    将整批图像张量一次性转换为uint8数组
+    
+    缩放和截断在张量所在设备上以float32完成，只向主机传输一次uint8数据，
+    不产生float64中间副本。
+    
+    Args:
+        images: 图像张量，形状为[N, H, W, C]，取值范围0-1
+        
+    Returns:
+        numpy.ndarray: 形状相同的uint8数组
+    """
+    if hasattr(images, "detach"):
+        batch = images.detach()
+        scaled = batch.float()
+        # float()在已是float32时返回原张量，此时不能原地修改输入
+        scaled = scaled.mul(255.0) if scaled is batch else scaled.mul_(255.0)
+        return scaled.clamp_(0, 255).byte().cpu().numpy()
+    
+    scaled = np.multiply(images, 255.0, dtype=np.float32)
+    np.clip(scaled, 0, 255, out=scaled)
+    return scaled.astype(np.uint8)
+
+def uint8_to_pil(frame):
+    """
+    将单帧uint8数组转换为PIL图像（不复制数组）
+    
+    Args:
+        frame: 形状为[H, W, C]的uint8数组
+        
+    Returns:
+        PIL.Image: 转换后的PIL图像
+    """
+    return Image.fromarray(np.squeeze(frame))
+
+def batch_to_pil(images):
+    """
+    批量将图像张量转换为PIL图像
+    
+    Args:
+        images: 图像张量，形状为[N, H, W, C]
+        
+    Yields:
+        PIL.Image: 每一帧对应的PIL图像
+    """
+    for frame in tensor_batch_to_uint8(images):
+        yield uint8_to_pil(frame)
 
 def image_to_base64(pil_image, pnginfo=None):
     """
@@ -83,6 +133,25 @@ def check_directory(check_dir):
         os.makedirs(check_dir, exist_ok=True)
     return check_dir
 
+def map_ordered(func, items, max_workers=1):
+    """
+    使用线程池并发执行任务，结果顺序与输入顺序一致
+
+    Args:
+        func: 处理单个元素的函数
+        items: 待处理的元素列表
+        max_workers: 最大并发线程数，小于等于1时顺序执行
+
+    Returns:
+        list: 与items顺序一致的结果列表
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
+
 # OSS端点列表
 OSS_ENDPOINT_LIST = [
     "oss-cn-hangzhou.aliyuncs.com",
@@ -103,6 +172,14 @@ OSS_ENDPOINT_LIST = [
     "oss-cn-chengdu-internal.aliyuncs.com"
 ]
 
+# 自动选择内网/公网端点的选项，如 "auto:oss-cn-hangzhou"（见 oss_endpoint.py）
+AUTO_ENDPOINT_PREFIX = "auto:"
+OSS_ENDPOINT_LIST += [
+    AUTO_ENDPOINT_PREFIX + endpoint.split(".", 1)[0]
+    for endpoint in OSS_ENDPOINT_LIST
+    if "-internal" not in endpoint
+]
+
 # 支持的图片格式
 IMAGE_FORMATS = [
     "JPEG",
@@ -1,12 +1,18 @@
-import oss2
-import os
 import datetime
 import uuid
-from io import BytesIO
-import tempfile
-import shutil
-from comfy.cli_args import args
 
+from .oss_adaptive import plan_upload
+from .oss_buffer import UploadBuffer
+from .oss_checkpoint import CheckpointStore, abort_stale_uploads
+from .oss_client import get_bucket
+from .oss_credentials import mask_key, validate_credentials
+from .oss_metrics import get_metrics
+from .oss_queue import get_upload_queue
+from .oss_result import UploadResult, owns_buffer, results_to_json, STATUS_QUEUED, STATUS_SPOOLED, STATUS_UPLOADED
+from .oss_retry import put_object_with_retry
+from .oss_spool import get_spool
+from .oss_url import build_url
+from .oss_multipart import MultipartStreamWriter, upload_multipart
 from .oss_utils import (
     format_folder_path, 
     generate_timestamp, 
@@ -15,6 +21,9 @@ from .oss_utils import (
 
 # ComfyUI视频上传节点 - 支持MP4格式
 
+# 上传策略：手动按阈值和分片参数上传，自适应按测得的延迟和带宽选择
+UPLOAD_STRATEGIES = ["手动", "自适应"]
+
 class OSSVideoUploadNode:
     @classmethod
     def INPUT_TYPES(cls):
@@ -33,13 +42,16 @@ class OSSVideoUploadNode:
                 "use_temporary_url": (["是", "否"], {"default": "否"}),
                 "expiration_hours": ("INT", {"default": 24, "min": 1, "max": 720, "step": 1}),
                 "custom_filename": ("STRING", {"default": ""}),
+                "async_upload": (["是", "否"], {"default": "否"}),
+                "cdn_domain": ("STRING", {"default": ""}),
+                "spool_upload": (["是", "否"], {"default": "否"}),
             }
         }
 
     # 校验参数是否正确
     @classmethod
     def VALIDATE_INPUTS(cls, video, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, use_temporary_url=None, expiration_hours=None, custom_filename=None):
-        print("视频上传参数校验:\t%s, %s, %s, %s, %s, %s, %s" % (prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date))
+        print("视频上传参数校验:\t%s, %s, %s, %s, %s, %s" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder, include_date))
         
         if access_key_id == "" or access_key_secret == "" or bucket_name == "" or endpoint == "":
             return "关键参数不能为空"
@@ -48,18 +60,20 @@ class OSSVideoUploadNode:
         if endpoint not in OSS_ENDPOINT_LIST:
             return "endpoint 不正确\t %s" % endpoint
             
-        return True
+        return validate_credentials(access_key_id, access_key_secret, endpoint, bucket_name)
     
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("上传结果",)
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("上传结果", "结果详情")
     FUNCTION = "upload_video_to_oss"
     CATEGORY = "API/oss"
     OUTPUT_NODE = True
     
-    def upload_video_to_oss(self, video, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, use_temporary_url="否", expiration_hours=24, custom_filename=""):
-        print("视频上传参数信息: \t%s, %s, %s, %s, %s, %s, %s\n" % (prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date))
+    @get_metrics().track_node("OSSVideoUploadNode")
+    def upload_video_to_oss(self, video, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, use_temporary_url="否", expiration_hours=24, custom_filename="", async_upload="否", cdn_domain="", spool_upload="否"):
+        print("视频上传参数信息: \t%s, %s, %s, %s, %s, %s\n" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder, include_date))
         
         folder = format_folder_path(folder)
+        result = UploadResult()
         
         try:
             # 生成文件名
@@ -80,52 +94,75 @@ class OSSVideoUploadNode:
                 filename = f"{folder}{prefix}_{timestamp}{unique_id}.mp4"
             
             print(f"正在上传视频: {filename}")
+            result.key = filename
             
-            result = self.put_video_object(video, filename, access_key_id, access_key_secret, bucket_name, endpoint, use_temporary_url, expiration_hours)
-            return (result,)
+            self.put_video_object(video, filename, access_key_id, access_key_secret, bucket_name, endpoint, use_temporary_url, expiration_hours, async_upload, cdn_domain, result, spool_upload)
             
         except Exception as e:
             error_msg = f"视频上传失败: {str(e)}"
             print(error_msg)
-            return (error_msg,)
+            get_metrics().inc("objects_total", node="OSSVideoUploadNode", result="failed")
+            result.fail(error_msg)
+        
+        return (result.legacy(), results_to_json([result]))
+
+    def put_video_object(self, video, filename, access_key_id, access_key_secret, bucket_name, endpoint, use_temporary_url="否", expiration_hours=24, async_upload="否", cdn_domain="", result=None, spool_upload="否"):
+        """
+        保存并上传视频，result 不为 None 时记录上传状态、大小、ETag 与耗时
+        
+        Returns:
+            str: 视频URL
+        """
+        if result is None:
+            result = UploadResult(filename)
+        import oss2
 
-    def put_video_object(self, video, filename, access_key_id, access_key_secret, bucket_name, endpoint, use_temporary_url="否", expiration_hours=24):
-        auth = oss2.Auth(access_key_id, access_key_secret)
-        bucket = oss2.Bucket(auth, endpoint, bucket_name)
+        bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
+        metrics = get_metrics()
+        # 视频较大时缓冲区转存到临时文件，上传时通过 mmap 读取
+        video_bytes = UploadBuffer()
         
         try:
-            # 将视频对象转换为字节流
-            video_bytes = BytesIO()
             
             # 使用MP4格式（ComfyUI目前只支持MP4）
             from comfy_api.util import VideoContainer, VideoCodec
             
             # 保存视频到字节流
-            video.save_to(video_bytes, format=VideoContainer.MP4, codec=VideoCodec.AUTO)
+            with metrics.timed("video_save"), result.timed("video_save"):
+                video.save_to(video_bytes, format=VideoContainer.MP4, codec=VideoCodec.AUTO)
             video_bytes.seek(0)
+            result.bytes = video_bytes.size
             
-            # 上传到OSS
-            bucket.put_object(filename, video_bytes)
-            
-            print(f'视频成功上传到 OSS，文件名为: {filename}')
-            
-            if use_temporary_url == "是":
-                # 生成带有过期时间的临时URL
-                url = bucket.sign_url('GET', filename, expiration_hours * 3600)  # 转换为秒
-                # 确保URL使用https协议
-                if url.startswith('http://'):
-                    url = 'https://' + url[7:]
-                print(f'生成临时URL，过期时间: {expiration_hours}小时')
+            if spool_upload == "是":
+                # 先写入本地暂存目录（落盘后返回），由后台线程上传
+                get_spool().add(bucket, filename, video_bytes)
+                print(f'视频已写入本地暂存目录，文件名为: {filename}')
+                metrics.inc("objects_total", node="OSSVideoUploadNode", result="spooled")
+                result.status = STATUS_SPOOLED
+            elif async_upload == "是":
+                # 交给后台队列上传，URL立即返回
+                get_upload_queue().submit(bucket, filename, video_bytes)
+                print(f'视频已加入后台上传队列，文件名为: {filename}')
+                metrics.inc("objects_total", node="OSSVideoUploadNode", result="queued")
+                result.status = STATUS_QUEUED
             else:
-                # 构建普通URL
-                url = f"https://{bucket_name}.{endpoint}/{filename}"
+                # 上传到OSS
+                with result.timed("upload"):
+                    result.record_response(put_object_with_retry(bucket, filename, video_bytes))
+                print(f'视频成功上传到 OSS，文件名为: {filename}')
+                metrics.inc("objects_total", node="OSSVideoUploadNode", result="uploaded")
+                result.status = STATUS_UPLOADED
             
-            return url
+            result.url = build_url(bucket, filename, bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)
+            return result.url
             
         except oss2.exceptions.OssError as e:
             raise ValueError(f'视频上传失败，错误信息: {e}')
         except Exception as e:
             raise ValueError(f'视频处理失败，错误信息: {e}')
+        finally:
+            if owns_buffer(result.status):
+                video_bytes.close()
 
 class OSSVideoAdvancedUploadNode:
     @classmethod
@@ -147,13 +184,22 @@ class OSSVideoAdvancedUploadNode:
                 "expiration_hours": ("INT", {"default": 24, "min": 1, "max": 720, "step": 1}),
                 "custom_filename": ("STRING", {"default": ""}),
                 "content_type": ("STRING", {"default": "video/mp4"}),
+                "streaming_upload": (["是", "否"], {"default": "否"}),
+                "part_size_mb": ("INT", {"default": 10, "min": 1, "max": 5120, "step": 1}),
+                "part_concurrency": ("INT", {"default": 4, "min": 1, "max": 32, "step": 1}),
+                "resumable_upload": (["是", "否"], {"default": "否"}),
+                "checkpoint_dir": ("STRING", {"default": ""}),
+                "async_upload": (["是", "否"], {"default": "否"}),
+                "cdn_domain": ("STRING", {"default": ""}),
+                "spool_upload": (["是", "否"], {"default": "否"}),
+                "upload_strategy": (UPLOAD_STRATEGIES, {"default": "手动"}),
             }
         }
 
     # 校验参数是否正确
     @classmethod
-    def VALIDATE_INPUTS(cls, video, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, multipart_threshold, use_temporary_url=None, expiration_hours=None, custom_filename=None, content_type=None):
-        print("高级视频上传参数校验:\t%s, %s, %s, %s, %s, %s, %s, %s" % (prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, multipart_threshold))
+    def VALIDATE_INPUTS(cls, video, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, multipart_threshold, use_temporary_url=None, expiration_hours=None, custom_filename=None, content_type=None, resumable_upload=None):
+        print("高级视频上传参数校验:\t%s, %s, %s, %s, %s, %s, %s" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder, include_date, multipart_threshold))
         
         if access_key_id == "" or access_key_secret == "" or bucket_name == "" or endpoint == "":
             return "关键参数不能为空"
@@ -165,19 +211,25 @@ class OSSVideoAdvancedUploadNode:
         # 检查分片上传阈值
         if multipart_threshold < 1 or multipart_threshold > 1000:
             return "分片上传阈值范围应为1-1000MB"
+        
+        # 断点按对象名匹配，自动生成的文件名每次都不同，重新运行时无法续传
+        if resumable_upload == "是" and isinstance(custom_filename, str) and not custom_filename.strip():
+            return "断点续传需要设置 custom_filename（固定的对象名），否则重新运行时无法匹配断点"
             
-        return True
+        return validate_credentials(access_key_id, access_key_secret, endpoint, bucket_name)
     
-    RETURN_TYPES = ("STRING", "STRING", "INT")
-    RETURN_NAMES = ("上传结果", "文件大小", "上传时间(秒)")
+    RETURN_TYPES = ("STRING", "STRING", "INT", "STRING")
+    RETURN_NAMES = ("上传结果", "文件大小", "上传时间(秒)", "结果详情")
     FUNCTION = "upload_video_to_oss_advanced"
     CATEGORY = "API/oss"
     OUTPUT_NODE = True
     
-    def upload_video_to_oss_advanced(self, video, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, multipart_threshold, use_temporary_url="否", expiration_hours=24, custom_filename="", content_type="video/mp4"):
-        print("高级视频上传参数信息: \t%s, %s, %s, %s, %s, %s, %s, %s\n" % (prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, multipart_threshold))
+    @get_metrics().track_node("OSSVideoAdvancedUploadNode")
+    def upload_video_to_oss_advanced(self, video, prefix, access_key_id, access_key_secret, bucket_name, endpoint, folder, include_date, multipart_threshold, use_temporary_url="否", expiration_hours=24, custom_filename="", content_type="video/mp4", streaming_upload="否", part_size_mb=10, part_concurrency=4, resumable_upload="否", checkpoint_dir="", async_upload="否", cdn_domain="", spool_upload="否", upload_strategy="手动"):
+        print("高级视频上传参数信息: \t%s, %s, %s, %s, %s, %s, %s\n" % (prefix, mask_key(access_key_id), bucket_name, endpoint, folder, include_date, multipart_threshold))
         
         folder = format_folder_path(folder)
+        result = UploadResult()
         
         try:
             # 生成文件名
@@ -198,37 +250,68 @@ class OSSVideoAdvancedUploadNode:
                 filename = f"{folder}{prefix}_{timestamp}{unique_id}.mp4"
             
             print(f"正在上传视频: {filename}")
+            result.key = filename
+            if resumable_upload == "是" and not (custom_filename and custom_filename.strip()):
+                # custom_filename 来自连线时校验阶段无法检查，这里只提示，上传照常进行
+                result.warn("断点续传未设置 custom_filename，对象名每次都不同，中断后重新运行无法续传")
             
             start_time = datetime.datetime.now()
-            result, file_size_mb = self.put_video_object_advanced(video, filename, access_key_id, access_key_secret, bucket_name, endpoint, multipart_threshold, use_temporary_url, expiration_hours, content_type)
+            url, file_size_mb = self.put_video_object_advanced(video, filename, access_key_id, access_key_secret, bucket_name, endpoint, multipart_threshold, use_temporary_url, expiration_hours, content_type, streaming_upload, part_size_mb, part_concurrency, resumable_upload, checkpoint_dir, async_upload, cdn_domain, result, spool_upload, upload_strategy)
             end_time = datetime.datetime.now()
             
             upload_time = int((end_time - start_time).total_seconds())
             
-            return (result, f"{file_size_mb:.2f} MB", upload_time)
+            return (url, f"{file_size_mb:.2f} MB", upload_time, results_to_json([result]))
             
         except Exception as e:
             error_msg = f"视频上传失败: {str(e)}"
             print(error_msg)
-            return (error_msg, "0 MB", 0)
+            get_metrics().inc("objects_total", node="OSSVideoAdvancedUploadNode", result="failed")
+            result.fail(error_msg)
+            return (error_msg, "0 MB", 0, results_to_json([result]))
 
-    def put_video_object_advanced(self, video, filename, access_key_id, access_key_secret, bucket_name, endpoint, multipart_threshold, use_temporary_url="否", expiration_hours=24, content_type="video/mp4"):
-        auth = oss2.Auth(access_key_id, access_key_secret)
-        bucket = oss2.Bucket(auth, endpoint, bucket_name)
+    def put_video_object_advanced(self, video, filename, access_key_id, access_key_secret, bucket_name, endpoint, multipart_threshold, use_temporary_url="否", expiration_hours=24, content_type="video/mp4", streaming_upload="否", part_size_mb=10, part_concurrency=4, resumable_upload="否", checkpoint_dir="", async_upload="否", cdn_domain="", result=None, spool_upload="否", upload_strategy="手动"):
+        if result is None:
+            result = UploadResult(filename)
+        import oss2
+
+        bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
+        metrics = get_metrics()
+        video_bytes = None
         
         try:
-            # 将视频对象转换为字节流
-            video_bytes = BytesIO()
+            checkpoint_store = None
+            if resumable_upload == "是":
+                checkpoint_store = self.prepare_checkpoint_store(bucket, checkpoint_dir)
+            
+            deferred = [name for name, value in (("spool_upload", spool_upload), ("async_upload", async_upload)) if value == "是"]
+            if deferred and streaming_upload == "是":
+                # 流式上传边编码边发送，没有完整的视频可写入暂存目录或交给后台队列
+                result.warn(f"流式上传模式下 {'、'.join(deferred)} 不生效，视频直接上传到 OSS，上传失败时不会保留在本地暂存目录")
+            elif deferred and checkpoint_store is not None:
+                result.warn(f"{'、'.join(deferred)} 模式下断点续传不生效，由暂存目录或后台队列负责重试")
+            
+            if streaming_upload == "是":
+                file_size_mb = self.stream_video_object(video, filename, bucket, content_type, part_size_mb, part_concurrency, checkpoint_store, result)
+                metrics.inc("objects_total", node="OSSVideoAdvancedUploadNode", result="uploaded")
+                result.status = STATUS_UPLOADED
+                result.url = build_url(bucket, filename, bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)
+                return result.url, file_size_mb
+            
+            # 视频较大时缓冲区转存到临时文件，上传时通过 mmap 读取
+            video_bytes = UploadBuffer()
             
             # 使用MP4格式（ComfyUI目前只支持MP4）
             from comfy_api.util import VideoContainer, VideoCodec
             
             # 保存视频到字节流
-            video.save_to(video_bytes, format=VideoContainer.MP4, codec=VideoCodec.AUTO)
+            with metrics.timed("video_save"), result.timed("video_save"):
+                video.save_to(video_bytes, format=VideoContainer.MP4, codec=VideoCodec.AUTO)
             video_bytes.seek(0)
             
-            # 获取文件大小
-            file_size = len(video_bytes.getvalue())
+            # 获取文件大小（不复制内容）
+            file_size = video_bytes.size
+            result.bytes = file_size
             file_size_mb = file_size / (1024*1024)
             
             print(f"视频文件大小: {file_size_mb:.2f} MB")
@@ -236,58 +319,118 @@ class OSSVideoAdvancedUploadNode:
             # 设置Content-Type
             headers = {'Content-Type': content_type}
             
-            if file_size_mb > multipart_threshold:
+            # 断点续传要求分片大小固定，只在非续传模式下自适应
+            adaptive = upload_strategy == "自适应" and checkpoint_store is None
+            if adaptive:
+                plan = plan_upload(bucket, video_bytes)
+                print(f"自适应上传策略: {plan.describe()}")
+                upload_options = plan.queue_options()
+            else:
+                upload_options = {
+                    "multipart_threshold": multipart_threshold * 1024 * 1024,
+                    "part_size": part_size_mb * 1024 * 1024,
+                    "concurrency": part_concurrency,
+                }
+            
+            if spool_upload == "是":
+                # 先写入本地暂存目录（落盘后返回），由后台线程按阈值决定是否分片上传
+                get_spool().add(bucket, filename, video_bytes, headers=headers, **upload_options)
+                print(f'视频已写入本地暂存目录，文件名为: {filename}')
+                metrics.inc("objects_total", node="OSSVideoAdvancedUploadNode", result="spooled")
+                result.status = STATUS_SPOOLED
+                result.url = build_url(bucket, filename, bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)
+                return result.url, file_size_mb
+            
+            if async_upload == "是":
+                # 交给后台队列上传，URL立即返回；是否分片由队列按阈值决定
+                get_upload_queue().submit(bucket, filename, video_bytes, headers=headers, **upload_options)
+                print(f'视频已加入后台上传队列，文件名为: {filename}')
+                metrics.inc("objects_total", node="OSSVideoAdvancedUploadNode", result="queued")
+                result.status = STATUS_QUEUED
+                result.url = build_url(bucket, filename, bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)
+                return result.url, file_size_mb
+            
+            if adaptive:
+                with result.timed("upload"):
+                    if plan.multipart:
+                        result.record_response(upload_multipart(bucket, filename, video_bytes, part_size=plan.part_size, concurrency=plan.concurrency, headers=headers))
+                    else:
+                        result.record_response(put_object_with_retry(bucket, filename, video_bytes, headers=headers))
+            
+            elif file_size_mb > multipart_threshold:
                 # 使用分片上传
                 print(f"文件大小 {file_size_mb:.2f}MB 超过阈值 {multipart_threshold}MB，使用分片上传")
                 
-                # 初始化分片上传
-                upload_id = bucket.init_multipart_upload(filename, headers=headers).upload_id
-                
-                # 分片大小设为10MB
-                part_size = 10 * 1024 * 1024
-                parts = []
-                
-                video_bytes.seek(0)
-                part_number = 1
-                while True:
-                    data = video_bytes.read(part_size)
-                    if not data:
-                        break
-                    
-                    print(f"上传分片 {part_number}")
-                    result = bucket.upload_part(filename, upload_id, part_number, data)
-                    parts.append(oss2.models.PartInfo(part_number, result.etag))
-                    part_number += 1
-                
-                # 完成分片上传
-                bucket.complete_multipart_upload(filename, upload_id, parts)
-                print(f"分片上传完成，共 {len(parts)} 个分片")
+                # 并发上传分片，分片大小会自动放大以保证不超过10000个分片
+                with result.timed("upload"):
+                    result.record_response(upload_multipart(bucket, filename, video_bytes, part_size=part_size_mb * 1024 * 1024, concurrency=part_concurrency, headers=headers, checkpoint_store=checkpoint_store))
                 
             else:
                 # 普通上传
                 print(f"文件大小 {file_size_mb:.2f}MB 小于阈值 {multipart_threshold}MB，使用普通上传")
                 video_bytes.seek(0)
-                bucket.put_object(filename, video_bytes, headers=headers)
+                with result.timed("upload"):
+                    result.record_response(put_object_with_retry(bucket, filename, video_bytes, headers=headers))
             
             print(f'视频成功上传到 OSS，文件名为: {filename}')
+            metrics.inc("objects_total", node="OSSVideoAdvancedUploadNode", result="uploaded")
+            result.status = STATUS_UPLOADED
             
-            if use_temporary_url == "是":
-                # 生成带有过期时间的临时URL
-                url = bucket.sign_url('GET', filename, expiration_hours * 3600)  # 转换为秒
-                # 确保URL使用https协议
-                if url.startswith('http://'):
-                    url = 'https://' + url[7:]
-                print(f'生成临时URL，过期时间: {expiration_hours}小时')
-            else:
-                # 构建普通URL
-                url = f"https://{bucket_name}.{endpoint}/{filename}"
-            
-            return url, file_size_mb
+            result.url = build_url(bucket, filename, bucket_name, endpoint, use_temporary_url, expiration_hours, cdn_domain)
+            return result.url, file_size_mb
             
         except oss2.exceptions.OssError as e:
             raise ValueError(f'视频上传失败，错误信息: {e}')
         except Exception as e:
             raise ValueError(f'视频处理失败，错误信息: {e}')
+        finally:
+            if video_bytes is not None and owns_buffer(result.status):
+                video_bytes.close()
+
+    def prepare_checkpoint_store(self, bucket, checkpoint_dir=""):
+        """
+        打开断点目录，并顺带清理断点中记录的、长时间未完成的遗留分片上传
+        
+        Returns:
+            CheckpointStore: 断点存储
+        """
+        checkpoint_store = CheckpointStore(checkpoint_dir.strip() or None)
+        try:
+            # 只清理本插件记录的 upload_id，不触碰存储桶中其他来源的分片上传
+            abort_stale_uploads(bucket, checkpoint_store)
+        except Exception as e:
+            print(f"清理遗留分片上传失败: {e}")
+        return checkpoint_store
+
+    def stream_video_object(self, video, filename, bucket, content_type="video/mp4", part_size_mb=10, part_concurrency=4, checkpoint_store=None, result=None):
+        """
+        流式上传：封装器直接写入分片写入器，写满一个分片即上传，不在内存中保留完整视频
+        result 不为 None 时记录大小与耗时（编码与上传同时进行，记为 video_save）
+        
+        Returns:
+            float: 视频文件大小(MB)
+        """
+        from comfy_api.util import VideoContainer, VideoCodec
+        
+        print("使用流式分片上传")
+        writer = MultipartStreamWriter(bucket, filename, headers={'Content-Type': content_type}, part_size=part_size_mb * 1024 * 1024, concurrency=part_concurrency, checkpoint_store=checkpoint_store)
+        if result is None:
+            result = UploadResult(filename)
+        try:
+            with get_metrics().timed("video_save"), result.timed("video_save"):
+                video.save_to(writer, format=VideoContainer.MP4, codec=VideoCodec.AUTO)
+        except Exception:
+            writer.abort()
+            raise
+        with result.timed("upload"):
+            file_size = writer.close()
+        result.bytes = file_size
+        result.record_response(writer.response)
+        
+        file_size_mb = file_size / (1024*1024)
+        print(f"视频文件大小: {file_size_mb:.2f} MB")
+        print(f'视频成功上传到 OSS，文件名为: {filename}')
+        return file_size_mb
 
 # 节点映射字典
 NODE_CLASS_MAPPINGS = {
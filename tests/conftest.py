@@ -0,0 +1,98 @@
+"""
+单元测试的公共夹具
+
+插件目录名含连字符，无法直接 import，这里复用性能测试的 load_package 以包的形式加载；
+需要 OSS 的测试使用 benchmarks/fake_oss_server.py 中的本地替身服务。
+
+运行:
+    python -m pytest -q
+"""
+import importlib
+import os
+import sys
+import time
+
+import pytest
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+sys.path.insert(0, BENCH_DIR)
+
+from bench_upload import PACKAGE_NAME, load_package  # noqa: E402
+from fake_oss_server import FakeOSSServer  # noqa: E402
+
+load_package()
+
+
+def module(name):
+    """
+    获取插件中的模块，如 module("oss_spool")
+    """
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
+
+
+class FakeClock:
+    """
+    替换模块中的 time，测试中手动推进时间
+    """
+
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FlakyBucket:
+    """
+    前 failures 次上传返回 AccessDenied（不可重试）的存储桶替身，成功上传的对象保存在 objects 中
+    """
+
+    def __init__(self, failures, endpoint="stub-endpoint"):
+        import oss2
+
+        self.endpoint = endpoint
+        self.bucket_name = "bench"
+        self.failures = failures
+        self.objects = {}
+        self._error = oss2.exceptions.AccessDenied
+
+    def put_object(self, key, data, headers=None, progress_callback=None):
+        if self.failures:
+            self.failures -= 1
+            raise self._error(403, {}, "", {"Code": "AccessDenied", "Message": "denied"})
+        self.objects[key] = bytes(data)
+
+
+def wait_until(predicate, timeout=10):
+    """
+    轮询等待后台线程使 predicate 成立
+    """
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_server():
+    with FakeOSSServer(keep_data=True) as server:
+        yield server
+
+
+@pytest.fixture
+def bucket(fake_server):
+    import oss2
+
+    return oss2.Bucket(oss2.Auth("access_key_id", "access_key_secret"), f"http://{fake_server.endpoint}", "bench")
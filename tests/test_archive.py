@@ -0,0 +1,60 @@
+import io
+import json
+import tarfile
+
+import numpy as np
+from PIL import Image
+
+from conftest import module
+
+archive = module("oss_archive")
+encoder = module("oss_encoder")
+image_upload = module("oss_image_upload")
+
+KEY = "out/batch.tar"
+
+
+def make_frames(count=3, height=24, width=32):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(count, height, width, 3), dtype=np.uint8)
+
+
+def test_archive_index_round_trip(bucket, fake_server):
+    frames = make_frames()
+    names = [f"img_{i}.png" for i in range(len(frames))]
+    results = archive.upload_image_archive(bucket, KEY, frames, encoder.build_save_options("PNG"), names)
+
+    index = archive.read_archive_index(bucket, KEY)
+    assert list(index) == names
+    for frame, name, result in zip(frames, names, results):
+        offset, size = index[name]
+        assert result.member == name
+        assert result.range == f"bytes={offset}-{offset + size - 1}"
+        data = bucket.get_object(KEY, byte_range=(offset, offset + size - 1)).read()
+        assert np.array_equal(np.asarray(Image.open(io.BytesIO(data))), frame)
+
+    # 同时是标准 tar，可直接解开
+    stored = fake_server.state.objects[("bench", KEY)][1]
+    with tarfile.open(fileobj=io.BytesIO(stored)) as tar:
+        members = tar.getnames()
+        assert members == [archive.ARCHIVE_POINTER_NAME] + names + [archive.ARCHIVE_INDEX_NAME]
+        assert json.load(tar.extractfile(archive.ARCHIVE_INDEX_NAME))["version"] == 1
+
+
+def test_ignored_options_recorded_as_warnings(bucket):
+    frames = make_frames(count=2)
+    url, details = image_upload.upload_archive(frames, bucket, KEY, ["a.jpg", "b.jpg"], encoder.build_save_options("JPEG"),
+                                               "OSSAutoUploadNode", "bench", bucket.endpoint,
+                                               dedup_upload="是", derivatives="256:WEBP")
+
+    results = json.loads(details)
+    assert url.endswith(KEY)
+    assert [len(result["warnings"]) for result in results] == [2, 2]
+    assert "dedup_upload" in results[0]["warnings"][0]
+    assert "derivatives" in results[0]["warnings"][1]
+
+
+def test_no_warnings_by_default(bucket):
+    _, details = image_upload.upload_archive(make_frames(count=1), bucket, KEY, ["a.jpg"], encoder.build_save_options("JPEG"),
+                                             "OSSAutoUploadNode", "bench", bucket.endpoint)
+    assert json.loads(details)[0]["warnings"] == []
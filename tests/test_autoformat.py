@@ -0,0 +1,121 @@
+import io
+from functools import partial
+
+import numpy as np
+import pytest
+
+from conftest import module
+
+autoformat = module("oss_autoformat")
+encoder = module("oss_encoder")
+
+options_for = partial(encoder.build_save_options, quality=90, preset="快速")
+
+
+def photo(height=512, width=512, channels=3):
+    rng = np.random.default_rng(1)
+    gradient = np.linspace(0, 200, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 20, size=(height, width, channels))
+    return np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+
+def flat(height=512, width=512):
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, width // 2:] = (30, 120, 200)
+    frame[height // 4:height // 2, :] = (255, 255, 255)
+    return frame
+
+
+def encoded_size(frame, save_options):
+    buffer = io.BytesIO()
+    autoformat.uint8_to_pil(frame).save(buffer, **save_options)
+    return buffer.tell()
+
+
+@pytest.fixture
+def trials(monkeypatch):
+    """
+    记录试编码次数
+    """
+    calls = []
+    encoded = autoformat._encoded_size
+
+    def counting(image, save_options):
+        calls.append(save_options["format"])
+        return encoded(image, save_options)
+
+    monkeypatch.setattr(autoformat, "_encoded_size", counting)
+    return calls
+
+
+def test_classify_image():
+    assert autoformat.classify_image(flat()) == "flat"
+    assert autoformat.classify_image(photo()) == "photo"
+    assert autoformat.classify_image(photo(channels=4)) == "alpha"
+
+
+def test_flat_images_stay_lossless():
+    choice = autoformat.FormatSelector().choose(flat(), options_for)
+    assert choice.format == "PNG" or choice.extra.get("lossless")
+
+
+def test_photo_picks_smallest_lossy(trials):
+    frame = photo()
+    choice = autoformat.FormatSelector().choose(frame, options_for)
+
+    assert choice.format in ("JPEG", "WEBP")
+    assert trials == ["JPEG", "WEBP"]
+    sizes = {fmt: encoded_size(frame, options_for(fmt)) for fmt in ("JPEG", "WEBP")}
+    # 图块试编码的结论与整图一致
+    assert min(sizes, key=sizes.get) == choice.format
+
+
+def test_choice_cached_per_workflow_key(trials):
+    selector = autoformat.FormatSelector()
+    first = selector.choose(photo(), options_for, ("workflow-a", "7"))
+    count = len(trials)
+
+    assert selector.choose(photo(), options_for, ("workflow-a", "7")) is first
+    assert len(trials) == count
+    # 另一个工作流中 unique_id 相同的节点重新试编码
+    selector.choose(photo(), options_for, ("workflow-b", "7"))
+    assert len(trials) == count * 2
+    # 没有工作流键时不缓存
+    selector.choose(photo(), options_for)
+    assert len(trials) == count * 3
+
+
+def test_budget_lowers_quality():
+    frame = photo()
+    selector = autoformat.FormatSelector()
+    unbounded = selector.choose(frame, options_for)
+    full_size = encoded_size(frame, unbounded.save_options(options_for))
+
+    choice = selector.choose(frame, options_for, max_bytes=full_size // 2)
+
+    assert choice.extra["quality"] < 90
+    assert encoded_size(frame, choice.save_options(options_for)) <= full_size // 2 * 1.2
+
+
+def test_generous_budget_keeps_quality():
+    frame = photo()
+    choice = autoformat.FormatSelector().choose(frame, options_for, max_bytes=100 * 1024 * 1024)
+    assert "quality" not in choice.extra
+
+
+def test_budget_does_not_degrade_flat_images():
+    choice = autoformat.FormatSelector().choose(flat(), options_for, max_bytes=1)
+    assert choice.format == "PNG" or choice.extra.get("lossless")
+
+
+def test_workflow_identity():
+    prompt = {"3": {"class_type": "KSampler", "inputs": {"seed": 1}}, "9": {"class_type": "OSSAdvancedUploadNode", "inputs": {}}}
+    reseeded = {"3": {"class_type": "KSampler", "inputs": {"seed": 2}}, "9": {"class_type": "OSSAdvancedUploadNode", "inputs": {}}}
+    other = {"5": {"class_type": "LoadImage", "inputs": {}}, "9": {"class_type": "OSSAdvancedUploadNode", "inputs": {}}}
+
+    # 只改变输入值时标识不变，不同工作流的标识不同
+    assert autoformat.workflow_identity(prompt) == autoformat.workflow_identity(reseeded)
+    assert autoformat.workflow_identity(prompt) != autoformat.workflow_identity(other)
+    # 优先使用前端的工作流 id
+    assert autoformat.workflow_identity(prompt, {"workflow": {"id": "abc"}}) == "id:abc"
+    assert autoformat.workflow_identity(None, None) is None
@@ -0,0 +1,44 @@
+from conftest import module
+
+buffer_module = module("oss_buffer")
+
+
+def test_grow_while_view_is_held():
+    buffer = buffer_module.UploadBuffer(initial_size=16)
+    buffer.write(b"header")
+    view = buffer.getbuffer()
+    buffer.seek(0)
+    chunk = buffer.read(3)
+    buffer.seek(0, 2)
+
+    # 超过容量时扩容，不能因为仍有 memoryview 存活而失败
+    buffer.write(b"x" * 100)
+
+    assert bytes(buffer.getbuffer()) == b"header" + b"x" * 100
+    assert buffer.capacity >= 106
+    # 扩容前返回的视图仍然有效
+    assert bytes(view) == b"header"
+    assert bytes(chunk) == b"hea"
+
+
+def test_spill_to_temp_file():
+    buffer = buffer_module.UploadBuffer(initial_size=16, spill_threshold=64)
+    buffer.write(b"a" * 40)
+    buffer.write(b"b" * 40)
+
+    assert buffer.spilled
+    assert buffer.capacity == 0
+    assert buffer.read_at(38, 4) == b"aabb"
+    assert bytes(buffer.getbuffer()) == b"a" * 40 + b"b" * 40
+    buffer.close()
+
+
+def test_reset_after_spill_returns_to_memory():
+    buffer = buffer_module.UploadBuffer(initial_size=16, spill_threshold=64)
+    buffer.write(b"a" * 100)
+    buffer.reset()
+
+    assert not buffer.spilled
+    assert buffer.size == 0
+    buffer.write(b"small")
+    assert bytes(buffer.getbuffer()) == b"small"
@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+from conftest import module
+
+checkpoint = module("oss_checkpoint")
+multipart = module("oss_multipart")
+
+PART_SIZE = multipart.MIN_PART_SIZE
+KEY = "video/resume.mp4"
+
+
+@pytest.fixture
+def data():
+    return os.urandom(PART_SIZE * 3 + 1000)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return checkpoint.CheckpointStore(str(tmp_path / "checkpoints"))
+
+
+@pytest.fixture
+def sent_parts(monkeypatch):
+    """
+    记录实际发送的分片编号；fail_on 中的分片发送失败（模拟上传中断）
+    """
+    sent = []
+    fail_on = set()
+    upload_part = multipart.upload_part_with_retry
+
+    def recording(bucket, key, upload_id, part_number, chunk):
+        if part_number in fail_on:
+            raise ConnectionAbortedError(f"分片 {part_number} 中断")
+        sent.append(part_number)
+        return upload_part(bucket, key, upload_id, part_number, chunk)
+
+    monkeypatch.setattr(multipart, "upload_part_with_retry", recording)
+    return sent, fail_on
+
+
+def interrupted_upload(bucket, store, data, sent_parts):
+    # 最后两个分片都失败，中断时服务端只有前两个分片
+    sent, fail_on = sent_parts
+    fail_on.update((3, 4))
+    with pytest.raises(ConnectionAbortedError):
+        multipart.upload_multipart(bucket, KEY, data, part_size=PART_SIZE, concurrency=1, checkpoint_store=store)
+    fail_on.clear()
+    sent.clear()
+
+
+def test_interrupted_upload_keeps_checkpoint(bucket, fake_server, store, data, sent_parts):
+    interrupted_upload(bucket, store, data, sent_parts)
+
+    record = store.load(bucket.bucket_name, bucket.endpoint, KEY)
+    assert sorted(record["parts"]) == ["1", "2"]
+    assert record["upload_id"] in fake_server.state.uploads
+    assert ("bench", KEY) not in fake_server.state.objects
+
+
+def test_resume_sends_only_missing_parts(bucket, fake_server, store, data, sent_parts):
+    interrupted_upload(bucket, store, data, sent_parts)
+    upload_id = store.load(bucket.bucket_name, bucket.endpoint, KEY)["upload_id"]
+
+    multipart.upload_multipart(bucket, KEY, data, part_size=PART_SIZE, concurrency=1, checkpoint_store=store)
+
+    assert sent_parts[0] == [3, 4]
+    assert fake_server.state.objects[("bench", KEY)][1] == data
+    assert upload_id not in fake_server.state.uploads
+    # 完成后删除断点
+    assert store.load(bucket.bucket_name, bucket.endpoint, KEY) is None
+
+
+def test_resume_resends_changed_parts(bucket, fake_server, store, data, sent_parts):
+    interrupted_upload(bucket, store, data, sent_parts)
+    changed = os.urandom(PART_SIZE) + data[PART_SIZE:]
+
+    multipart.upload_multipart(bucket, KEY, changed, part_size=PART_SIZE, concurrency=1, checkpoint_store=store)
+
+    # 服务端已有分片的 ETag 与本次数据不一致时重新发送
+    assert sent_parts[0] == [1, 3, 4]
+    assert fake_server.state.objects[("bench", KEY)][1] == changed
+
+
+def test_expired_upload_restarts(bucket, fake_server, store, data, sent_parts):
+    interrupted_upload(bucket, store, data, sent_parts)
+    stale_id = store.load(bucket.bucket_name, bucket.endpoint, KEY)["upload_id"]
+    bucket.abort_multipart_upload(KEY, stale_id)
+
+    multipart.upload_multipart(bucket, KEY, data, part_size=PART_SIZE, concurrency=1, checkpoint_store=store)
+
+    assert sent_parts[0] == [1, 2, 3, 4]
+    assert fake_server.state.objects[("bench", KEY)][1] == data
+
+
+def test_abort_stale_uploads_only_recorded(bucket, fake_server, store, data, sent_parts):
+    interrupted_upload(bucket, store, data, sent_parts)
+    record = store.load(bucket.bucket_name, bucket.endpoint, KEY)
+    other_id = bucket.init_multipart_upload("other/upload.bin").upload_id
+    # 断点超过遗留时长（save 会刷新 updated，这里直接改写文件）
+    record["updated"] = 0
+    with open(store._path(bucket.bucket_name, bucket.endpoint, KEY), "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+    assert checkpoint.abort_stale_uploads(bucket, store, force=True) == 1
+    assert record["upload_id"] not in fake_server.state.uploads
+    # 其他工具发起的分片上传不受影响
+    assert other_id in fake_server.state.uploads
+
+
+def test_part_size_change_aborts_old_upload(bucket, fake_server, store, data, sent_parts):
+    interrupted_upload(bucket, store, data, sent_parts)
+
+    multipart.upload_multipart(bucket, KEY, data, part_size=PART_SIZE * 2, concurrency=1, checkpoint_store=store)
+
+    assert sent_parts[0] == [1, 2]
+    assert fake_server.state.objects[("bench", KEY)][1] == data
+    # 旧的分片上传已取消，没有遗留
+    assert fake_server.state.uploads == {}
+    assert store.load(bucket.bucket_name, bucket.endpoint, KEY) is None
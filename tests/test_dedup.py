@@ -0,0 +1,86 @@
+import pytest
+
+from conftest import module
+
+dedup = module("oss_dedup")
+
+
+@pytest.fixture
+def heads(bucket, monkeypatch):
+    """
+    记录发往服务端的 HEAD 请求（对象名列表）
+    """
+    sent = []
+    object_exists = bucket.object_exists
+
+    def counting(key, *args, **kwargs):
+        sent.append(key)
+        return object_exists(key, *args, **kwargs)
+
+    monkeypatch.setattr(bucket, "object_exists", counting)
+    return sent
+
+
+@pytest.fixture
+def index(tmp_path):
+    return dedup.DedupIndex(str(tmp_path / "dedup"))
+
+
+class RegionBucket:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.bucket_name = "bench"
+
+    def object_exists(self, key):
+        raise AssertionError("索引应命中，不应发送 HEAD 请求")
+
+
+def test_content_key_depends_only_on_content():
+    digest = dedup.content_hash(b"image")
+    assert digest == dedup.content_hash(bytearray(b"image")) == dedup.content_hash(memoryview(b"image"))
+    assert digest != dedup.content_hash(b"other")
+    assert dedup.content_key("out/", "comfyui", digest, "png") == f"out/comfyui_{digest[:dedup.CONTENT_HASH_LENGTH]}.png"
+
+
+def test_head_fallback_confirms_existing_object(index, bucket, heads):
+    bucket.put_object("out/a.png", b"a")
+    assert index.contains(bucket, "out/a.png")
+    assert not index.contains(bucket, "out/missing.png")
+    assert heads == ["out/a.png", "out/missing.png"]
+
+    # HEAD 确认过的对象写入索引，之后不再请求；不存在的对象每次都确认
+    assert index.contains(bucket, "out/a.png")
+    assert not index.contains(bucket, "out/missing.png")
+    assert heads == ["out/a.png", "out/missing.png", "out/missing.png"]
+
+
+def test_added_object_hits_memory_without_head(index, bucket, heads):
+    index.add(bucket, "out/b.png")
+    assert index.contains(bucket, "out/b.png")
+    assert heads == []
+
+
+def test_sqlite_index_survives_restart_and_memory_eviction(tmp_path, bucket, heads):
+    index_dir = str(tmp_path / "dedup")
+    first = dedup.DedupIndex(index_dir, memory_entries=1)
+    first.add(bucket, "out/a.png")
+    first.add(bucket, "out/b.png")
+    # a 已被挤出内存 LRU，由 SQLite 命中
+    assert list(first._memory) == [(dedup._bucket_id(bucket), "out/b.png")]
+    assert first.contains(bucket, "out/a.png")
+
+    restarted = dedup.DedupIndex(index_dir)
+    assert restarted.contains(bucket, "out/a.png")
+    assert restarted.contains(bucket, "out/b.png")
+    assert heads == []
+
+
+def test_index_is_shared_by_internal_and_public_endpoints(index):
+    index.add(RegionBucket("http://oss-cn-hangzhou-internal.aliyuncs.com"), "out/c.png")
+    assert index.contains(RegionBucket("http://oss-cn-hangzhou.aliyuncs.com"), "out/c.png")
+
+
+def test_index_separates_buckets_and_regions(index, bucket, heads):
+    index.add(RegionBucket("http://oss-cn-shanghai.aliyuncs.com"), "out/d.png")
+    assert not index.contains(bucket, "out/d.png")
+    assert heads == ["out/d.png"]
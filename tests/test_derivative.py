@@ -0,0 +1,41 @@
+import pytest
+
+from conftest import module
+
+derivative = module("oss_derivative")
+
+
+def specs(spec):
+    return [(d.size, d.format, d.quality) for d in derivative.parse_derivatives(spec)]
+
+
+def test_parse_defaults_and_separators():
+    assert specs("") == []
+    assert specs(None) == []
+    assert specs("256") == [(256, "WEBP", 80)]
+    assert specs("256:webp:70, 1024:jpg:85") == [(256, "WEBP", 70), (1024, "JPEG", 85)]
+    # 全角逗号、分号和空白同样可以分隔
+    assert specs("128:PNG；512，2048 ") == [(128, "PNG", 80), (512, "WEBP", 80), (2048, "WEBP", 80)]
+
+
+@pytest.mark.parametrize("spec", [
+    "abc",
+    "256:WEBP:80:1",
+    "256:GIF",
+    "8",
+    "9000",
+    "256:JPEG:0",
+    "256:JPEG:101",
+    "256:WEBP, 256:webp:60",
+])
+def test_parse_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        derivative.parse_derivatives(spec)
+
+
+def test_key_for():
+    original = "out/comfyui_20240101_0_ab12cd34.jpg"
+    assert derivative.Derivative(256, "WEBP").key_for(original) == "out/comfyui_20240101_0_ab12cd34_256.webp"
+    assert derivative.Derivative(1024, "PNG").key_for(original) == "out/comfyui_20240101_0_ab12cd34_1024.png"
+    # JPEG 衍生图与基本节点原图一样使用 .jpg
+    assert derivative.Derivative(512, "JPEG").key_for(original) == "out/comfyui_20240101_0_ab12cd34_512.jpg"
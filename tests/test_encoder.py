@@ -0,0 +1,55 @@
+from conftest import module
+
+encoder = module("oss_encoder")
+buffer_module = module("oss_buffer")
+
+MB = 1024 * 1024
+
+
+def filled_buffer(size):
+    buffer = buffer_module.UploadBuffer()
+    buffer.write(bytes(size))
+    return buffer
+
+
+def test_small_buffers_are_reused():
+    pool = encoder.BufferPool()
+    buffer = filled_buffer(100)
+    pool.release(buffer)
+
+    reused = pool.acquire()
+    assert reused is buffer
+    assert reused.size == 0
+    assert pool.pooled_bytes == 0
+
+
+def test_grown_buffers_are_released():
+    pool = encoder.BufferPool(max_buffer_bytes=4 * MB)
+    buffer = filled_buffer(5 * MB)
+    pool.release(buffer)
+
+    assert buffer.closed
+    assert pool.pooled_bytes == 0
+    assert pool.acquire() is not buffer
+
+
+def test_total_pooled_bytes_capped():
+    pool = encoder.BufferPool(max_buffers=32, max_buffer_bytes=4 * MB, max_bytes=8 * MB)
+    buffers = [filled_buffer(3 * MB) for _ in range(4)]
+    for buffer in buffers:
+        pool.release(buffer)
+
+    # 每个缓冲区容量 3MB，总容量上限内只能保留两个
+    assert pool.pooled_bytes == 6 * MB
+    assert [buffer.closed for buffer in buffers] == [False, False, True, True]
+
+
+def test_spilled_buffers_are_released():
+    pool = encoder.BufferPool()
+    buffer = buffer_module.UploadBuffer(spill_threshold=1024)
+    buffer.write(bytes(2048))
+    assert buffer.spilled
+    pool.release(buffer)
+
+    assert buffer.closed
+    assert pool.pooled_bytes == 0
@@ -0,0 +1,125 @@
+import socket
+import time
+
+import pytest
+
+from conftest import module
+
+endpoint = module("oss_endpoint")
+retry = module("oss_retry")
+
+AUTO = "auto:local"
+
+
+@pytest.fixture
+def listening():
+    """
+    本地监听端口，代替可达的 OSS 端点（探测只建立 TCP 连接）
+    """
+    servers = []
+
+    def start():
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        servers.append(server)
+        return f"127.0.0.1:{server.getsockname()[1]}"
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def closed_port():
+    """
+    刚释放的本地端口，代替不可达的端点
+    """
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    port = server.getsockname()[1]
+    server.close()
+    return f"127.0.0.1:{port}"
+
+
+@pytest.fixture
+def selector():
+    return endpoint.EndpointSelector(probe_timeout=0.5)
+
+
+def open_breaker(monkeypatch, candidate):
+    breaker = retry.CircuitBreaker(candidate, failure_threshold=1)
+    breaker.record_failure()
+    monkeypatch.setitem(retry._BREAKERS, endpoint._breaker_key(candidate), breaker)
+
+
+def test_probe_endpoint_measures_reachable_and_unreachable(listening, closed_port):
+    latency = endpoint.probe_endpoint(listening(), timeout=0.5)
+    assert isinstance(latency, float) and latency >= 0
+    assert endpoint.probe_endpoint(closed_port, timeout=0.5) is None
+
+
+def test_resolve_skips_unreachable_candidate(selector, listening, closed_port):
+    reachable = listening()
+    selector.set_candidates(AUTO, [closed_port, reachable])
+    assert selector.resolve(AUTO) == reachable
+
+
+def test_resolve_prefers_first_reachable_candidate(selector, listening):
+    internal, public = listening(), listening()
+    selector.set_candidates(AUTO, [internal, public])
+    assert selector.resolve(AUTO) == internal
+
+
+def test_resolve_picks_faster_candidate_beyond_margin(selector, monkeypatch):
+    latencies = {"internal:80": 0.5, "public:80": 0.01}
+    monkeypatch.setattr(endpoint, "probe_endpoint", lambda candidate, timeout: latencies[candidate])
+    selector.set_candidates(AUTO, list(latencies))
+    assert selector.resolve(AUTO) == "public:80"
+
+
+def test_resolve_falls_back_to_public_when_none_reachable(selector, closed_port):
+    public = "127.0.0.1:1"
+    selector.set_candidates(AUTO, [closed_port, public])
+    assert selector.resolve(AUTO) == public
+    # 回退结果只缓存较短时间，之后重新探测
+    assert selector._cache[AUTO][1] - time.monotonic() <= selector.fallback_ttl
+
+
+def test_resolve_reprobes_when_chosen_endpoint_breaker_opens(selector, listening, monkeypatch):
+    internal, public = listening(), listening()
+    selector.set_candidates(AUTO, [internal, public])
+    assert selector.resolve(AUTO) == internal
+    open_breaker(monkeypatch, internal)
+    assert selector.resolve(AUTO) == public
+
+
+def test_non_auto_endpoint_is_unchanged(selector):
+    assert selector.resolve("oss-cn-hangzhou.aliyuncs.com") == "oss-cn-hangzhou.aliyuncs.com"
+    assert selector.public_endpoint("oss-cn-hangzhou.aliyuncs.com") == "oss-cn-hangzhou.aliyuncs.com"
+
+
+def test_default_candidates_put_internal_first(selector):
+    assert selector.candidates("auto:oss-cn-hangzhou") == [
+        "oss-cn-hangzhou-internal.aliyuncs.com", "oss-cn-hangzhou.aliyuncs.com"]
+    assert selector.public_endpoint("auto:oss-cn-hangzhou") == "oss-cn-hangzhou.aliyuncs.com"
+
+
+def test_to_public_url_replaces_internal_host():
+    class InternalBucket:
+        endpoint = "http://oss-cn-hangzhou-internal.aliyuncs.com"
+
+    url = "http://bench.oss-cn-hangzhou-internal.aliyuncs.com/a.png?Signature=x"
+    assert endpoint.to_public_url(url, InternalBucket(), "auto:oss-cn-hangzhou") == \
+        "http://bench.oss-cn-hangzhou.aliyuncs.com/a.png?Signature=x"
+    assert endpoint.to_public_url(url, InternalBucket(), "oss-cn-hangzhou-internal.aliyuncs.com") == url
+
+
+@pytest.mark.parametrize("value, region", [
+    ("oss-cn-hangzhou.aliyuncs.com", "oss-cn-hangzhou"),
+    ("http://oss-cn-hangzhou-internal.aliyuncs.com", "oss-cn-hangzhou"),
+    ("https://oss-cn-hangzhou.aliyuncs.com", "oss-cn-hangzhou"),
+    ("http://127.0.0.1:9000", "127.0.0.1:9000"),
+])
+def test_endpoint_region_matches_internal_and_public(value, region):
+    assert endpoint.endpoint_region(value) == region
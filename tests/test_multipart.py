@@ -0,0 +1,50 @@
+import os
+
+from conftest import module
+
+multipart = module("oss_multipart")
+buffer_module = module("oss_buffer")
+
+PART_SIZE = multipart.MIN_PART_SIZE
+
+
+def test_stream_writer_round_trip(bucket, fake_server):
+    data = os.urandom(PART_SIZE * 3 + 500)
+    writer = multipart.MultipartStreamWriter(bucket, "video/stream.mp4", part_size=PART_SIZE, concurrency=2)
+    for offset in range(0, len(data), 7000):
+        writer.write(data[offset:offset + 7000])
+    # 封装器结束时回写文件头部
+    writer.seek(0)
+    writer.write(b"HEAD")
+    writer.close()
+
+    assert writer.parts_count == 4
+    assert fake_server.state.objects[("bench", "video/stream.mp4")][1] == b"HEAD" + data[4:]
+    assert fake_server.state.uploads == {}
+
+
+def test_stream_writer_sends_parts_without_copy(bucket, monkeypatch):
+    sent = []
+    upload_part = multipart.upload_part_with_retry
+
+    def recording(bucket, key, upload_id, part_number, data):
+        sent.append((part_number, type(data), data.size))
+        return upload_part(bucket, key, upload_id, part_number, data)
+
+    monkeypatch.setattr(multipart, "upload_part_with_retry", recording)
+    writer = multipart.MultipartStreamWriter(bucket, "video/nocopy.mp4", part_size=PART_SIZE, concurrency=1)
+    writer.write(bytes(PART_SIZE * 2 + 10))
+    writer.close()
+
+    # 分片的 bytearray 直接包装为 UploadBuffer 发送，不转换为 bytes
+    assert sorted(sent) == [(1, buffer_module.UploadBuffer, PART_SIZE), (2, buffer_module.UploadBuffer, PART_SIZE),
+                            (3, buffer_module.UploadBuffer, 10)]
+
+
+def test_small_stream_falls_back_to_put(bucket, fake_server):
+    writer = multipart.MultipartStreamWriter(bucket, "video/small.mp4", part_size=PART_SIZE)
+    writer.write(b"tiny video")
+    writer.close()
+
+    assert writer.parts_count == 0
+    assert fake_server.state.objects[("bench", "video/small.mp4")][1] == b"tiny video"
@@ -0,0 +1,57 @@
+import pytest
+
+from conftest import FlakyBucket, module, wait_until
+
+queue_module = module("oss_queue")
+spool_module = module("oss_spool")
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return spool_module.UploadSpool(str(tmp_path / "spool"))
+
+
+def test_failed_task_handed_to_spool(spool):
+    queue = queue_module.UploadQueue(spool=spool)
+    bucket = FlakyBucket(failures=1, endpoint="queue-spool-endpoint")
+    uploaded = []
+
+    queue.submit(bucket, "out/a.png", b"image", on_success=lambda: uploaded.append("out/a.png"))
+    assert queue.flush(timeout=10)
+
+    status = queue.status()
+    assert status["spooled_after_failure"] == 1
+    assert status["failed"] == 0
+    assert len(status["recent_errors"]) == 1
+    # 暂存目录接手后上传成功，回调随之执行
+    assert bucket.objects == {"out/a.png": b"image"}
+    wait_until(lambda: uploaded == ["out/a.png"])
+
+
+def test_task_dropped_when_spool_fails(spool, monkeypatch):
+    queue = queue_module.UploadQueue(spool=spool)
+
+    def broken_add(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(spool, "add", broken_add)
+    queue.submit(FlakyBucket(failures=1, endpoint="queue-drop-endpoint"), "out/b.png", b"image")
+    assert queue.flush(timeout=10, include_spool=False)
+
+    status = queue.status()
+    assert status["failed"] == 1
+    assert status["spooled_after_failure"] == 0
+    assert "disk full" in status["recent_errors"][0]
+
+
+def test_callback_error_is_not_an_upload_failure(spool):
+    queue = queue_module.UploadQueue(spool=spool)
+    bucket = FlakyBucket(failures=0, endpoint="queue-callback-endpoint")
+
+    def broken_callback():
+        raise RuntimeError("index locked")
+
+    queue.submit(bucket, "out/c.png", b"image", on_success=broken_callback)
+    wait_until(lambda: queue.status()["completed"] == 1)
+    assert bucket.objects == {"out/c.png": b"image"}
+    assert queue.status()["spooled_after_failure"] == 0
@@ -0,0 +1,49 @@
+import pytest
+
+from conftest import module
+
+ratelimit = module("oss_ratelimit")
+
+
+@pytest.fixture
+def token_bucket(monkeypatch, clock):
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return ratelimit.TokenBucket(rate=100, burst=100)
+
+
+def test_burst_available_immediately(token_bucket):
+    assert token_bucket.reserve(60) == 0
+    assert token_bucket.reserve(40) == 0
+
+
+def test_debt_is_queued_in_arrival_order(token_bucket):
+    assert token_bucket.reserve(100) == 0
+    # 令牌不足时记为欠账，后来的申请排在前面的欠账之后
+    assert token_bucket.reserve(100) == pytest.approx(1.0)
+    assert token_bucket.reserve(50) == pytest.approx(1.5)
+
+
+def test_refill_pays_off_debt(token_bucket, clock):
+    token_bucket.reserve(100)
+    token_bucket.reserve(150)
+
+    clock.advance(1.0)
+    assert token_bucket.reserve(0) == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert token_bucket.reserve(0) == 0
+    assert token_bucket.reserve(10) == pytest.approx(0.1)
+
+
+def test_idle_refill_capped_at_burst(token_bucket, clock):
+    token_bucket.reserve(100)
+    clock.advance(60)
+    assert token_bucket.reserve(100) == 0
+    assert token_bucket.reserve(1) == pytest.approx(0.01)
+
+
+def test_default_burst_is_one_second(monkeypatch, clock):
+    monkeypatch.setattr(ratelimit, "time", clock)
+    token_bucket = ratelimit.TokenBucket(rate=50)
+    assert token_bucket.burst == 50 * ratelimit.RATE_LIMIT_BURST_SECONDS
+    assert token_bucket.reserve(token_bucket.burst) == 0
+    assert token_bucket.reserve(25) == pytest.approx(0.5)
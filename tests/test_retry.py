@@ -0,0 +1,130 @@
+import oss2
+import pytest
+
+from conftest import module
+
+retry = module("oss_retry")
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    monkeypatch.setattr(retry, "time", clock)
+    return retry.CircuitBreaker("test-endpoint", failure_threshold=3, reset_seconds=30)
+
+
+def test_breaker_opens_after_consecutive_failures(breaker):
+    for _ in range(2):
+        breaker.allow()
+        breaker.record_failure()
+    assert not breaker.is_open()
+
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open()
+    with pytest.raises(retry.CircuitOpenError):
+        breaker.allow()
+
+
+def test_success_resets_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open()
+
+
+def test_half_open_allows_single_probe(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.advance(29)
+    with pytest.raises(retry.CircuitOpenError):
+        breaker.allow()
+
+    clock.advance(1)
+    breaker.allow()
+    # 试探请求进行中，其他请求仍被拒绝
+    with pytest.raises(retry.CircuitOpenError):
+        breaker.allow()
+    assert breaker.is_open()
+
+
+def test_probe_success_closes(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(30)
+    breaker.allow()
+    breaker.record_success()
+
+    assert not breaker.is_open()
+    breaker.allow()
+    breaker.allow()
+
+
+def test_probe_failure_reopens(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(30)
+    breaker.allow()
+    breaker.record_failure()
+
+    # 重新计时，需再等待 reset_seconds
+    clock.advance(29)
+    with pytest.raises(retry.CircuitOpenError):
+        breaker.allow()
+    clock.advance(1)
+    breaker.allow()
+
+
+def test_probe_released_on_non_network_error(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(30)
+    breaker.allow()
+    breaker.release_probe()
+
+    # 未得出结论，下一个请求继续试探
+    breaker.allow()
+    assert breaker.is_open()
+
+
+class StubBucket:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.bucket_name = "bench"
+
+
+def test_call_with_retry_trips_breaker(monkeypatch):
+    monkeypatch.setattr(retry, "backoff_delay", lambda attempt: 0)
+    bucket = StubBucket("breaker-test-endpoint")
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise oss2.exceptions.RequestError(ConnectionError("connection refused"))
+
+    with pytest.raises(oss2.exceptions.RequestError):
+        retry.call_with_retry(bucket, "test", failing, attempts=retry.BREAKER_FAILURE_THRESHOLD)
+    assert len(calls) == retry.BREAKER_FAILURE_THRESHOLD
+    assert retry.get_breaker(bucket.endpoint).is_open()
+
+    # 熔断后请求不再发出
+    with pytest.raises(retry.CircuitOpenError):
+        retry.call_with_retry(bucket, "test", failing)
+    assert len(calls) == retry.BREAKER_FAILURE_THRESHOLD
+
+
+def test_call_with_retry_does_not_count_client_errors(monkeypatch):
+    bucket = StubBucket("client-error-endpoint")
+    calls = []
+
+    def rejected():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    for _ in range(retry.BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises(ValueError):
+            retry.call_with_retry(bucket, "test", rejected)
+    assert len(calls) == retry.BREAKER_FAILURE_THRESHOLD + 1
+    assert not retry.get_breaker(bucket.endpoint).is_open()
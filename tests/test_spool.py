@@ -0,0 +1,121 @@
+import json
+import os
+import time
+
+import pytest
+
+from conftest import FlakyBucket, module, wait_until
+
+spool_module = module("oss_spool")
+
+
+def write_slot(slot_dir, records, data, tail=""):
+    """
+    构造进程崩溃后留下的槽位：清单记录、数据文件，以及可选的写到一半的最后一行
+    """
+    objects_dir = os.path.join(slot_dir, "objects")
+    os.makedirs(objects_dir, exist_ok=True)
+    with open(os.path.join(slot_dir, "manifest.jsonl"), "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(tail)
+    for name, content in data.items():
+        with open(os.path.join(objects_dir, name), "wb") as f:
+            f.write(content)
+
+
+def add_record(entry_id, key, size):
+    return {"op": "add", "id": entry_id, "bucket": "bench", "key": key, "size": size}
+
+
+def read_manifest(slot_dir):
+    with open(os.path.join(slot_dir, "manifest.jsonl"), encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def crashed_slot(tmp_path):
+    root = str(tmp_path / "spool")
+    write_slot(root, [
+        add_record("pending", "out/pending.png", 7),
+        add_record("cached", "out/cached.png", 6),
+        {"op": "done", "id": "cached", "time": 1.0},
+        add_record("evicted", "out/evicted.png", 5),
+        {"op": "done", "id": "evicted", "time": 1.0},
+        {"op": "evict", "id": "evicted"},
+        add_record("missing", "out/missing.png", 4),
+    ], {
+        "pending.bin": b"pending",
+        "cached.bin": b"cached",
+        # 写入清单前中断留下的数据文件
+        "orphan.bin": b"orphan",
+        "partial.bin.tmp": b"part",
+    }, tail='{"op": "add", "id": "trunc')
+    return root
+
+
+def test_manifest_replay_after_crash(crashed_slot):
+    spool = spool_module.UploadSpool(crashed_slot)
+    status = spool.status()
+
+    assert status["spool_dir"] == crashed_slot
+    assert status["pending"] == 1
+    assert status["pending_bytes"] == 7
+    # 清单中不保存凭证，恢复的对象等待节点再次提供存储桶
+    assert status["waiting_credentials"] == 1
+    assert status["cached"] == 1
+    assert status["cached_bytes"] == 6
+
+
+def test_orphans_removed_and_manifest_compacted(crashed_slot):
+    spool_module.UploadSpool(crashed_slot).status()
+
+    assert sorted(os.listdir(os.path.join(crashed_slot, "objects"))) == ["cached.bin", "pending.bin"]
+    assert [(r["op"], r["id"]) for r in read_manifest(crashed_slot)] == [
+        ("add", "pending"), ("add", "cached"), ("done", "cached")]
+
+
+def test_recovered_entry_uploads_once_bucket_registered(crashed_slot, bucket, fake_server):
+    spool = spool_module.UploadSpool(crashed_slot)
+    spool.register_bucket(bucket)
+
+    assert spool.flush(timeout=10)
+    assert fake_server.state.objects[("bench", "out/pending.png")][1] == b"pending"
+    assert ("bench", "out/cached.png") not in fake_server.state.objects
+    assert spool.status()["cached"] == 2
+    assert ("done", "pending") in [(r["op"], r["id"]) for r in read_manifest(crashed_slot)]
+
+
+def test_concurrent_processes_use_separate_slots(crashed_slot):
+    first = spool_module.UploadSpool(crashed_slot)
+    assert first.status()["pending"] == 1
+
+    second = spool_module.UploadSpool(crashed_slot)
+    status = second.status()
+    assert status["spool_dir"] == os.path.join(crashed_slot, "proc-1")
+    assert status["pending"] == 0
+    # 另一个槽位的加载和清理不影响第一个进程的对象
+    assert sorted(os.listdir(os.path.join(crashed_slot, "objects"))) == ["cached.bin", "pending.bin"]
+
+    # 第一个进程退出后锁释放，新进程接管槽位并恢复其中的对象
+    first._slot_lock.close()
+    third = spool_module.UploadSpool(crashed_slot)
+    assert third.status()["spool_dir"] == crashed_slot
+    assert third.status()["pending"] == 1
+
+
+def test_failed_entry_scheduled_and_requeued(tmp_path):
+    spool = spool_module.UploadSpool(str(tmp_path / "spool"))
+    bucket = FlakyBucket(failures=1, endpoint="spool-test-endpoint")
+    spool.add(bucket, "out/denied.png", b"denied")
+
+    wait_until(lambda: spool.status()["failed"] == 1)
+    entry = next(iter(spool._entries.values()))
+    # 不可重试的错误保留数据，按较长的间隔重试
+    assert entry.next_attempt - time.time() > spool_module.SPOOL_FAILED_BASE_DELAY - 5
+    assert bucket.objects == {}
+
+    assert spool.retry_failed() == 1
+    assert spool.flush(timeout=10)
+    assert bucket.objects == {"out/denied.png": b"denied"}
+    assert spool.status()["failed"] == 0
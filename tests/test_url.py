@@ -0,0 +1,100 @@
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import oss2
+import pytest
+
+from conftest import module
+
+url = module("oss_url")
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def service(monkeypatch, clock):
+    monkeypatch.setattr(url, "time", clock)
+    return url.URLService(window_seconds=300)
+
+
+@pytest.fixture
+def signed(monkeypatch):
+    """
+    oss2.Bucket（签名在本地完成，不需要服务端），记录每次签名的 (对象名, 有效秒数)
+    """
+    bucket = oss2.Bucket(oss2.Auth("access_key_id", "access_key_secret"), "http://oss-cn-hangzhou.aliyuncs.com", "bench")
+    calls = []
+    sign_url = bucket.sign_url
+
+    def recording(method, key, expires, *args, **kwargs):
+        calls.append((key, expires))
+        return sign_url(method, key, expires, *args, **kwargs)
+
+    monkeypatch.setattr(bucket, "sign_url", recording)
+    return bucket, calls
+
+
+def test_signed_url_is_reused_within_window(service, signed, clock):
+    bucket, calls = signed
+    first = service.sign_urls(bucket, ["a.png", "b.png"], DAY)
+    clock.advance(100)
+    second = service.sign_urls(bucket, ["a.png", "b.png", "a.png"], DAY)
+    assert second == first
+    assert [key for key, _ in calls] == ["a.png", "b.png"]
+    assert all(value.startswith("https://bench.oss-cn-hangzhou.aliyuncs.com/") for value in first.values())
+
+
+def test_signed_url_keeps_full_validity_and_renews_after_window(service, signed, clock):
+    bucket, calls = signed
+    service.sign_urls(bucket, ["a.png"], DAY)
+    # 对齐到窗口末尾，剩余有效期不少于请求的时长且不超过一个窗口
+    assert DAY <= calls[0][1] <= DAY + 300
+
+    # 进入下一个窗口后重新签名，有效期同样对齐
+    clock.advance(300)
+    service.sign_urls(bucket, ["a.png"], DAY)
+    assert len(calls) == 2
+    assert calls[1] == calls[0]
+
+
+def test_short_validity_uses_smaller_window(service, signed):
+    bucket, calls = signed
+    service.sign_urls(bucket, ["a.png"], 60)
+    # 窗口为有效期的十分之一
+    assert 60 <= calls[0][1] <= 66
+
+
+def test_cache_is_bounded(monkeypatch, clock, signed):
+    monkeypatch.setattr(url, "time", clock)
+    service = url.URLService(max_entries=2)
+    bucket, calls = signed
+    service.sign_urls(bucket, ["a.png", "b.png", "c.png"], DAY)
+    service.sign_urls(bucket, ["a.png"], DAY)
+    assert [key for key, _ in calls] == ["a.png", "b.png", "c.png", "a.png"]
+
+
+@pytest.mark.parametrize("cdn_domain, expected", [
+    ("cdn.example.com", "https://cdn.example.com/out/a.png?Expires=1&Signature=x"),
+    ("https://cdn.example.com/", "https://cdn.example.com/out/a.png?Expires=1&Signature=x"),
+    ("http://cdn.example.com:8080", "http://cdn.example.com:8080/out/a.png?Expires=1&Signature=x"),
+    ("  ", "https://bench.oss-cn-hangzhou.aliyuncs.com/out/a.png?Expires=1&Signature=x"),
+])
+def test_rewrite_cdn_replaces_scheme_and_host(cdn_domain, expected):
+    original = "https://bench.oss-cn-hangzhou.aliyuncs.com/out/a.png?Expires=1&Signature=x"
+    assert url.rewrite_cdn(original, cdn_domain) == expected
+
+
+def test_build_urls_with_cdn_domain(service, signed):
+    bucket, _ = signed
+    public = service.build_urls(bucket, ["out/a.png"], "bench", "oss-cn-hangzhou.aliyuncs.com", cdn_domain="cdn.example.com")
+    assert public == {"out/a.png": "https://cdn.example.com/out/a.png"}
+
+    temporary = service.build_urls(bucket, ["out/a.png"], "bench", "oss-cn-hangzhou.aliyuncs.com", "是", cdn_domain="cdn.example.com")
+    parts = urlsplit(temporary["out/a.png"])
+    assert (parts.scheme, parts.netloc, unquote(parts.path)) == ("https", "cdn.example.com", "/out/a.png")
+    assert "Signature" in parse_qs(parts.query)
+
+
+def test_build_urls_uses_public_endpoint_in_auto_mode(service, signed):
+    bucket, _ = signed
+    urls = service.build_urls(bucket, ["out/a.png"], "bench", "auto:oss-cn-hangzhou")
+    assert urls == {"out/a.png": "https://bench.oss-cn-hangzhou.aliyuncs.com/out/a.png"}
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from conftest import module
+
+utils = module("oss_utils")
+
+
+def per_image_uint8(image):
+    """
+    原先逐张转换的方式（tensor_to_pil 中的 np.clip(255. * image, 0, 255).astype(np.uint8)）
+    """
+    if hasattr(image, "cpu"):
+        image = image.cpu().numpy()
+    return np.clip(255. * image, 0, 255).astype(np.uint8)
+
+
+@pytest.fixture
+def batch():
+    rng = np.random.default_rng(0)
+    images = rng.random((3, 17, 256, 3), dtype=np.float32)
+    # 每个 k/255 及其两侧的取值，以及超出 0-1 的值
+    edges = np.arange(256, dtype=np.float32) / np.float32(255)
+    images[0, 0] = edges[:, None]
+    images[0, 1] = np.nextafter(edges, np.float32(2))[:, None]
+    images[0, 2] = np.nextafter(edges, np.float32(-1))[:, None]
+    images[1, 0, :8] = [[-1], [-0.001], [1.001], [2], [0.5], [127.5 / 255], [0.998], [1]]
+    return images
+
+
+def test_numpy_batch_matches_per_image_conversion(batch):
+    frames = utils.tensor_batch_to_uint8(batch)
+    assert frames.dtype == np.uint8 and frames.shape == batch.shape
+    for frame, image in zip(frames, batch):
+        np.testing.assert_array_equal(frame, per_image_uint8(image))
+
+
+def test_torch_batch_matches_per_image_conversion(batch):
+    torch = pytest.importorskip("torch")
+    tensor = torch.from_numpy(batch.copy())
+    frames = utils.tensor_batch_to_uint8(tensor)
+    for frame, image in zip(frames, tensor):
+        np.testing.assert_array_equal(frame, per_image_uint8(image))
+    # float32 输入不能被原地修改
+    np.testing.assert_array_equal(tensor.numpy(), batch)
+
+
+def test_pil_view_matches_per_image_conversion(batch):
+    frames = utils.tensor_batch_to_uint8(batch[:, :, :, :1])
+    image = utils.uint8_to_pil(frames[0])
+    assert image.mode == "L"
+    np.testing.assert_array_equal(np.asarray(image), per_image_uint8(batch[0, :, :, :1]).squeeze())